@@ -0,0 +1,152 @@
+"""Generate the placeholder fallback GIFs in this directory.
+
+Writes ``<verb>/<verb>-1.gif`` for every action command: the verb in a
+pixel font bouncing on the bot's pink, a few kilobytes each.  They
+keep action commands answering while Tenor is down; drop real GIFs into
+the same folders to replace them.  Needs nothing outside the standard
+library::
+
+    python assets/gifs/make_placeholders.py
+"""
+
+from __future__ import annotations
+
+import math
+import struct
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+
+VERBS = ("cuddle", "hug", "kiss", "bonk", "bully", "shoot", "pat")
+
+# Background (COLOR_MAIN), shadow, text, heart.
+PALETTE = bytes([0xFF, 0xA0, 0xC0, 0xC0, 0x60, 0x88, 0xFF, 0xFF, 0xFF, 0xE0, 0x20, 0x50])
+BACKGROUND, SHADOW, TEXT, HEART = range(4)
+
+SCALE = 3
+FRAMES = 8
+FRAME_DELAY = 8  # hundredths of a second
+
+# 5 x 7 glyphs, one string per row.
+GLYPHS: Dict[str, Sequence[str]] = {
+    "A": (".###.", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    "B": ("####.", "#...#", "#...#", "####.", "#...#", "#...#", "####."),
+    "C": (".###.", "#...#", "#....", "#....", "#....", "#...#", ".###."),
+    "D": ("####.", "#...#", "#...#", "#...#", "#...#", "#...#", "####."),
+    "E": ("#####", "#....", "#....", "####.", "#....", "#....", "#####"),
+    "G": (".###.", "#...#", "#....", "#.###", "#...#", "#...#", ".###."),
+    "H": ("#...#", "#...#", "#...#", "#####", "#...#", "#...#", "#...#"),
+    "I": (".###.", "..#..", "..#..", "..#..", "..#..", "..#..", ".###."),
+    "K": ("#...#", "#..#.", "#.#..", "##...", "#.#..", "#..#.", "#...#"),
+    "L": ("#....", "#....", "#....", "#....", "#....", "#....", "#####"),
+    "N": ("#...#", "##..#", "#.#.#", "#..##", "#...#", "#...#", "#...#"),
+    "O": (".###.", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    "P": ("####.", "#...#", "#...#", "####.", "#....", "#....", "#...."),
+    "S": (".####", "#....", "#....", ".###.", "....#", "....#", "####."),
+    "T": ("#####", "..#..", "..#..", "..#..", "..#..", "..#..", "..#.."),
+    "U": ("#...#", "#...#", "#...#", "#...#", "#...#", "#...#", ".###."),
+    "Y": ("#...#", "#...#", ".#.#.", "..#..", "..#..", "..#..", "..#.."),
+}
+HEART_GLYPH = (".#.#.", "#####", "#####", ".###.", "..#..")
+
+
+def _lzw(pixels: bytes, min_code_size: int = 2) -> bytes:
+    """GIF-flavoured LZW, packed least significant bit first."""
+    clear, end = 1 << min_code_size, (1 << min_code_size) + 1
+    out = bytearray()
+    bits = nbits = 0
+
+    def emit(code: int, width: int) -> None:
+        nonlocal bits, nbits
+        bits |= code << nbits
+        nbits += width
+        while nbits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            nbits -= 8
+
+    def reset() -> Dict[bytes, int]:
+        return {bytes([i]): i for i in range(clear)}
+
+    table, next_code, width = reset(), end + 1, min_code_size + 1
+    emit(clear, width)
+    current = b""
+    for pixel in pixels:
+        candidate = current + bytes([pixel])
+        if candidate in table:
+            current = candidate
+            continue
+        emit(table[current], width)
+        if next_code == 4096:
+            emit(clear, width)
+            table, next_code, width = reset(), end + 1, min_code_size + 1
+        else:
+            table[candidate] = next_code
+            if next_code == 1 << width and width < 12:
+                width += 1
+            next_code += 1
+        current = bytes([pixel])
+    if current:
+        emit(table[current], width)
+    emit(end, width)
+    if nbits:
+        out.append(bits & 0xFF)
+    return bytes(out)
+
+
+def _blocks(data: bytes) -> bytes:
+    chunks = [data[i:i + 255] for i in range(0, len(data), 255)]
+    return b"".join(bytes([len(chunk)]) + chunk for chunk in chunks) + b"\x00"
+
+
+def _frame(word: str, offset: int, width: int, height: int) -> bytes:
+    canvas: List[bytearray] = [bytearray(width) for _ in range(height)]
+
+    def draw(glyph: Sequence[str], left: int, top: int, colour: int) -> None:
+        for y, row in enumerate(glyph):
+            for x, cell in enumerate(row):
+                if cell != "#":
+                    continue
+                for dy in range(SCALE):
+                    for dx in range(SCALE):
+                        py, px = top + y * SCALE + dy, left + x * SCALE + dx
+                        if 0 <= py < height and 0 <= px < width:
+                            canvas[py][px] = colour
+
+    text_width = len(word) * 6 * SCALE - SCALE
+    left = (width - text_width) // 2
+    top = (height - 7 * SCALE) // 2 + 4 + offset
+    for index, letter in enumerate(word.upper()):
+        x = left + index * 6 * SCALE
+        draw(GLYPHS[letter], x + 1, top + 2, SHADOW)
+        draw(GLYPHS[letter], x, top, TEXT)
+    draw(HEART_GLYPH, (width - 5 * SCALE) // 2, 4 - offset // 2, HEART)
+    return b"".join(bytes(row) for row in canvas)
+
+
+def make_gif(word: str) -> bytes:
+    width = max(96, len(word) * 6 * SCALE + 4 * SCALE)
+    height = 64
+    out = bytearray(b"GIF89a")
+    # Global colour table of 4 entries.
+    out += struct.pack("<HHBBB", width, height, 0xF1, BACKGROUND, 0) + PALETTE
+    out += b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00"  # loop forever
+    for index in range(FRAMES):
+        offset = round(3 * math.sin(2 * math.pi * index / FRAMES))
+        out += b"\x21\xF9\x04\x04" + struct.pack("<H", FRAME_DELAY) + b"\x00\x00"
+        out += b"\x2C" + struct.pack("<HHHHB", 0, 0, width, height, 0)
+        out += b"\x02" + _blocks(_lzw(_frame(word, offset, width, height)))
+    out += b"\x3B"
+    return bytes(out)
+
+
+def main() -> None:
+    root = Path(__file__).resolve().parent
+    for verb in VERBS:
+        folder = root / verb
+        folder.mkdir(exist_ok=True)
+        (folder / f"{verb}-1.gif").write_bytes(make_gif(verb))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""Stand-ins for the Discord objects the game cogs touch.
+
+The game cogs only use a small part of discord.py's objects: ids, mentions,
+``Interaction.response``, ``Message.edit`` and the bot's cog and dynamic
+item registries.  The fakes here implement just that, so cog handlers can
+be driven without a gateway connection:
+
+* :class:`FakeDiscordHTTP` stands in for the REST API.  Every call sleeps
+  for a simulated latency and is counted by route.  Message edits are also
+  checked against Discord's per-channel edit limit, and edits over it are
+  counted as would-be 429s.
+* :class:`FakeMember`, :class:`FakeMessage`, :class:`FakeInteraction` and
+  :class:`FakeContext` are the duck-typed objects handlers receive.
+* :class:`FakeBot` owns the real :class:`~utils.sessions.SessionManager`
+  and :class:`~utils.render.RenderScheduler` and dispatches component
+  clicks by ``custom_id`` the way discord.py's view store does.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Sequence, Type
+
+import discord
+
+from utils.render import RenderScheduler
+from utils.sessions import SessionManager
+
+
+# Discord allows about 5 edits per 5 seconds in a channel.
+EDIT_LIMIT = 5
+EDIT_WINDOW = 5.0
+
+_ids = itertools.count(1_000_000_000_000_000_000)
+
+
+def snowflake() -> int:
+    return next(_ids)
+
+
+class FakeDiscordHTTP:
+    """Counts REST calls and waits a simulated round trip for each."""
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.calls: Counter[str] = Counter()
+        self.rate_limited = 0
+        self._edits: Dict[int, Deque[float]] = defaultdict(deque)
+
+    async def request(self, route: str, channel_id: Optional[int] = None) -> None:
+        self.calls[route] += 1
+        if route == "edit_message" and channel_id is not None:
+            now = time.monotonic()
+            edits = self._edits[channel_id]
+            while edits and now - edits[0] > EDIT_WINDOW:
+                edits.popleft()
+            if len(edits) >= EDIT_LIMIT:
+                self.rate_limited += 1
+            edits.append(now)
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+
+
+@dataclass(frozen=True)
+class FakeMember:
+    id: int
+    name: str
+    bot: bool = False
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    @property
+    def display_name(self) -> str:
+        return self.name
+
+    @property
+    def display_avatar(self) -> SimpleNamespace:
+        return SimpleNamespace(url=f"https://cdn.example/avatars/{self.id}.png")
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        http: FakeDiscordHTTP,
+        channel_id: int,
+        content: Optional[str] = None,
+        embed: Optional[discord.Embed] = None,
+        view: Optional[discord.ui.View] = None,
+    ) -> None:
+        self.id = snowflake()
+        self.http = http
+        self.channel_id = channel_id
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.edits = 0
+
+    @property
+    def channel(self) -> SimpleNamespace:
+        return SimpleNamespace(id=self.channel_id)
+
+    async def edit(self, **fields: Any) -> FakeMessage:
+        await self.http.request("edit_message", self.channel_id)
+        self.apply(fields)
+        return self
+
+    def apply(self, fields: Dict[str, Any]) -> None:
+        self.edits += 1
+        for name in ("content", "embed", "view"):
+            if name in fields:
+                setattr(self, name, fields[name])
+
+    @property
+    def finished(self) -> bool:
+        """Whether every component is disabled (or there are none left)."""
+        if self.view is None:
+            return True
+        return all(child.item.disabled for child in self.view.children)
+
+
+class FakeResponse:
+    def __init__(self, interaction: FakeInteraction) -> None:
+        self.interaction = interaction
+        self.acknowledged_at: Optional[float] = None
+        self.ephemeral: List[str] = []
+
+    def is_done(self) -> bool:
+        return self.acknowledged_at is not None
+
+    async def _acknowledge(self) -> None:
+        if self.is_done():
+            raise discord.InteractionResponded(self.interaction)  # type: ignore[arg-type]
+        self.acknowledged_at = time.perf_counter()
+        await self.interaction.http.request("interaction_callback")
+
+    async def send_message(self, content: Optional[str] = None, **fields: Any) -> None:
+        await self._acknowledge()
+        if fields.get("ephemeral"):
+            self.ephemeral.append(content or "")
+
+    async def edit_message(self, **fields: Any) -> None:
+        await self._acknowledge()
+        self.interaction.message.apply(fields)
+
+    async def defer(self, **fields: Any) -> None:
+        await self._acknowledge()
+
+
+class FakeInteraction:
+    def __init__(self, bot: FakeBot, user: FakeMember, message: FakeMessage) -> None:
+        self.client = bot
+        self.http = bot.http
+        self.user = user
+        self.message = message
+        self.guild_id = bot.guild_id
+        self.channel_id = message.channel_id
+        self.response = FakeResponse(self)
+        self.created_at = time.perf_counter()
+
+    async def edit_original_response(self, **fields: Any) -> None:
+        await self.http.request("edit_original_response")
+        self.message.apply(fields)
+
+
+class FakeContext:
+    """Just enough of ``commands.Context`` to invoke a command callback."""
+
+    def __init__(self, bot: FakeBot, author: FakeMember, channel_id: int) -> None:
+        self.bot = bot
+        self.author = author
+        self.guild = SimpleNamespace(id=bot.guild_id)
+        self.channel = SimpleNamespace(id=channel_id)
+        self.sent: List[FakeMessage] = []
+
+    async def send(self, content: Optional[str] = None, **fields: Any) -> FakeMessage:
+        await self.bot.http.request("send_message", self.channel.id)
+        message = FakeMessage(
+            self.bot.http, self.channel.id, content, fields.get("embed"), fields.get("view")
+        )
+        self.bot.messages[message.id] = message
+        self.sent.append(message)
+        return message
+
+
+class _FakeChannel:
+    def __init__(self, bot: FakeBot, channel_id: int) -> None:
+        self.bot = bot
+        self.id = channel_id
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return self.bot.messages[message_id]
+
+
+class FakeBot:
+    """The parts of :class:`commands.Bot` the game cogs use."""
+
+    def __init__(
+        self, http: FakeDiscordHTTP, render_interval: float = 1.0, idle_timeout: float = 600.0
+    ) -> None:
+        self.http = http
+        self.user = FakeMember(snowflake(), "Syaa", bot=True)
+        self.guild_id = snowflake()
+        self.sessions = SessionManager(
+            max_sessions=10**9,
+            max_per_guild=10**9,
+            max_per_channel=10**9,
+            idle_timeout=idle_timeout,
+        )
+        self.renderer = RenderScheduler(render_interval)
+        self.messages: Dict[int, FakeMessage] = {}
+        self.cogs: Dict[str, Any] = {}
+        self._dynamic_items: List[Type[discord.ui.DynamicItem[Any]]] = []
+
+    async def add_cog(self, cog: Any) -> None:
+        await cog.cog_load()
+        self.cogs[type(cog).__name__] = cog
+
+    async def remove_cogs(self) -> None:
+        for cog in self.cogs.values():
+            await cog.cog_unload()
+        self.cogs.clear()
+
+    def get_cog(self, name: str) -> Any:
+        return self.cogs.get(name)
+
+    def add_dynamic_items(self, *items: Type[discord.ui.DynamicItem[Any]]) -> None:
+        self._dynamic_items.extend(items)
+
+    def remove_dynamic_items(self, *items: Type[discord.ui.DynamicItem[Any]]) -> None:
+        for item in items:
+            self._dynamic_items.remove(item)
+
+    def get_partial_messageable(self, channel_id: int) -> _FakeChannel:
+        return _FakeChannel(self, channel_id)
+
+    async def click(
+        self, interaction: FakeInteraction, custom_id: str, values: Sequence[str] = ()
+    ) -> None:
+        """Dispatch a component click to the matching dynamic item."""
+        for factory in self._dynamic_items:
+            match = factory.__discord_ui_compiled_template__.fullmatch(custom_id)
+            if match is None:
+                continue
+            item = await factory.from_custom_id(interaction, None, match)  # type: ignore[arg-type]
+            if values:
+                item.item._values = list(values)  # type: ignore[attr-defined]
+            if await item.interaction_check(interaction):  # type: ignore[arg-type]
+                await item.callback(interaction)  # type: ignore[arg-type]
+            return
+        raise LookupError(f"No dynamic item matches {custom_id!r}")
+
+    async def select(
+        self, interaction: FakeInteraction, view: discord.ui.View, values: Sequence[str]
+    ) -> None:
+        """Dispatch a choice in the first select of a regular (stored) view."""
+        select = next(
+            child for child in view.children if isinstance(child, discord.ui.Select)
+        )
+        select._values = list(values)
+        if await view.interaction_check(interaction):  # type: ignore[arg-type]
+            await select.callback(interaction)  # type: ignore[arg-type]
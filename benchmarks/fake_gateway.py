@@ -0,0 +1,364 @@
+"""Local stand-in for the Discord gateway and REST API.
+
+:class:`FakeGateway` is an aiohttp app that serves just enough of Discord
+for a real :class:`discord.Client` to log in, connect, receive replayed
+events and answer them:
+
+* ``/api/v10/...`` answers the REST calls the bot makes (login,
+  application info, command sync, sending and editing messages,
+  interaction callbacks and follow-ups).  Every call waits a simulated
+  latency and is counted by route; routes it does not know get an empty
+  ``204`` (or a ``404`` for ``GET``).
+* ``/gateway`` is the websocket.  It says hello, answers heartbeats and,
+  once the client identifies, sends ``READY`` and a ``GUILD_CREATE`` per
+  guild.  :meth:`FakeGateway.replay` then streams events on a schedule.
+  Frames are sent uncompressed, which discord.py accepts whatever
+  compression it asked for.
+
+Point discord.py at it by setting ``discord.http.Route.BASE`` to the API
+URL and ``DiscordWebSocket.DEFAULT_GATEWAY`` to the gateway URL returned
+by :meth:`FakeGateway.start`.
+
+End-to-end latency is measured here: a command event counts as answered
+by the first message the bot sends in its channel (prefix commands) or by
+its interaction callback (slash commands, clicks and modals).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import WSMsgType, web
+
+
+API = "/api/v10"
+
+# Gateway opcodes
+DISPATCH, HEARTBEAT, IDENTIFY, HELLO, HEARTBEAT_ACK = 0, 1, 2, 10, 11
+
+# Interaction callback types that create or update a message.
+MESSAGE_CALLBACKS = (4, 7)
+DEFERRED_MESSAGE = 5
+EPHEMERAL = 1 << 6
+
+_ROUTE_IDS = re.compile(r"\d{5,}")
+
+# A replay event: seconds after the start, event name, payload and the
+# kind of command it is ("message", "interaction" or None).
+Event = Tuple[float, str, Dict[str, Any], Optional[str]]
+
+
+def _json(data: Any, status: int = 200) -> web.Response:
+    # discord.py only parses bodies whose content type is exactly this.
+    return web.Response(
+        body=json.dumps(data).encode(), status=status, content_type="application/json"
+    )
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakeGateway:
+    """Serves a fake Discord to one bot and measures how fast it answers."""
+
+    def __init__(
+        self,
+        user: Dict[str, Any],
+        application_id: str,
+        guilds: Sequence[Dict[str, Any]],
+        reply_ids: Optional[Dict[str, Deque[str]]] = None,
+        first_message_id: int = 1,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+    ) -> None:
+        self.user = user
+        self.application_id = application_id
+        self.guilds = list(guilds)
+        # Ids the bot's messages had when the traffic was recorded, per
+        # channel, so stored views are found again when they are clicked.
+        self.reply_ids = reply_ids or {}
+        self.latency = latency
+        self.jitter = jitter
+
+        self.calls: Counter[str] = Counter()
+        self.dispatched: Counter[str] = Counter()
+        self.commands: Counter[str] = Counter()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.answered_at: List[float] = []
+        self.last_call = time.perf_counter()
+        self.identified = asyncio.Event()
+
+        self._pending_messages: Dict[str, Deque[float]] = defaultdict(deque)
+        self._pending_interactions: Dict[str, float] = {}
+        # interaction id -> (type, channel id, message id)
+        self._interactions: Dict[str, Tuple[int, str, Optional[str]]] = {}
+        self._message_ids = itertools.count(first_message_id)
+        self._ws: Optional[web.WebSocketResponse] = None
+        self._sequence = 0
+        self._runner: Optional[web.AppRunner] = None
+
+    # -- measurements --------------------------------------------------
+
+    @property
+    def pending(self) -> int:
+        """Commands not answered yet."""
+        return len(self._pending_interactions) + sum(map(len, self._pending_messages.values()))
+
+    def _answer(self, request: web.Request, kind: str, dispatched: Optional[float]) -> None:
+        if dispatched is not None:
+            arrived = request["arrived"]
+            self.latencies[kind].append(arrived - dispatched)
+            self.answered_at.append(arrived)
+
+    # -- gateway -------------------------------------------------------
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        if self._ws is None or self._ws.closed:
+            raise ConnectionError("The bot is not connected")
+        await self._ws.send_str(json.dumps(payload, separators=(",", ":")))
+
+    async def dispatch(self, name: str, data: Dict[str, Any], kind: Optional[str] = None) -> None:
+        """Send event ``name``; ``kind`` marks it as a command to time."""
+        self._sequence += 1
+        if kind == "message":
+            self._pending_messages[data["channel_id"]].append(time.perf_counter())
+        elif kind == "interaction":
+            message = data.get("message") or {}
+            self._interactions[data["id"]] = (
+                data["type"], data.get("channel_id", ""), message.get("id")
+            )
+            self._pending_interactions[data["id"]] = time.perf_counter()
+        if kind is not None:
+            self.commands[kind] += 1
+        self.dispatched[name] += 1
+        await self._send({"op": DISPATCH, "t": name, "s": self._sequence, "d": data})
+
+    async def replay(self, events: Sequence[Event], speedup: float = 1.0) -> float:
+        """Send ``events`` at their offsets divided by ``speedup``; returns the seconds taken."""
+        await self.identified.wait()
+        started = time.perf_counter()
+        for offset, name, data, kind in events:
+            delay = started + offset / speedup - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.dispatch(name, data, kind)
+        return time.perf_counter() - started
+
+    async def _identify(self) -> None:
+        await self._send(
+            {
+                "op": DISPATCH,
+                "t": "READY",
+                "s": 0,
+                "d": {
+                    "v": 10,
+                    "user": self.user,
+                    "guilds": [{"id": guild["id"], "unavailable": True} for guild in self.guilds],
+                    "session_id": "replay",
+                    "resume_gateway_url": "ws://127.0.0.1/",
+                    "application": {"id": self.application_id, "flags": 0},
+                },
+            }
+        )
+        for guild in self.guilds:
+            await self._send({"op": DISPATCH, "t": "GUILD_CREATE", "s": 0, "d": guild})
+        self.identified.set()
+
+    async def handle_gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(max_msg_size=0)
+        await ws.prepare(request)
+        self._ws = ws
+        await self._send({"op": HELLO, "d": {"heartbeat_interval": 41250}})
+        async for message in ws:
+            if message.type is not WSMsgType.TEXT:
+                continue
+            op = json.loads(message.data).get("op")
+            if op == HEARTBEAT:
+                await self._send({"op": HEARTBEAT_ACK})
+            elif op == IDENTIFY:
+                await self._identify()
+        self.identified.clear()
+        return ws
+
+    # -- REST ----------------------------------------------------------
+
+    def message(
+        self, channel_id: str, payload: Dict[str, Any], message_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """A message payload as Discord would return it."""
+        if message_id is None:
+            recorded = self.reply_ids.get(channel_id)
+            message_id = recorded.popleft() if recorded else str(next(self._message_ids))
+        return {
+            "id": message_id,
+            "channel_id": channel_id,
+            "author": self.user,
+            "content": payload.get("content") or "",
+            "timestamp": _now(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": payload.get("embeds") or [],
+            "components": payload.get("components") or [],
+            "pinned": False,
+            "type": 0,
+            "flags": payload.get("flags") or 0,
+        }
+
+    async def _payload(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            return json.loads(str(form.get("payload_json", "{}")))
+        if request.can_read_body:
+            return await request.json()
+        return {}
+
+    @web.middleware
+    async def _count(self, request: web.Request, handler: Any) -> web.StreamResponse:
+        request["arrived"] = time.perf_counter()
+        if request.path.startswith(API):
+            self.last_call = request["arrived"]
+            self.calls[f"{request.method} {_ROUTE_IDS.sub('{id}', request.path[len(API):])}"] += 1
+            delay = self.latency + random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+        return await handler(request)
+
+    async def get_user(self, request: web.Request) -> web.Response:
+        return _json(self.user)
+
+    async def get_application(self, request: web.Request) -> web.Response:
+        return _json(
+            {
+                "id": self.application_id,
+                "name": self.user["username"],
+                "description": "",
+                "icon": None,
+                "bot_public": True,
+                "bot_require_code_grant": False,
+                "owner": self.user,
+                "verify_key": "",
+                "flags": 0,
+            }
+        )
+
+    async def get_gateway(self, request: web.Request) -> web.Response:
+        url = f"ws://{request.host}/gateway"
+        limit = {"total": 1000, "remaining": 1000, "reset_after": 0, "max_concurrency": 1}
+        return _json({"url": url, "shards": 1, "session_start_limit": limit})
+
+    async def sync_commands(self, request: web.Request) -> web.Response:
+        return _json([])
+
+    async def send_message(self, request: web.Request) -> web.Response:
+        channel_id = request.match_info["channel_id"]
+        pending = self._pending_messages.get(channel_id)
+        self._answer(request, "message", pending.popleft() if pending else None)
+        return _json(self.message(channel_id, await self._payload(request)))
+
+    async def edit_message(self, request: web.Request) -> web.Response:
+        payload = await self._payload(request)
+        return _json(
+            self.message(request.match_info["channel_id"], payload, request.match_info["message_id"])
+        )
+
+    async def list_messages(self, request: web.Request) -> web.Response:
+        return _json([])
+
+    async def interaction_callback(self, request: web.Request) -> web.Response:
+        interaction_id = request.match_info["interaction_id"]
+        self._answer(request, "interaction", self._pending_interactions.pop(interaction_id, None))
+        payload = await self._payload(request)
+        kind, channel_id, message_id = self._interactions.get(interaction_id, (2, "", None))
+        callback = payload.get("type", 4)
+        data = payload.get("data") or {}
+        resource: Dict[str, Any] = {"type": callback}
+        if callback in MESSAGE_CALLBACKS:
+            resource["message"] = self.message(
+                channel_id, data, message_id if callback == 7 else None
+            )
+        return _json(
+            {
+                "interaction": {
+                    "id": interaction_id,
+                    "type": kind,
+                    "response_message_id": resource.get("message", {}).get("id"),
+                    "response_message_loading": callback == DEFERRED_MESSAGE,
+                    "response_message_ephemeral": bool((data.get("flags") or 0) & EPHEMERAL),
+                },
+                "resource": resource,
+            }
+        )
+
+    def _interaction_channel(self, token: str) -> Tuple[str, Optional[str]]:
+        # Replayed interactions use "replay-<interaction id>" as their token.
+        _, channel_id, message_id = self._interactions.get(token.rpartition("-")[2], (0, "", None))
+        return channel_id, message_id
+
+    async def webhook_message(self, request: web.Request) -> web.Response:
+        channel_id, original = self._interaction_channel(request.match_info["token"])
+        message_id = request.match_info.get("message_id", "@original")
+        if message_id == "@original":
+            message_id = original or str(next(self._message_ids))
+        payload = {} if request.method == "GET" else await self._payload(request)
+        return _json(self.message(channel_id, payload, message_id))
+
+    async def webhook_send(self, request: web.Request) -> web.Response:
+        channel_id, _ = self._interaction_channel(request.match_info["token"])
+        return _json(self.message(channel_id, await self._payload(request)))
+
+    async def fallback(self, request: web.Request) -> web.Response:
+        if request.method == "GET":
+            return _json({"message": "Unknown", "code": 0}, status=404)
+        return web.Response(status=204)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get("/gateway", self.handle_gateway)
+        routes = [
+            ("GET", "/users/@me", self.get_user),
+            ("GET", "/oauth2/applications/@me", self.get_application),
+            ("GET", "/gateway", self.get_gateway),
+            ("GET", "/gateway/bot", self.get_gateway),
+            ("PUT", "/applications/{app}/commands", self.sync_commands),
+            ("PUT", "/applications/{app}/guilds/{guild}/commands", self.sync_commands),
+            ("POST", "/channels/{channel_id}/messages", self.send_message),
+            ("GET", "/channels/{channel_id}/messages", self.list_messages),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self.edit_message),
+            ("POST", "/interactions/{interaction_id}/{token}/callback", self.interaction_callback),
+            ("POST", "/webhooks/{app}/{token}", self.webhook_send),
+            ("GET", "/webhooks/{app}/{token}/messages/{message_id}", self.webhook_message),
+            ("PATCH", "/webhooks/{app}/{token}/messages/{message_id}", self.webhook_message),
+        ]
+        for method, path, handler in routes:
+            app.router.add_route(method, API + path, handler)
+        app.router.add_route("*", API + "/{tail:.*}", self.fallback)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> Tuple[str, str]:
+        """Start serving and return the API and gateway URLs."""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}{API}", f"ws://{host}:{bound_port}/gateway"
+
+    async def stop(self) -> None:
+        if self._ws is not None:
+            await self._ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
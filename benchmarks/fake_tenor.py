@@ -0,0 +1,93 @@
+"""Local stand-in for the Tenor search API.
+
+Serves ``/v2/search`` with configurable latency and failure rate so the
+Actions cog can be exercised against slow or failing upstreams without
+touching the real API.  Run it on its own with::
+
+    python -m benchmarks.fake_tenor --port 8081 --latency 0.5 --failure-rate 0.2
+
+and point the bot at it with ``TENOR_SEARCH_URL=http://127.0.0.1:8081/v2/search``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+
+from aiohttp import web
+
+
+class FakeTenor:
+    """An aiohttp app that answers Tenor search requests."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        failure_status: int = 503,
+        results: int = 100,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.results = results
+        self.requests = 0
+        self.failures = 0
+        self._runner: web.AppRunner | None = None
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < self.failure_rate:
+            self.failures += 1
+            return web.Response(status=self.failure_status, text="upstream unavailable")
+
+        term = request.query.get("q", "")
+        limit = min(int(request.query.get("limit", self.results)), self.results)
+        slug = term.replace(" ", "-")
+        results = [
+            {"id": str(index), "media_formats": {"gif": {"url": f"https://fake.tenor/{slug}/{index}.gif"}}}
+            for index in range(limit)
+        ]
+        return web.json_response({"results": results})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v2/search", self.handle_search)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the search URL."""
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        return f"http://{host}:{bound_port}/v2/search"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeTenor(args.latency, args.jitter, args.failure_rate)
+    web.run_app(fake.app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
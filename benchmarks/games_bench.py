@@ -0,0 +1,287 @@
+"""Load-test the game cogs with scripted games against fake Discord objects.
+
+Loads the Fun, TicTacToe, Hangman and Help cogs into a
+:class:`~benchmarks.fake_discord.FakeBot` backed by a throwaway SQLite
+database, then plays ``--games`` scripted games of each kind with up to
+``--concurrency`` running at once:
+
+* ``rps`` – start a game and pick a weapon;
+* ``tictactoe`` – two members play random moves until the game ends;
+* ``hangman`` – two members guess letters at the same time, plus a hint;
+* ``help`` – open the help menu and browse three categories.
+
+Players act on the message as last rendered: after a move they wait for
+the board to be redrawn (or for twice the render interval, after which
+they may click on a stale board) and then think for about ``--think``
+seconds.  For every kind it prints command and click latency percentiles
+(time to acknowledge and time until the handler returned), and overall
+it prints event loop lag, database writes per game, REST calls (with
+would-be 429s on message edits), render and session stats, and peak
+memory::
+
+    python -m benchmarks.games_bench --games 1000 --concurrency 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from tortoise import connections
+
+import cogs.fun as fun
+import cogs.hangman as hangman
+import cogs.help as help_
+import cogs.storage as storage
+import cogs.tictactoe as tictactoe
+from benchmarks.fake_discord import (
+    FakeBot,
+    FakeContext,
+    FakeDiscordHTTP,
+    FakeInteraction,
+    FakeMember,
+    FakeMessage,
+    snowflake,
+)
+from benchmarks.stats import format_ms, monitor_loop_lag, percentiles
+from database.db import WRITE_CONNECTION, DatabaseSettings, close_db, init_db
+from database.migrations import apply_migrations
+from utils.words import LETTER_ORDER
+
+
+GAMES = ("rps", "tictactoe", "hangman", "help")
+CHANNELS = 20
+# A scripted game gives up after this many clicks.
+MAX_CLICKS = 200
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.commands: Dict[str, List[float]] = defaultdict(list)
+        self.acks: Dict[str, List[float]] = defaultdict(list)
+        self.handlers: Dict[str, List[float]] = defaultdict(list)
+        self.ephemeral: Dict[str, int] = defaultdict(int)
+        self.loop_lag: List[float] = []
+        self.db_writes = 0
+        self.db_commits = 0
+
+    def count_statement(self, statement: str) -> None:
+        # Called from the SQLite thread; only counters are touched.
+        keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        if keyword in ("INSERT", "UPDATE", "DELETE", "REPLACE"):
+            self.db_writes += 1
+        elif keyword == "COMMIT":
+            self.db_commits += 1
+
+
+class Player:
+    def __init__(self, bot: FakeBot, metrics: Metrics, game: str, think: float) -> None:
+        self.bot = bot
+        self.metrics = metrics
+        self.game = game
+        self.think = think
+        self.channel_id = random.randrange(CHANNELS)
+        self.members = [FakeMember(snowflake(), f"player{i}") for i in range(2)]
+
+    async def command(self, invoke: Callable[[FakeContext], Awaitable[None]]) -> FakeMessage:
+        ctx = FakeContext(self.bot, self.members[0], self.channel_id)
+        started = time.perf_counter()
+        await invoke(ctx)
+        self.metrics.commands[self.game].append(time.perf_counter() - started)
+        return ctx.sent[-1]
+
+    async def act(
+        self,
+        member: FakeMember,
+        message: FakeMessage,
+        dispatch: Callable[[FakeInteraction], Awaitable[None]],
+    ) -> None:
+        interaction = FakeInteraction(self.bot, member, message)
+        await dispatch(interaction)
+        finished = time.perf_counter()
+        acknowledged = interaction.response.acknowledged_at or finished
+        self.metrics.acks[self.game].append(acknowledged - interaction.created_at)
+        self.metrics.handlers[self.game].append(finished - interaction.created_at)
+        self.metrics.ephemeral[self.game] += len(interaction.response.ephemeral)
+
+    async def click(
+        self, member: FakeMember, message: FakeMessage, custom_id: str, values: Sequence[str] = ()
+    ) -> None:
+        await self.act(member, message, lambda i: self.bot.click(i, custom_id, values))
+
+    async def pause(self, message: FakeMessage, seen: int, timeout: float) -> None:
+        """Wait for the board to be redrawn after edit ``seen``, then think."""
+        deadline = time.monotonic() + timeout
+        while message.edits <= seen and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(random.uniform(0, 2 * self.think))
+
+
+async def play_rps(player: Player) -> None:
+    cog = player.bot.get_cog("Fun")
+    message = await player.command(lambda ctx: cog.rps.callback(cog, ctx))
+    await asyncio.sleep(random.uniform(0, 2 * player.think))
+    button = random.choice(message.view.children)
+    await player.click(player.members[0], message, button.custom_id)
+
+
+async def play_tictactoe(player: Player) -> None:
+    cog = player.bot.get_cog("TicTacToe")
+    first, second = player.members
+    message = await player.command(lambda ctx: cog.tictactoe.callback(cog, ctx, second))
+    for _ in range(MAX_CLICKS):
+        if message.finished:
+            return
+        cell = random.choice([child for child in message.view.children if not child.item.disabled])
+        member = first if cell.state.current_player == first.id else second
+        seen = message.edits
+        await player.click(member, message, cell.custom_id)
+        await player.pause(message, seen, player.bot.renderer.interval * 2)
+
+
+async def play_hangman(player: Player) -> None:
+    cog = player.bot.get_cog("Hangman")
+    first, second = player.members
+    message = await player.command(lambda ctx: cog.hangman.callback(cog, ctx, second))
+    hint = message.view.children[2]
+    await player.click(first, message, hint.custom_id)
+    for _ in range(MAX_CLICKS // 2):
+        if message.finished:
+            return
+        # Both players pick the next letters still offered, at the same time.
+        letters = {
+            option.value: child
+            for child in message.view.children[:2]
+            if not child.item.disabled
+            for option in child.item.options
+        }
+        picks = [letter for letter in LETTER_ORDER if letter in letters][:2]
+        seen = message.edits
+        await asyncio.gather(
+            *(
+                player.click(member, message, letters[letter].custom_id, [letter])
+                for member, letter in zip(player.members, picks)
+            )
+        )
+        await player.pause(message, seen, player.bot.renderer.interval * 2)
+
+
+async def play_help(player: Player) -> None:
+    cog = player.bot.get_cog("Help")
+    message = await player.command(lambda ctx: cog.help.callback(cog, ctx))
+    for category in random.sample(["moderation", "fun", "actions", "games", "home"], 3):
+        seen = message.edits
+        await player.act(
+            player.members[0], message, lambda i: player.bot.select(i, message.view, [category])
+        )
+        await player.pause(message, seen, 1.0)
+
+
+SCRIPTS = {
+    "rps": play_rps,
+    "tictactoe": play_tictactoe,
+    "hangman": play_hangman,
+    "help": play_help,
+}
+
+
+async def run(args: argparse.Namespace) -> None:
+    metrics = Metrics()
+    http = FakeDiscordHTTP(latency=args.latency, jitter=args.latency / 2)
+    bot = FakeBot(http, render_interval=args.render_interval)
+
+    directory = tempfile.mkdtemp(prefix="syaa-bench-")
+    await init_db(DatabaseSettings(path=os.path.join(directory, "bench.sqlite3")))
+    await apply_migrations()
+    writer = connections.get(WRITE_CONNECTION)
+    await writer._connection.set_trace_callback(metrics.count_statement)
+    storage.start_write_buffer()
+
+    for cog in (
+        fun.Fun(bot),
+        tictactoe.TicTacToe(bot),
+        hangman.Hangman(bot),
+        help_.Help(bot),
+    ):
+        await bot.add_cog(cog)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    stop = asyncio.Event()
+    lag_monitor = asyncio.create_task(monitor_loop_lag(metrics.loop_lag, stop))
+    semaphore = asyncio.Semaphore(args.concurrency)
+    games = [game for game in args.game or GAMES for _ in range(args.games)]
+    random.shuffle(games)
+
+    async def one(game: str) -> None:
+        async with semaphore:
+            await SCRIPTS[game](Player(bot, metrics, game, args.think))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(game) for game in games))
+    await bot.renderer.close()
+    await storage.flush_stats()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await lag_monitor
+
+    traced_peak: Optional[int] = None
+    if args.tracemalloc:
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    print(f"{len(games)} games in {elapsed:.1f}s")
+    for game in args.game or GAMES:
+        print(f"{game:10} command  {format_ms(percentiles(metrics.commands[game]))}")
+        print(f"{'':10} ack      {format_ms(percentiles(metrics.acks[game]))}")
+        print(
+            f"{'':10} handler  {format_ms(percentiles(metrics.handlers[game]))}  "
+            f"clicks={len(metrics.handlers[game])}  ephemeral={metrics.ephemeral[game]}"
+        )
+    print(f"loop lag   {format_ms(percentiles(metrics.loop_lag))}")
+    print(
+        f"database   writes={metrics.db_writes} ({metrics.db_writes / len(games):.2f}/game)  "
+        f"commits={metrics.db_commits} ({metrics.db_commits / len(games):.2f}/game)"
+    )
+    print(f"http       {dict(http.calls)}  would_be_429={http.rate_limited}")
+    print(f"renders    {bot.renderer.stats()}")
+    print(f"sessions   {bot.sessions.stats()}")
+    # ru_maxrss is in KiB on Linux.
+    memory = f"memory     peak_rss={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MiB"
+    if traced_peak is not None:
+        memory += f"  tracemalloc_peak={traced_peak / 2**20:.1f}MiB"
+    print(memory)
+
+    await bot.remove_cogs()
+    await storage.stop_write_buffer()
+    await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200, help="games of each kind")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--game", choices=GAMES, action="append")
+    parser.add_argument(
+        "--think", type=float, default=0.05, help="mean seconds between a player's moves"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.03, help="simulated Discord API round trip"
+    )
+    parser.add_argument("--render-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="also trace Python allocations (slower)"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
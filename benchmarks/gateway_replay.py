@@ -0,0 +1,390 @@
+"""Replay recorded gateway traffic through the whole bot.
+
+Runs the real :class:`~main.SyaaBot` (every extension, the database, the
+game registries) against a :class:`~benchmarks.fake_gateway.FakeGateway`
+and a :class:`~benchmarks.fake_tenor.FakeTenor`, both served from a
+separate thread so their work does not count against the bot's event
+loop.  The bot logs in, receives ``READY`` and a ``GUILD_CREATE`` for
+every guild seen in the recording, and then gets the recorded events at
+their original pace divided by ``--speedup``.
+
+Record traffic first by running the bot with ``GATEWAY_RECORD_PATH`` set
+(see :mod:`utils.gateway_record`), then::
+
+    python -m benchmarks.gateway_replay traffic.jsonl.gz --speedup 10 --copies 4
+
+``--copies`` overlays several copies of the recording, each with its own
+guilds, channels and members, to see how the bot copes with more servers
+at the same traffic shape.  Every replay uses fresh snowflakes based on
+the current time and a throwaway SQLite database.
+
+Prints the events and commands replayed, commands answered per second,
+end-to-end latency percentiles (from the event leaving the gateway to
+the bot's first reply, see :mod:`benchmarks.fake_gateway`), event loop
+lag, REST calls by route, render and session stats, and resident memory
+when the bot became ready, at its peak and at the end.  With
+``--tracemalloc`` it also lists the source files whose allocations grew
+most during the replay.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import importlib
+import os
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import discord
+import yarl
+
+from benchmarks.fake_gateway import Event, FakeGateway
+from benchmarks.fake_tenor import FakeTenor
+from benchmarks.stats import format_ms, monitor_loop_lag, percentiles
+from utils.gateway_record import ANON_BASE, is_command, map_snowflakes, read_recording
+
+
+T = TypeVar("T")
+
+# Permissions of @everyone in synthesized guilds (Discord's defaults) and
+# of the bot's own role (administrator).
+EVERYONE_PERMISSIONS = "1071698660929"
+BOT_PERMISSIONS = "8"
+
+# After the last reply, wait until the bot has made no REST call for this
+# long (follow-up edits, trailing renders) before closing it.
+QUIET = 2.0
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Traffic:
+    """A recording turned into replayable events with fresh ids."""
+
+    def __init__(self, path: str, copies: int = 1) -> None:
+        header, records = read_recording(path)
+        self.prefixes = header.get("prefixes") or ["!"]
+        self.events: List[Event] = []
+        self.reply_ids: Dict[str, Deque[str]] = {}
+        self._users: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._channels: Dict[str, Dict[str, None]] = {}
+
+        # Each copy gets its own block of ids; the bot and the application
+        # are shared by all of them.
+        self._stride = _highest_id(header, records) - ANON_BASE + 1
+        self._base = discord.utils.time_snowflake(datetime.now(timezone.utc))
+        application_id = header.get("application_id") or header["bot_id"]
+        self._shared = {header["bot_id"], application_id}
+        self.bot_id = self._fresh(header["bot_id"])
+        self.application_id = self._fresh(application_id)
+
+        for copy in range(copies):
+            replace = functools.partial(self._fresh, copy=copy)
+            for offset, name, data in records:
+                data, kind = self._prepare(name, map_snowflakes(data, replace))
+                self.events.append((offset, name, data, kind))
+        self.events.sort(key=lambda event: event[0])
+
+        self.next_id = self._base + self._stride * copies
+        self.guilds = [self._guild(guild_id) for guild_id in self._channels]
+
+    def _fresh(self, value: str, copy: int = 0) -> str:
+        number = int(value)
+        if number < ANON_BASE:
+            return value
+        if value in self._shared:
+            copy = 0
+        return str(self._base + number - ANON_BASE + copy * self._stride)
+
+    def _seen(self, data: Dict[str, Any], user: Optional[Dict[str, Any]]) -> None:
+        guild_id = data.get("guild_id")
+        if guild_id is None:
+            return
+        channels = self._channels.setdefault(guild_id, {})
+        if "channel_id" in data:
+            channels[data["channel_id"]] = None
+        if user is not None and user["id"] != self.bot_id:
+            self._users.setdefault(guild_id, {})[user["id"]] = user
+
+    def _prepare(self, name: str, data: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[str]]:
+        kind = None
+        if name == "MESSAGE_CREATE":
+            author = data["author"]
+            self._seen(data, author)
+            if author["id"] == self.bot_id:
+                self.reply_ids.setdefault(data["channel_id"], deque()).append(data["id"])
+            elif not author.get("bot") and is_command(data.get("content", ""), self.prefixes, self.bot_id):
+                kind = "message"
+        elif name == "INTERACTION_CREATE":
+            data["token"] = f"replay-{data['id']}"
+            data["application_id"] = self.application_id
+            self._seen(data, (data.get("member") or {}).get("user") or data.get("user"))
+            kind = "interaction"
+        else:
+            self._seen(data, data.get("user"))
+        return data, kind
+
+    def _guild(self, guild_id: str) -> Dict[str, Any]:
+        role_id = str(self.next_id)
+        self.next_id += 1
+        joined = datetime.now(timezone.utc).isoformat()
+
+        def member(user: Dict[str, Any], roles: List[str]) -> Dict[str, Any]:
+            return {"user": user, "roles": roles, "joined_at": joined, "deaf": False, "mute": False, "flags": 0}
+
+        def role(id: str, name: str, permissions: str, position: int) -> Dict[str, Any]:
+            return {
+                "id": id, "name": name, "permissions": permissions, "position": position,
+                "color": 0, "hoist": False, "managed": False, "mentionable": False, "flags": 0,
+            }
+
+        users = self._users.get(guild_id, {})
+        channels = [
+            {
+                "id": channel_id, "type": 0, "name": "channel", "position": position,
+                "permission_overwrites": [], "nsfw": False, "parent_id": None, "topic": None,
+            }
+            for position, channel_id in enumerate(self._channels[guild_id])
+        ]
+        return {
+            "id": guild_id,
+            "name": "guild",
+            "unavailable": False,
+            "large": False,
+            "owner_id": next(iter(users), self.bot_id),
+            "member_count": len(users) + 1,
+            "joined_at": joined,
+            "roles": [
+                role(guild_id, "@everyone", EVERYONE_PERMISSIONS, 0),
+                role(role_id, "Syaa", BOT_PERMISSIONS, 1),
+            ],
+            "channels": channels,
+            "members": [member(self.user, [role_id])] + [member(user, []) for user in users.values()],
+            "threads": [], "emojis": [], "stickers": [], "features": [], "presences": [],
+            "voice_states": [], "stage_instances": [], "guild_scheduled_events": [],
+            "soundboard_sounds": [], "premium_tier": 0, "preferred_locale": "en-US",
+        }
+
+    @property
+    def user(self) -> Dict[str, Any]:
+        return {"id": self.bot_id, "username": "Syaa", "discriminator": "0", "avatar": None, "bot": True}
+
+    @property
+    def commands(self) -> int:
+        return sum(1 for *_, kind in self.events if kind is not None)
+
+
+def _highest_id(header: Dict[str, Any], records: List[Tuple[float, str, Dict[str, Any]]]) -> int:
+    highest = ANON_BASE
+
+    def see(value: str) -> str:
+        nonlocal highest
+        highest = max(highest, int(value))
+        return value
+
+    map_snowflakes([header, [data for _, _, data in records]], see)
+    return highest
+
+
+class ServerThread(threading.Thread):
+    """Runs the fake services on their own event loop."""
+
+    def __init__(self) -> None:
+        super().__init__(name="fake-discord", daemon=True)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call(self, coroutine: Awaitable[T]) -> "asyncio.Future[T]":
+        """Run ``coroutine`` on the server loop; await the result from another loop."""
+        future: concurrent.futures.Future[T] = asyncio.run_coroutine_threadsafe(coroutine, self.loop)  # type: ignore[arg-type]
+        return asyncio.wrap_future(future)
+
+    def stop(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.join()
+
+
+def rss() -> int:
+    """Current resident set size in bytes (peak size where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in KiB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+async def sample_memory(samples: List[int], stop: asyncio.Event, interval: float = 0.5) -> None:
+    while not stop.is_set():
+        samples.append(rss())
+        await asyncio.sleep(interval)
+
+
+def _mib(size: int) -> str:
+    return f"{size / 2**20:.1f}MiB"
+
+
+async def _until(condition: Callable[[], bool], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def serve(bot: discord.Client, stop: asyncio.Event) -> None:
+    """Run ``bot`` until ``stop`` is set or its connection ends.
+
+    Tortoise keeps its connections in a context variable, so the bot is
+    closed from the task whose ``setup_hook`` opened the database, like
+    ``Client.run`` does.
+    """
+    await bot.login("replay-token")
+    connection = asyncio.create_task(bot.connect())
+    stopped = asyncio.create_task(stop.wait())
+    try:
+        await asyncio.wait([connection, stopped], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        await bot.close()
+    await connection
+
+
+async def run(args: argparse.Namespace) -> None:
+    traffic = Traffic(args.recording, args.copies)
+    gateway = FakeGateway(
+        traffic.user,
+        traffic.application_id,
+        traffic.guilds,
+        reply_ids=traffic.reply_ids,
+        first_message_id=traffic.next_id,
+        latency=args.latency,
+        jitter=args.latency / 2,
+    )
+    tenor = FakeTenor(latency=args.latency, jitter=args.latency / 2)
+    server = ServerThread()
+    server.start()
+    api_url, gateway_url = await server.call(gateway.start())
+    tenor_url = await server.call(tenor.start())
+
+    # The bot reads its settings from the environment when main is imported.
+    directory = tempfile.mkdtemp(prefix="syaa-replay-")
+    os.environ["DB_PATH"] = os.path.join(directory, "replay.sqlite3")
+    os.environ["TENOR_SEARCH_URL"] = tenor_url
+    os.environ.setdefault("TENOR_API", "replay")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.pop("GATEWAY_RECORD_PATH", None)
+    discord.http.Route.BASE = api_url
+    discord.gateway.DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
+    bot = importlib.import_module("main").bot
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    stop_bot = asyncio.Event()
+    runner = asyncio.create_task(serve(bot, stop_bot))
+    ready = asyncio.create_task(bot.wait_until_ready())
+    await asyncio.wait([runner, ready], timeout=60, return_when=asyncio.FIRST_COMPLETED)
+    if not ready.done():
+        ready.cancel()
+        if runner.done():
+            runner.result()
+        raise RuntimeError("The bot did not become ready")
+
+    ready_rss = rss()
+    ready_snapshot = tracemalloc.take_snapshot() if args.tracemalloc else None
+    memory: List[int] = []
+    loop_lag: List[float] = []
+    stop = asyncio.Event()
+    monitors = [
+        asyncio.create_task(monitor_loop_lag(loop_lag, stop)),
+        asyncio.create_task(sample_memory(memory, stop)),
+    ]
+
+    started = time.perf_counter()
+    replayed = await server.call(gateway.replay(traffic.events, args.speedup))
+    await _until(
+        lambda: runner.done()
+        or (gateway.pending == 0 and time.perf_counter() - gateway.last_call > QUIET),
+        args.drain,
+    )
+    if runner.done():
+        # The bot crashed or disconnected during the replay.
+        runner.result()
+        raise RuntimeError("The bot stopped during the replay")
+    elapsed = (max(gateway.answered_at, default=started + replayed)) - started
+    stop.set()
+    await asyncio.gather(*monitors)
+    end_rss = rss()
+
+    growth = None
+    if ready_snapshot is not None:
+        filters = [tracemalloc.Filter(True, os.path.join(REPO, "*"))]
+        growth = (
+            tracemalloc.take_snapshot()
+            .filter_traces(filters)
+            .compare_to(ready_snapshot.filter_traces(filters), "filename")
+        )
+        tracemalloc.stop()
+
+    answered = sum(len(latencies) for latencies in gateway.latencies.values())
+    print(
+        f"{sum(gateway.dispatched.values())} events ({traffic.commands} commands) "
+        f"x{args.copies} copies at {args.speedup:g}x in {replayed:.1f}s"
+    )
+    print(f"events     {dict(gateway.dispatched)}")
+    print(
+        f"commands   answered={answered}/{traffic.commands}  "
+        f"{answered / elapsed if elapsed > 0 else 0:.1f}/s"
+    )
+    for kind in ("message", "interaction"):
+        print(f"{kind:10} {format_ms(percentiles(gateway.latencies[kind]))}  n={len(gateway.latencies[kind])}")
+    print(f"loop lag   {format_ms(percentiles(loop_lag))}")
+    print(f"rest       {dict(gateway.calls.most_common())}")
+    print(f"renders    {bot.renderer.stats()}")
+    print(f"sessions   {bot.sessions.stats()}")
+    print(
+        f"memory     ready={_mib(ready_rss)}  peak={_mib(max(memory, default=end_rss))}  "
+        f"end={_mib(end_rss)}  growth={_mib(end_rss - ready_rss)}"
+    )
+    if growth is not None:
+        for stat in growth[: args.top]:
+            frame = stat.traceback[0]
+            print(f"  {os.path.relpath(frame.filename, REPO):40} {stat.size_diff / 1024:+.1f}KiB")
+
+    stop_bot.set()
+    await runner
+    await server.call(tenor.stop())
+    await server.call(gateway.stop())
+    server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="file written by the bot with GATEWAY_RECORD_PATH")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay this many times faster")
+    parser.add_argument("--copies", type=int, default=1, help="overlay copies with distinct ids")
+    parser.add_argument(
+        "--latency", type=float, default=0.03, help="simulated Discord API round trip"
+    )
+    parser.add_argument(
+        "--drain", type=float, default=10.0, help="seconds to wait for the last replies"
+    )
+    parser.add_argument(
+        "--tracemalloc", action="store_true", help="also trace Python allocations (slower)"
+    )
+    parser.add_argument("--top", type=int, default=10, help="files to list with --tracemalloc")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
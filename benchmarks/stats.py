@@ -0,0 +1,33 @@
+"""Small helpers shared by the benchmark scripts."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict, Iterable, List
+
+
+def percentiles(samples: Iterable[float], points=(50, 90, 95, 99)) -> Dict[str, float]:
+    """Return the requested percentiles of ``samples`` (nearest rank)."""
+    ordered: List[float] = sorted(samples)
+    if not ordered:
+        return {f"p{point}": 0.0 for point in points}
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, max(0, round(point / 100 * len(ordered)) - 1))
+        result[f"p{point}"] = ordered[index]
+    result["max"] = ordered[-1]
+    return result
+
+
+def format_ms(values: Dict[str, float]) -> str:
+    """Format a percentile dict (in seconds) as milliseconds."""
+    return "  ".join(f"{key}={value * 1000:.1f}ms" for key, value in values.items())
+
+
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes up from ``interval``-second sleeps."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
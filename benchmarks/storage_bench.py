@@ -0,0 +1,150 @@
+"""Load-test stats reads against concurrent write-behind flushes.
+
+Runs against a throwaway SQLite database.  ``--writers`` tasks record game
+results for ``--users`` players spread over ``--guilds`` guilds while
+``--readers`` tasks load per-user counters and whole guild leaderboards
+from the reader pool, bypassing the caches so every read hits SQLite.
+The buffer is flushed every ``--flush-interval`` seconds.
+
+It prints read latency percentiles, how many reads ran while a flush was
+being written (and how many started and finished inside one), flush
+durations, and the number of reads that returned counts outside what had
+been recorded when the read started and ended (which must be 0)::
+
+    python -m benchmarks.storage_bench --seconds 10 --users 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from typing import DefaultDict, List, Tuple
+
+import cogs.storage as storage
+from benchmarks.stats import format_ms, percentiles
+from database.db import DatabaseSettings, close_db, init_db
+from database.leaderboard import LeaderboardCache
+from database.migrations import apply_migrations
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.user_reads: List[float] = []
+        self.board_reads: List[float] = []
+        # (started, finished) of every read and every flush.
+        self.read_spans: List[Tuple[float, float]] = []
+        self.flush_spans: List[Tuple[float, float]] = []
+        self.wins: DefaultDict[Tuple[int, int], int] = defaultdict(int)
+        self.inconsistent = 0
+
+
+async def write(args: argparse.Namespace, metrics: Metrics, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        guild_id, user_id = random.randrange(args.guilds), random.randrange(args.users)
+        await storage.record_result(guild_id, user_id, "rps", "win")
+        metrics.wins[(guild_id, user_id)] += 1
+        await asyncio.sleep(random.expovariate(args.rate / args.writers))
+
+
+async def read(args: argparse.Namespace, metrics: Metrics, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        guild_id, user_id = random.randrange(args.guilds), random.randrange(args.users)
+        before = metrics.wins[(guild_id, user_id)]
+        started = time.perf_counter()
+        if random.random() < args.board_share:
+            page = (await storage._get_board(guild_id, "rps")).page_of(user_id, 1)
+            wins = page.rows[0][1] if page is not None else 0
+            samples = metrics.board_reads
+        else:
+            wins = (await storage._load_counters(guild_id, user_id, "rps"))["wins"]
+            samples = metrics.user_reads
+        finished = time.perf_counter()
+        samples.append(finished - started)
+        metrics.read_spans.append((started, finished))
+        if not before <= wins <= metrics.wins[(guild_id, user_id)]:
+            metrics.inconsistent += 1
+
+
+async def flush(args: argparse.Namespace, metrics: Metrics, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        await asyncio.sleep(args.flush_interval)
+        started = time.perf_counter()
+        await storage.flush_stats()
+        metrics.flush_spans.append((started, time.perf_counter()))
+
+
+def overlaps(metrics: Metrics) -> Tuple[int, int]:
+    """Reads that ran during some flush, and reads entirely inside one."""
+    during = inside = 0
+    for started, finished in metrics.read_spans:
+        for flush_started, flush_finished in metrics.flush_spans:
+            if started < flush_finished and flush_started < finished:
+                during += 1
+                inside += flush_started <= started and finished <= flush_finished
+                break
+    return during, inside
+
+
+async def run(args: argparse.Namespace) -> None:
+    directory = tempfile.mkdtemp(prefix="syaa-bench-")
+    await init_db(
+        DatabaseSettings(
+            path=os.path.join(directory, "bench.sqlite3"), read_connections=args.read_connections
+        )
+    )
+    await apply_migrations()
+    # Keep no boards so every leaderboard read loads one.
+    storage._leaderboards = LeaderboardCache(0)
+
+    metrics = Metrics()
+    # Start from a populated table so flushes and board reads have some size.
+    for user_id in range(args.users):
+        guild_id = user_id % args.guilds
+        await storage.record_result(guild_id, user_id, "rps", "win")
+        metrics.wins[(guild_id, user_id)] += 1
+    await storage.flush_stats()
+
+    stop = asyncio.Event()
+    tasks = [asyncio.create_task(flush(args, metrics, stop))]
+    tasks += [asyncio.create_task(write(args, metrics, stop)) for _ in range(args.writers)]
+    tasks += [asyncio.create_task(read(args, metrics, stop)) for _ in range(args.readers)]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    await asyncio.gather(*tasks)
+    await storage.flush_stats()
+
+    during, inside = overlaps(metrics)
+    flushes = [finished - started for started, finished in metrics.flush_spans]
+    print(f"reads      {len(metrics.read_spans)} in {args.seconds:g}s")
+    print(f"user       {format_ms(percentiles(metrics.user_reads))}  n={len(metrics.user_reads)}")
+    print(f"board      {format_ms(percentiles(metrics.board_reads))}  n={len(metrics.board_reads)}")
+    print(f"flushes    {format_ms(percentiles(flushes))}  n={len(flushes)}")
+    print(f"overlap    during_flush={during}  inside_flush={inside}")
+    print(f"consistent {len(metrics.read_spans) - metrics.inconsistent}/{len(metrics.read_spans)}")
+
+    await close_db()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--writers", type=int, default=50)
+    parser.add_argument("--rate", type=float, default=5000, help="results recorded per second")
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument(
+        "--board-share", type=float, default=0.1, help="share of reads that load a whole leaderboard"
+    )
+    parser.add_argument("--read-connections", type=int, default=2)
+    parser.add_argument("--flush-interval", type=float, default=0.5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark the Actions GIF path against a local fake Tenor.
+
+For each scenario (healthy, slow, flaky, down) a :class:`FakeTenor` is
+started and a batch of concurrent lookups is run through
+``Actions.fetch_gifs`` (the budgeted, circuit-broken upstream call) and
+``Actions.get_gif`` (the cached path commands use).  Prints latency
+percentiles, error counts, upstream request counts and breaker state::
+
+    python -m benchmarks.tenor_bench --requests 500 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+from typing import Awaitable, Callable, List, Tuple
+
+import aiohttp
+
+import cogs.actions as actions
+from benchmarks.fake_tenor import FakeTenor
+from benchmarks.stats import format_ms, percentiles
+from utils.ratelimit import TokenBucket
+
+
+TERMS = ["cute hug anime", "cute anime pats", "bonk anime"]
+
+SCENARIOS = {
+    "healthy": dict(latency=0.02, jitter=0.01),
+    "slow": dict(latency=3.0),
+    "flaky": dict(latency=0.05, failure_rate=0.5),
+    "down": dict(failure_rate=1.0),
+}
+
+
+async def _drive(
+    call: Callable[[str], Awaitable[object]], requests: int, concurrency: int
+) -> Tuple[List[float], int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await call(TERMS[index % len(TERMS)])
+                if not result:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    return latencies, errors
+
+
+async def run_scenario(name: str, requests: int, concurrency: int, quota: bool) -> None:
+    fake = FakeTenor(**SCENARIOS[name])
+    actions.TENOR_SEARCH_URL = await fake.start()
+    async with aiohttp.ClientSession() as session:
+        cog = actions.Actions(SimpleNamespace(http_session=session))
+        # Persistence is not part of what is measured here.
+        cog.gifs.load = cog.gifs.save = None
+        if not quota:
+            cog.tenor_quota = TokenBucket(rate=float("inf"), capacity=float("inf"))
+
+        for label, call in (("upstream", cog.fetch_gifs), ("cached", cog.get_gif)):
+            upstream_before = fake.requests
+            latencies, errors = await _drive(call, requests, concurrency)
+            print(
+                f"{name:8} {label:9} {format_ms(percentiles(latencies))}  "
+                f"errors={errors}/{requests}  tenor_requests={fake.requests - upstream_before}"
+            )
+        print(f"{'':8} breaker   {cog.tenor_breaker.stats()}")
+        if quota:
+            print(f"{'':8} quota     {cog.tenor_quota.stats()}")
+        await cog.gifs.close()
+    await fake.stop()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append")
+    parser.add_argument(
+        "--with-quota", action="store_true", help="keep the Tenor token bucket enabled"
+    )
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        await run_scenario(name, args.requests, args.concurrency, args.with_quota)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,23 +2,63 @@
 
 All commands are implemented as hybrid commands so they can be invoked
 either via prefix or as slash commands.  A shared helper handles the
-repeated work of fetching GIFs and composing the embeds.
+repeated work of fetching GIFs and composing the embeds.  Search results
+are kept per search term in a :class:`~utils.gifs.GifPoolCache`, so most
+commands never reach Tenor at all.  The pools are persisted to the database
+so a restart does not start cold.
+
+Tenor calls run under a strict latency budget behind a circuit breaker and
+a token-bucket quota in which background refreshes yield to user-facing
+misses.  When Tenor is down or the quota is spent and no cached pool
+exists, commands fall back to GIF files under ``assets/gifs/<verb>/``.
 """
 
 from __future__ import annotations
 
 import os
 import random
-from typing import Optional
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import aiohttp
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
+from utils.gifs import GifPoolCache
+from utils.ratelimit import TokenBucket
+from utils.resilience import CircuitBreaker, call_with_budget
+from .storage import load_gif_pools, save_gif_pool
+
 
 load_dotenv()
 TENOR_API_KEY = os.getenv("TENOR_API")
+TENOR_SEARCH_URL = os.getenv("TENOR_SEARCH_URL", "https://tenor.googleapis.com/v2/search")
+TENOR_TIMEOUT = aiohttp.ClientTimeout(total=float(os.getenv("TENOR_TIMEOUT", "5")))
+# Total time a Tenor lookup may take, retries included.  Slash commands must
+# be answered within 3 seconds, so this stays well below that.
+TENOR_BUDGET = float(os.getenv("TENOR_BUDGET", "2"))
+TENOR_RETRIES = int(os.getenv("TENOR_RETRIES", "2"))
+TENOR_BREAKER_THRESHOLD = int(os.getenv("TENOR_BREAKER_THRESHOLD", "5"))
+TENOR_BREAKER_RESET = float(os.getenv("TENOR_BREAKER_RESET", "30"))
+TENOR_QUOTA_PER_MINUTE = float(os.getenv("TENOR_QUOTA_PER_MINUTE", "30"))
+TENOR_QUOTA_BURST = float(os.getenv("TENOR_QUOTA_BURST", "10"))
+# Tokens background refreshes must leave for user-facing cache misses
+TENOR_QUOTA_RESERVE = float(os.getenv("TENOR_QUOTA_RESERVE", "3"))
+GIF_POOL_TTL = float(os.getenv("GIF_POOL_TTL", str(6 * 60 * 60)))
+GIF_POOL_REFRESH_AHEAD = float(os.getenv("GIF_POOL_REFRESH_AHEAD", str(30 * 60)))
+FALLBACK_GIF_DIR = Path(__file__).resolve().parent.parent / "assets" / "gifs"
+
+
+def load_fallback_gifs(directory: Path = FALLBACK_GIF_DIR) -> Dict[str, List[Path]]:
+    """Return the bundled fallback GIF files grouped by action verb."""
+    if not directory.is_dir():
+        return {}
+    return {
+        folder.name: sorted(folder.glob("*.gif"))
+        for folder in directory.iterdir()
+        if folder.is_dir()
+    }
 
 
 class Actions(commands.Cog):
@@ -26,29 +66,66 @@ class Actions(commands.Cog):
 
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.tenor_breaker = CircuitBreaker(
+            "tenor", TENOR_BREAKER_THRESHOLD, TENOR_BREAKER_RESET
+        )
+        self.tenor_quota = TokenBucket(
+            TENOR_QUOTA_PER_MINUTE / 60, TENOR_QUOTA_BURST, TENOR_QUOTA_RESERVE
+        )
+        self.fallback_gifs = load_fallback_gifs()
+        self.gifs = GifPoolCache(
+            self.fetch_gifs,
+            GIF_POOL_TTL,
+            GIF_POOL_REFRESH_AHEAD,
+            load=load_gif_pools,
+            save=save_gif_pool,
+        )
+
+    async def cog_load(self) -> None:
+        self.gifs.start_loading()
+
+    async def cog_unload(self) -> None:
+        await self.gifs.close()
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
 
     async def get_gif(self, search_term: str) -> Optional[str]:
-        """Fetch a random GIF URL from Tenor for ``search_term``."""
+        """Return a random GIF URL for ``search_term`` from the pool cache."""
+        return await self.gifs.get(search_term)
+
+    async def fetch_gifs(self, search_term: str, background: bool = False) -> List[str]:
+        """Search Tenor within quota, latency budget and circuit breaker.
 
-        url = (
-            "https://tenor.googleapis.com/v2/search"
-            f"?q={search_term}&key={TENOR_API_KEY}&limit=100"
+        Every request sent to Tenor, retries included, takes a quota token.
+        Raises :class:`~utils.ratelimit.QuotaExceededError` when the quota
+        has no token for this priority, so the caller keeps its cached pool.
+        """
+        return await call_with_budget(
+            lambda: self.search_gifs(search_term),
+            budget=TENOR_BUDGET,
+            breaker=self.tenor_breaker,
+            retries=TENOR_RETRIES,
+            before_attempt=lambda: self.tenor_quota.acquire(low_priority=background),
         )
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status != 200:
-                    return None
-                data = await response.json()
-        results = data.get("results", [])
-        if not results:
-            return None
-        choice = random.choice(results)
-        media = choice.get("media_formats", {})
-        return media.get("gif", {}).get("url")
+
+    async def search_gifs(self, search_term: str) -> List[str]:
+        """Fetch every GIF URL Tenor returns for ``search_term``."""
+
+        params = {"q": search_term, "key": TENOR_API_KEY, "limit": 100}
+        # The bot's shared session keeps connections to Tenor alive between commands
+        async with self.bot.http_session.get(
+            TENOR_SEARCH_URL, params=params, timeout=TENOR_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+        urls = []
+        for result in data.get("results", []):
+            url = result.get("media_formats", {}).get("gif", {}).get("url")
+            if url:
+                urls.append(url)
+        return urls
 
     async def _action(
         self,
@@ -68,7 +145,8 @@ class Actions(commands.Cog):
             return
 
         gif_url = await self.get_gif(search_term)
-        if gif_url is None:
+        fallback = self.fallback_gifs.get(verb)
+        if gif_url is None and not fallback:
             await ctx.send(embed=discord.Embed(description=failure, color=discord.Color.red()))
             return
 
@@ -77,16 +155,33 @@ class Actions(commands.Cog):
         embed = SyaaEmbed(
             description=f"**{ctx.author.name}** {sentence} **{member.name}**!",
         )
-        embed.set_image(url=gif_url)
         embed.set_footer(
             text=footer_other if member.id != 1025969591165403146 else footer_self
         )
-        await ctx.send(embed=embed)
+        if gif_url is not None:
+            embed.set_image(url=gif_url)
+            await ctx.send(embed=embed)
+            return
+
+        # Tenor is unavailable: attach a bundled GIF instead
+        path = random.choice(fallback)
+        embed.set_image(url=f"attachment://{path.name}")
+        await ctx.send(embed=embed, file=discord.File(path, filename=path.name))
 
     # ------------------------------------------------------------------
     # Commands
     # ------------------------------------------------------------------
 
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def gifstats(self, ctx: commands.Context) -> None:
+        """Show GIF cache, Tenor quota and circuit breaker metrics."""
+        await ctx.send(
+            f"Cache: `{self.gifs.stats()}`\n"
+            f"Quota: `{self.tenor_quota.stats()}`\n"
+            f"Breaker: `{self.tenor_breaker.stats()}`"
+        )
+
     @commands.hybrid_command(description="Cuddle the mentioned user!")
     async def cuddle(
         self, ctx: commands.Context, member: Optional[discord.Member] = None
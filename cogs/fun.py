@@ -4,31 +4,119 @@ from __future__ import annotations
 
 import asyncio
 import random
+import re
+from functools import partial
 
 import discord
 from discord.ext import commands
 
+from utils.gamestate import GameStore
+from utils.pagination import LeaderboardView
+from utils.sessions import EVICTION_MESSAGES, Session, SessionLimitError, session_message
 from utils.ui import SyaaEmbed, SuccessEmbed, ErrorEmbed, InfoEmbed
-from .storage import get_leaderboard_async, get_user_stats_async, record_loss, record_win
+from .storage import (
+    get_leaderboard_page,
+    get_user_rank,
+    get_user_stats_async,
+    record_loss,
+    record_win,
+)
+
+
+RPS_CHOICES = {
+    "rock": ("Rock", "🪨"),
+    "paper": ("Paper", "📄"),
+    "scissors": ("Scissors", "✂️"),
+}
+
+
+class RPSButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"rps:(?P<user>\d+):(?P<choice>rock|paper|scissors)",
+):
+    """A rock/paper/scissors choice; the player is part of the ``custom_id``.
+
+    Registered once with :meth:`commands.Bot.add_dynamic_items`, so it keeps
+    working for games started before a restart.
+    """
+
+    def __init__(self, user_id: int, choice: str, disabled: bool = False) -> None:
+        label, emoji = RPS_CHOICES[choice]
+        super().__init__(
+            discord.ui.Button(
+                label=label,
+                emoji=emoji,
+                style=discord.ButtonStyle.secondary,
+                custom_id=f"rps:{user_id}:{choice}",
+                disabled=disabled,
+            )
+        )
+        self.user_id = user_id
+        self.choice = choice
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]
+    ) -> RPSButton:
+        return cls(int(match["user"]), match["choice"])
+
+    async def callback(self, interaction: discord.Interaction) -> None:  # type: ignore[override]
+        cog: Fun = interaction.client.get_cog("Fun")  # type: ignore[assignment]
+        await cog.play_rps(interaction, self.user_id, self.choice)
+
+
+def rps_view(user_id: int, disabled: bool = False) -> discord.ui.View:
+    """One button per weapon for ``user_id``'s game, all greyed out once ``disabled``."""
+    view = discord.ui.View(timeout=None)
+    for choice in RPS_CHOICES:
+        view.add_item(RPSButton(user_id, choice, disabled))
+    return view
 
 
-class RPSView(discord.ui.View):
-    def __init__(self, bot: commands.Bot, user: discord.Member, guild_id: int):
-        super().__init__(timeout=60)
+class Fun(commands.Cog):
+    def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.user = user
-        self.guild_id = guild_id
+        # Messages whose game has been played, so a double click only counts once.
+        self.rps_games: GameStore[int, bool] = GameStore()
+
+    async def cog_load(self) -> None:
+        self.bot.add_dynamic_items(RPSButton)
+        self.bot.sessions.register("rps", self.on_rps_evicted)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(RPSButton)
+        self.bot.sessions.unregister("rps")
+
+    async def on_rps_evicted(self, session: Session, reason: str) -> None:
+        message = session_message(self.bot, session)
+        if message is None:
+            return
+        embed = SyaaEmbed(title="Rock Paper Scissors", description=EVICTION_MESSAGES[reason])
+        self.bot.renderer.schedule(message, embed=embed, view=rps_view(session.owner, disabled=True))
 
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        if interaction.user != self.user:
+    async def play_rps(self, interaction: discord.Interaction, user_id: int, choice: str) -> None:
+        # Checked before the session is touched, so someone else's click
+        # neither plays nor keeps the game alive.
+        if interaction.user.id != user_id:
             await interaction.response.send_message("Start your own game!", ephemeral=True)
-            return False
-        return True
+            return
+        key = interaction.message.id
+        guild_id = interaction.guild_id or 0
+        async with self.rps_games.lock(key):
+            if await self.rps_games.get(key):
+                await interaction.response.send_message(
+                    "This game is already over.", ephemeral=True
+                )
+                return
+            if not self.bot.sessions.touch(
+                "rps", key, guild_id, interaction.channel_id, user_id, message_id=key
+            ):
+                await interaction.response.send_message("This game has expired.", ephemeral=True)
+                return
+            self.rps_games.set(key, True)
+            self.bot.sessions.end("rps", key)
+        bot_choice = random.choice(list(RPS_CHOICES))
 
-    async def play(self, interaction: discord.Interaction, choice: str):
-        choices = ["rock", "paper", "scissors"]
-        bot_choice = random.choice(choices)
-        
         # Calculate result
         if choice == bot_choice:
             result = "It's a tie!"
@@ -39,41 +127,33 @@ class RPSView(discord.ui.View):
             or (choice == "scissors" and bot_choice == "paper")
         ):
             result = "You win! 🎉"
-            await record_win(self.guild_id, self.user.id)
+            await record_win(guild_id, user_id)
             color = discord.Color.green()
         else:
             result = "You lose! 💀"
-            await record_loss(self.guild_id, self.user.id)
+            await record_loss(guild_id, user_id)
             color = discord.Color.red()
 
         embed = SyaaEmbed(title="Rock Paper Scissors", color=color)
         embed.description = f"**{result}**"
         embed.add_field(name="Your Choice", value=choice.title(), inline=True)
         embed.add_field(name="My Choice", value=bot_choice.title(), inline=True)
-        
-        # Disable all buttons
-        for item in self.children:
-            item.disabled = True
-
-        await interaction.response.edit_message(embed=embed, view=self)
-        self.stop()
 
-    @discord.ui.button(label="Rock", emoji="🪨", style=discord.ButtonStyle.secondary)
-    async def rock(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.play(interaction, "rock")
-
-    @discord.ui.button(label="Paper", emoji="📄", style=discord.ButtonStyle.secondary)
-    async def paper(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.play(interaction, "paper")
-
-    @discord.ui.button(label="Scissors", emoji="✂️", style=discord.ButtonStyle.secondary)
-    async def scissors(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await self.play(interaction, "scissors")
-
-
-class Fun(commands.Cog):
-    def __init__(self, bot: commands.Bot) -> None:
-        self.bot = bot
+        await interaction.response.edit_message(embed=embed, view=rps_view(user_id, disabled=True))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def gamestats(self, ctx: commands.Context) -> None:
+        """Show running game sessions, render coalescing and the game state stores."""
+        lines = [
+            f"Sessions: `{self.bot.sessions.stats()}`",
+            f"Renders: `{self.bot.renderer.stats()}`",
+        ]
+        for name, attribute in (("Fun", "rps_games"), ("TicTacToe", "games"), ("Hangman", "games")):
+            cog = self.bot.get_cog(name)
+            if cog is not None:
+                lines.append(f"{name} states: `{getattr(cog, attribute).stats()}`")
+        await ctx.send("\n".join(lines))
 
     # coin flip
     @commands.hybrid_command(description="Flip a coin!")
@@ -92,9 +172,21 @@ class Fun(commands.Cog):
     # rock, paper, scissors
     @commands.hybrid_command(description="Play rock, paper, scissors with the bot")
     async def rps(self, ctx: commands.Context) -> None:
+        try:
+            session = await self.bot.sessions.open(
+                "rps", ctx.guild.id if ctx.guild else 0, ctx.channel.id, ctx.author.id
+            )
+        except SessionLimitError as exc:
+            await ctx.send(embed=ErrorEmbed(str(exc)))
+            return
+
         embed = SyaaEmbed(title="Rock Paper Scissors", description="Choose your weapon!")
-        view = RPSView(self.bot, ctx.author, ctx.guild.id if ctx.guild else 0)
-        await ctx.send(embed=embed, view=view)
+        try:
+            message = await ctx.send(embed=embed, view=rps_view(ctx.author.id))
+        except BaseException:
+            self.bot.sessions.discard(session)
+            raise
+        self.bot.sessions.bind(session, message.id, message.id)
 
     @commands.hybrid_command(
         description="Show RPS stats for a user or this server's leaderboard"
@@ -106,27 +198,23 @@ class Fun(commands.Cog):
 
         if member is not None:
             wins, losses = await get_user_stats_async(guild_id, member.id)
+            rank = await get_user_rank(guild_id, member.id, "rps")
             embed = SyaaEmbed(title=f"RPS Stats: {member.display_name}")
             embed.add_field(name="Wins", value=str(wins), inline=True)
             embed.add_field(name="Losses", value=str(losses), inline=True)
+            embed.add_field(name="Rank", value=f"#{rank}" if rank else "Unranked", inline=True)
             embed.set_thumbnail(url=member.display_avatar.url)
             await ctx.send(embed=embed)
             return
 
-        leaderboard = await get_leaderboard_async(guild_id)
-        if not leaderboard:
+        fetch = partial(get_leaderboard_page, guild_id, "rps")
+        page = await fetch()
+        if not page.rows:
             await ctx.send(embed=InfoEmbed("No RPS games have been played yet!"))
             return
 
-        lines = []
-        for index, (user_id, wins, losses) in enumerate(leaderboard, start=1):
-            user = ctx.guild.get_member(user_id) if ctx.guild else self.bot.get_user(user_id)
-            name = user.display_name if user else f"User {user_id}"
-            lines.append(f"`{index}.` **{name}** • {wins}W / {losses}L")
-
-        embed = SyaaEmbed(title="🏆 RPS Leaderboard")
-        embed.description = "\n".join(lines)
-        await ctx.send(embed=embed)
+        view = LeaderboardView(self.bot, ctx.author, ctx.guild, "🏆 RPS Leaderboard", fetch, page)
+        view.message = await ctx.send(embed=view.build_embed(), view=view)
 
 
 async def setup(bot: commands.Bot) -> None:
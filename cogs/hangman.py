@@ -1,136 +1,576 @@
-"""Hangman game cog."""
+"""Hangman game cog.
+
+Words come from the indexed corpus in :mod:`utils.words` (built from the
+lists under ``assets/words``), so ``/hangman`` can filter by category and
+difficulty without loading the word lists into memory.  The same corpus
+drives the hint button and the bot opponent.
+
+The game components are stateless (see :mod:`utils.gamestate`): guessed
+letters, hints used and whose turn it is are encoded in their
+``custom_id``, while the word is kept in the ``game_states`` table so it
+never shows up in the message payload.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import os
 import random
+import re
+import secrets
 import string
+from functools import partial
+from typing import FrozenSet, Iterable, List, Literal, NamedTuple, Optional, Set, Tuple
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
-from .storage import record_hangman_win, record_hangman_loss
+from utils.gamestate import GameStore
+from utils.pagination import LeaderboardView
+from utils.sessions import EVICTION_MESSAGES, Session, SessionLimitError, session_message
+from utils.ui import InfoEmbed, SyaaEmbed
+from utils.words import WordCorpus, load_corpus
+from .storage import (
+    delete_game_state,
+    get_hangman_user_stats,
+    get_leaderboard_page,
+    get_user_rank,
+    load_game_state,
+    prune_game_states,
+    record_hangman_loss,
+    record_hangman_win,
+    save_game_state,
+)
+
+HANGMAN_LANGUAGE = os.getenv("HANGMAN_LANGUAGE", "en")
+
+MAX_MISSES = 6
+MAX_HINTS = 2
+# Words of games nobody finished are forgotten after a week.
+GAME_STATE_MAX_AGE = 7 * 24 * 60 * 60
+
+HALVES = {"a": string.ascii_lowercase[:13], "n": string.ascii_lowercase[13:]}
+
+
+def _letter_mask(letters: Iterable[str]) -> int:
+    return sum(1 << (ord(letter) - ord("a")) for letter in letters)
 
-WORDS = [
-    "python",
-    "discord",
-    "hangman",
-    "bot",
-    "cog",
-    "extension",
-    "asyncio",
-    "database",
-]
+
+def _mask_letters(mask: int) -> FrozenSet[str]:
+    return frozenset(letter for i, letter in enumerate(string.ascii_lowercase) if mask >> i & 1)
+
+
+class HangmanRef(NamedTuple):
+    """The part of a game that is encoded in its components' ``custom_id``.
+
+    The word is not: it stays in the ``game_states`` table, keyed by the
+    random game id.
+    """
+
+    game: str
+    guessed: FrozenSet[str] = frozenset()
+    hints_used: int = 0
+    turn: int = 0
+
+    @classmethod
+    def decode(cls, match: re.Match[str]) -> HangmanRef:
+        return cls(
+            match["game"],
+            _mask_letters(int(match["guessed"], 16)),
+            int(match["hints"]),
+            int(match["turn"]),
+        )
+
+    def encode(self) -> str:
+        return f"hm:{self.game}:{_letter_mask(self.guessed):x}:{self.hints_used}:{self.turn}"
+
+
+class HangmanState(NamedTuple):
+    """A game of hangman.
+
+    With two members both may guess at any time and they win or lose
+    together.  When the second player is the bot itself (``versus_bot``),
+    the players take turns and whoever reveals the last letter wins; the
+    bot guesses the letter found in most of the corpus words that still fit.
+    """
+
+    game: str
+    word: str
+    players: Tuple[int, ...]
+    versus_bot: bool
+    category: Optional[str]
+    guild_id: int
+    guessed: FrozenSet[str] = frozenset()
+    hints_used: int = 0
+    turn: int = 0
+
+    @property
+    def ref(self) -> HangmanRef:
+        return HangmanRef(self.game, self.guessed, self.hints_used, self.turn)
+
+    @property
+    def progress(self) -> List[str]:
+        return [c if c in self.guessed or not c.isalpha() else "_" for c in self.word]
+
+    @property
+    def misses(self) -> int:
+        return len(self.guessed - set(self.word))
+
+    @property
+    def current_player(self) -> int:
+        return self.players[self.turn]
+
+    @property
+    def outcome(self) -> Optional[str]:
+        """``"win"``/``"loss"`` once the game is over, otherwise ``None``."""
+        if "_" not in self.progress:
+            return "win"
+        if self.misses >= MAX_MISSES:
+            return "loss"
+        return None
+
+    def guess(self, letter: str) -> HangmanState:
+        state = self._replace(guessed=self.guessed | {letter})
+        if self.versus_bot and state.outcome is None:
+            state = state._replace(turn=1 - self.turn)
+        return state
+
+    def format_status(self) -> str:
+        missed = sorted(self.guessed - set(self.word))
+        lines = [
+            f"Word: {' '.join(self.progress)}",
+            f"Misses: {self.misses}/{MAX_MISSES}",
+        ]
+        if missed:
+            lines.append(f"Wrong letters: {' '.join(letter.upper() for letter in missed)}")
+        if self.versus_bot:
+            lines.append(f"Turn: <@{self.current_player}>")
+        return "\n".join(lines)
 
 
-class HangmanButton(discord.ui.Button):
-    def __init__(self, letter: str) -> None:
-        index = string.ascii_lowercase.index(letter)
+class HangmanLetters(
+    discord.ui.DynamicItem[discord.ui.Select],
+    template=r"hm:(?P<game>[0-9a-f]+):(?P<guessed>[0-9a-f]+):(?P<hints>\d+):(?P<turn>\d):(?P<half>[an])",
+):
+    """Dropdown with the letters of one half of the alphabet not yet guessed."""
+
+    def __init__(self, ref: HangmanRef, half: str, finished: bool = False) -> None:
+        letters = HALVES[half]
+        options = [
+            discord.SelectOption(label=letter.upper(), value=letter)
+            for letter in letters
+            if letter not in ref.guessed
+        ]
         super().__init__(
-            label=letter.upper(),
-            style=discord.ButtonStyle.secondary,
-            row=index // 5,
+            discord.ui.Select(
+                placeholder=f"Guess a letter ({letters[0].upper()}–{letters[-1].upper()})",
+                # A select needs at least one option, even when it is disabled.
+                options=options or [discord.SelectOption(label="-", value="-")],
+                disabled=finished or not options,
+                row=0 if half == "a" else 1,
+                custom_id=f"{ref.encode()}:{half}",
+            )
         )
-        self.letter = letter
+        self.ref = ref
+
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Select, match: re.Match[str]
+    ) -> HangmanLetters:
+        return cls(HangmanRef.decode(match), match["half"])
 
     async def callback(self, interaction: discord.Interaction) -> None:  # type: ignore[override]
-        view: HangmanView = self.view  # type: ignore[assignment]
-        await view.handle_guess(interaction, self)
+        cog: Hangman = interaction.client.get_cog("Hangman")  # type: ignore[assignment]
+        await cog.handle_guess(interaction, self.ref, self.item.values[0])
 
 
-class HangmanView(discord.ui.View):
-    def __init__(self, players: list[discord.Member], word: str) -> None:
-        super().__init__(timeout=180)
-        self.players = players
-        self.word = word
-        self.progress = ["_" if c.isalpha() else c for c in word]
-        self.misses = 0
-        self.max_misses = 6
+class HangmanHint(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"hm:(?P<game>[0-9a-f]+):(?P<guessed>[0-9a-f]+):(?P<hints>\d+):(?P<turn>\d):h",
+):
+    def __init__(self, ref: HangmanRef, finished: bool = False) -> None:
+        super().__init__(
+            discord.ui.Button(
+                label=f"Hint ({MAX_HINTS - ref.hints_used} left)",
+                emoji="💡",
+                style=discord.ButtonStyle.secondary,
+                disabled=finished,
+                row=2,
+                custom_id=f"{ref.encode()}:h",
+            )
+        )
+        self.ref = ref
 
-        for letter in string.ascii_lowercase:
-            self.add_item(HangmanButton(letter))
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]
+    ) -> HangmanHint:
+        return cls(HangmanRef.decode(match))
 
-    def format_status(self) -> str:
-        return (
-            f"Word: {' '.join(self.progress)}\n"
-            f"Misses: {self.misses}/{self.max_misses}"
+    async def callback(self, interaction: discord.Interaction) -> None:  # type: ignore[override]
+        cog: Hangman = interaction.client.get_cog("Hangman")  # type: ignore[assignment]
+        await cog.handle_hint(interaction, self.ref)
+
+
+def hangman_view(state: HangmanState, finished: bool = False) -> discord.ui.View:
+    """Both letter dropdowns and the hint button for ``state``, disabled once ``finished``."""
+    view = discord.ui.View(timeout=None)
+    view.add_item(HangmanLetters(state.ref, "a", finished))
+    view.add_item(HangmanLetters(state.ref, "n", finished))
+    view.add_item(HangmanHint(state.ref, finished))
+    return view
+
+
+class Hangman(commands.Cog):
+    help_category = "games"
+
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+        self.corpus: Optional[WordCorpus] = None
+        self.games: GameStore[str, HangmanState] = GameStore()
+        # Bot turns resumed for restored games, kept so they are not collected.
+        self.resumed_turns: Set[asyncio.Task[None]] = set()
+
+    async def cog_load(self) -> None:
+        # Rebuilding a stale corpus reads every word list, so keep it off
+        # the event loop.
+        self.corpus = await asyncio.to_thread(load_corpus)
+        self.bot.add_dynamic_items(HangmanLetters, HangmanHint)
+        self.bot.sessions.register("hangman", self.on_evicted)
+        await prune_game_states(GAME_STATE_MAX_AGE)
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(HangmanLetters, HangmanHint)
+        self.bot.sessions.unregister("hangman")
+        for task in self.resumed_turns:
+            task.cancel()
+        if self.corpus is not None:
+            self.corpus.close()
+            self.corpus = None
+
+    async def get_game(
+        self, ref: HangmanRef, message: Optional[discord.Message] = None
+    ) -> Optional[HangmanState]:
+        """The latest state of ``ref.game``, rebuilt from ``ref`` if needed.
+
+        A game rebuilt on the bot's turn (its move was lost in a restart)
+        gets that move played on ``message``.
+        """
+
+        async def load() -> Optional[HangmanState]:
+            data = await load_game_state(ref.game)
+            if data is None:
+                return None
+            state = HangmanState(
+                ref.game,
+                data["word"],
+                tuple(data["players"]),
+                data["versus_bot"],
+                data["category"],
+                data["guild_id"],
+                ref.guessed,
+                ref.hints_used,
+                ref.turn,
+            )
+            if (
+                message is not None
+                and state.versus_bot
+                and state.outcome is None
+                and state.current_player == self.bot.user.id
+            ):
+                task = asyncio.create_task(self.bot_turn(message, ref.game))
+                self.resumed_turns.add(task)
+                task.add_done_callback(self.resumed_turns.discard)
+            return state
+
+        return await self.games.get(ref.game, load)
+
+    async def on_evicted(self, session: Session, reason: str) -> None:
+        """Forget an abandoned game, its word included, and disable it."""
+        async with self.games.lock(session.key):
+            state = await self.get_game(HangmanRef(session.key))
+            self.games.discard(session.key)
+            await delete_game_state(session.key)
+        message = session_message(self.bot, session)
+        if message is None or state is None:
+            return
+        embed = discord.Embed(
+            title="Hangman",
+            description=f"{EVICTION_MESSAGES[reason]} The word was **{state.word}**.",
         )
+        self.bot.renderer.schedule(message, embed=embed, view=hangman_view(state, finished=True))
+
+    async def check_player(
+        self,
+        interaction: discord.Interaction,
+        state: Optional[HangmanState],
+        turn: bool = False,
+    ) -> bool:
+        """Whether the click may act on ``state``, answering it if not.
 
-    async def handle_guess(self, interaction: discord.Interaction, button: HangmanButton) -> None:
-        if interaction.user not in self.players:
+        ``turn`` also requires it to be the clicker's turn against the bot.
+        """
+        if state is None or state.outcome is not None:
+            await interaction.response.send_message("This game is already over.", ephemeral=True)
+            return False
+        # Only a player's click counts as activity; a bystander's must not
+        # keep an abandoned game alive.
+        if interaction.user.id not in state.players:
             await interaction.response.send_message(
                 "You're not playing this game.", ephemeral=True
             )
-            return
+            return False
+        if turn and state.versus_bot and interaction.user.id != state.current_player:
+            await interaction.response.send_message("It's not your turn!", ephemeral=True)
+            return False
+        if not self.bot.sessions.touch(
+            "hangman",
+            state.game,
+            state.guild_id,
+            interaction.channel_id,
+            state.players[0],
+            state.players,
+            interaction.message.id,
+        ):
+            await interaction.response.send_message("This game has expired.", ephemeral=True)
+            return False
+        return True
 
-        button.disabled = True
-        letter = button.letter
-        finished: str | None = None
+    async def handle_guess(
+        self, interaction: discord.Interaction, ref: HangmanRef, letter: str
+    ) -> None:
+        async with self.games.lock(ref.game):
+            state = await self.get_game(ref, interaction.message)
+            if not await self.check_player(interaction, state, turn=True):
+                return
+            # Another player may have picked the same letter since this
+            # dropdown was rendered.
+            if letter in state.guessed:
+                await interaction.response.send_message(
+                    f"**{letter.upper()}** was already guessed.", ephemeral=True
+                )
+                return
 
-        if letter in self.word:
-            for idx, char in enumerate(self.word):
-                if char == letter:
-                    self.progress[idx] = char
-            if "_" not in self.progress:
-                finished = "win"
-        else:
-            self.misses += 1
-            button.style = discord.ButtonStyle.danger
-            if self.misses >= self.max_misses:
-                finished = "loss"
-
-        guild_id = interaction.guild.id if interaction.guild else 0
-
-        if finished == "win":
-            for child in self.children:
-                child.disabled = True
-            for player in self.players:
-                await record_hangman_win(guild_id, player.id)
-            description = (
-                f"{' and '.join(p.mention for p in self.players)} guessed the word "
-                f"**{self.word}**!"
+            state = state.guess(letter)
+            self.games.set(ref.game, state)
+            # Acknowledge now; the board is redrawn by the render scheduler,
+            # which merges guesses made in quick succession.
+            await interaction.response.defer()
+            if state.outcome is not None:
+                await self.finish(state, interaction.user.id, interaction.message)
+                return
+
+            embed = discord.Embed(title="Hangman", description=state.format_status())
+            self.bot.renderer.schedule(interaction.message, embed=embed, view=hangman_view(state))
+
+        if state.versus_bot:
+            await self.bot_turn(interaction.message, ref.game)
+
+    async def bot_turn(self, message: discord.Message, game: str) -> None:
+        """Let the bot guess the letter most likely to be in the word."""
+        await asyncio.sleep(random.uniform(0.5, 1.5))  # Simulate thinking
+
+        async with self.games.lock(game):
+            state = await self.games.get(game)
+            if state is None or state.outcome is not None:
+                return
+            if state.current_player != self.bot.user.id:
+                return
+
+            guess = self.corpus.best_guess(
+                HANGMAN_LANGUAGE, state.progress, state.guessed, state.category
             )
-            embed = discord.Embed(title="Hangman", description=description)
-            await interaction.response.edit_message(embed=embed, view=self)
-            self.stop()
-            return
+            if guess.letter is None:
+                return
+            state = state.guess(guess.letter)
+            self.games.set(game, state)
+            if state.outcome is not None:
+                await self.finish(state, self.bot.user.id, message)
+                return
 
-        if finished == "loss":
-            for child in self.children:
-                child.disabled = True
-            for player in self.players:
-                await record_hangman_loss(guild_id, player.id)
-            description = f"No more guesses! The word was **{self.word}**."
-            embed = discord.Embed(title="Hangman", description=description)
-            await interaction.response.edit_message(embed=embed, view=self)
-            self.stop()
-            return
+            embed = discord.Embed(
+                title="Hangman",
+                description=f"{self.bot.user.mention} guessed **{guess.letter.upper()}**.\n"
+                + state.format_status(),
+            )
+            self.bot.renderer.schedule(message, embed=embed, view=hangman_view(state))
 
-        embed = discord.Embed(title="Hangman", description=self.format_status())
-        await interaction.response.edit_message(embed=embed, view=self)
+    async def finish(self, state: HangmanState, guesser: int, message: discord.Message) -> None:
+        """Store the results, forget the word and show the final message."""
+        for player in state.players:
+            if player == self.bot.user.id:
+                continue
+            # Against the bot only the player who completes the word wins.
+            won = state.outcome == "win" and (not state.versus_bot or player == guesser)
+            if won:
+                await record_hangman_win(state.guild_id, player)
+            else:
+                await record_hangman_loss(state.guild_id, player)
+        await delete_game_state(state.game)
+        self.bot.sessions.end("hangman", state.game)
 
+        if state.outcome == "win":
+            winners = [guesser] if state.versus_bot else state.players
+            description = (
+                f"{' and '.join(f'<@{p}>' for p in winners)} guessed the word "
+                f"**{state.word}**!"
+            )
+        else:
+            description = f"No more guesses! The word was **{state.word}**."
+        embed = discord.Embed(title="Hangman", description=description)
+        self.bot.renderer.schedule(message, embed=embed, view=hangman_view(state, finished=True))
 
-class Hangman(commands.Cog):
-    def __init__(self, bot: commands.Bot) -> None:
-        self.bot = bot
+    async def handle_hint(self, interaction: discord.Interaction, ref: HangmanRef) -> None:
+        async with self.games.lock(ref.game):
+            state = await self.get_game(ref, interaction.message)
+            if not await self.check_player(interaction, state):
+                return
+            if state.hints_used >= MAX_HINTS:
+                await interaction.response.send_message("No hints left!", ephemeral=True)
+                return
+
+            state = state._replace(hints_used=state.hints_used + 1)
+            self.games.set(ref.game, state)
+            guess = self.corpus.best_guess(
+                HANGMAN_LANGUAGE, state.progress, state.guessed, state.category
+            )
+            left = MAX_HINTS - state.hints_used
+            if guess.candidates:
+                text = (
+                    f"{guess.candidates} known words fit. **{guess.letter.upper()}** "
+                    f"is in {guess.matches} of them."
+                )
+            else:
+                text = f"Try **{guess.letter.upper()}**."
+            await interaction.response.send_message(
+                f"💡 {text} ({left} hint{'s' if left != 1 else ''} left)", ephemeral=True
+            )
+            # The hint count is part of every component's custom_id.
+            self.bot.renderer.schedule(interaction.message, view=hangman_view(state))
 
     @commands.hybrid_command(description="Play a game of Hangman")
-    async def hangman(self, ctx: commands.Context, opponent: discord.Member | None = None) -> None:
-        players = [ctx.author]
+    @app_commands.describe(
+        opponent="Play together with another member, or against the bot",
+        difficulty="How hard the word should be",
+        category="Pick the word from this category",
+    )
+    async def hangman(
+        self,
+        ctx: commands.Context,
+        opponent: discord.Member | None = None,
+        difficulty: Literal["easy", "medium", "hard"] | None = None,
+        category: str | None = None,
+    ) -> None:
+        players: list[discord.abc.User] = [ctx.author]
         if opponent is not None:
-            if opponent == ctx.author or opponent.bot:
+            if opponent == ctx.author or (opponent.bot and opponent != self.bot.user):
                 await ctx.send("Please challenge someone else!")
                 return
             players.append(opponent)
 
-        word = random.choice(WORDS)
-        view = HangmanView(players, word)
-        embed = discord.Embed(
-            title="Hangman",
-            description=(
-                f"Players: {' and '.join(p.mention for p in players)}\n" + view.format_status()
-            ),
-        )
-        await ctx.send(embed=embed, view=view)
+        categories = self.corpus.categories_for(HANGMAN_LANGUAGE)
+        if category is not None:
+            category = category.lower()
+            if category not in categories:
+                await ctx.send(f"Unknown category. Choose one of: {', '.join(categories)}")
+                return
+
+        word = self.corpus.sample(HANGMAN_LANGUAGE, category, difficulty)
+        if word is None:
+            await ctx.send("No words match those options, try another difficulty or category.")
+            return
+        try:
+            session = await self.bot.sessions.open(
+                "hangman",
+                ctx.guild.id if ctx.guild else 0,
+                ctx.channel.id,
+                ctx.author.id,
+                tuple(player.id for player in players),
+            )
+        except SessionLimitError as exc:
+            await ctx.send(str(exc))
+            return
+
+        # Until the board is sent, any failure must release the session, or
+        # it would count against the caps until idle eviction.
+        try:
+            # Build the candidate index for this word length before the first
+            # hint or bot guess needs it.
+            await asyncio.to_thread(self.corpus.candidates, HANGMAN_LANGUAGE, len(word))
+
+            state = HangmanState(
+                game=secrets.token_hex(5),
+                word=word,
+                players=tuple(player.id for player in players),
+                versus_bot=self.bot.user in players,
+                category=category,
+                guild_id=ctx.guild.id if ctx.guild else 0,
+            )
+            await save_game_state(
+                state.game,
+                "hangman",
+                {
+                    "word": state.word,
+                    "players": list(state.players),
+                    "versus_bot": state.versus_bot,
+                    "category": state.category,
+                    "guild_id": state.guild_id,
+                },
+            )
+            self.games.set(state.game, state)
+
+            versus = " vs " if state.versus_bot else " and "
+            embed = discord.Embed(
+                title="Hangman",
+                description=(
+                    f"Players: {versus.join(p.mention for p in players)}\n" + state.format_status()
+                ),
+            )
+            message = await ctx.send(embed=embed, view=hangman_view(state))
+        except BaseException:
+            self.bot.sessions.discard(session)
+            raise
+        self.bot.sessions.bind(session, state.game, message.id)
+
+    @hangman.autocomplete("category")
+    async def category_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> list[app_commands.Choice[str]]:
+        current = current.lower()
+        return [
+            app_commands.Choice(name=category, value=category)
+            for category in self.corpus.categories_for(HANGMAN_LANGUAGE)
+            if current in category
+        ][:25]
+
+    @commands.hybrid_command(
+        description="Show Hangman stats for a user or this server's leaderboard"
+    )
+    async def hangmanstats(
+        self, ctx: commands.Context, member: discord.Member | None = None
+    ) -> None:
+        guild_id = ctx.guild.id if ctx.guild else 0
+
+        if member is not None:
+            wins, losses = await get_hangman_user_stats(guild_id, member.id)
+            rank = await get_user_rank(guild_id, member.id, "hangman")
+            embed = SyaaEmbed(title=f"Hangman Stats: {member.display_name}")
+            embed.add_field(name="Wins", value=str(wins), inline=True)
+            embed.add_field(name="Losses", value=str(losses), inline=True)
+            embed.add_field(name="Rank", value=f"#{rank}" if rank else "Unranked", inline=True)
+            embed.set_thumbnail(url=member.display_avatar.url)
+            await ctx.send(embed=embed)
+            return
+
+        fetch = partial(get_leaderboard_page, guild_id, "hangman")
+        page = await fetch()
+        if not page.rows:
+            await ctx.send(embed=InfoEmbed("No Hangman games have been played yet!"))
+            return
+
+        view = LeaderboardView(self.bot, ctx.author, ctx.guild, "🏆 Hangman Leaderboard", fetch, page)
+        view.message = await ctx.send(embed=view.build_embed(), view=view)
 
 
 async def setup(bot: commands.Bot) -> None:
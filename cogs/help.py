@@ -1,134 +1,209 @@
+"""Help menu cog.
+
+The menu is served from a :class:`HelpIndex` built once from the loaded
+cogs: every category maps to a prebuilt embed payload, so opening
+``/help`` or switching categories never walks the command tree.  The bot
+dispatches ``extensions_changed`` whenever an extension is loaded,
+unloaded or reloaded, and the index is rebuilt then.
+
+Categories are derived from the cogs.  A cog is listed under its own name
+unless it sets a ``help_category`` class attribute, which lets several
+cogs share a category (``"games"``) or, with ``None``, keeps a cog out of
+the menu.
+"""
+
+from __future__ import annotations
+
+import datetime
+import logging
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
 import discord
 from discord.ext import commands
-from utils.ui import SyaaEmbed, COLOR_MAIN
 
-class HelpSelect(discord.ui.Select):
-    """Dropdown menu for selecting help categories."""
+from utils.ui import SyaaEmbed
 
-    def __init__(self, bot: commands.Bot):
-        self.bot = bot
+
+logger = logging.getLogger(__name__)
+
+HOME = "home"
+HOME_BANNER = "https://media.tenor.com/PshgR1u72QcAAAAC/anime-welcome.gif"  # Placeholder aesthetic banner
+
+# Label, description and emoji of the known categories, in menu order.
+# Any other category is listed after these with the names of its cogs.
+CATEGORIES: Dict[str, Tuple[str, str, str]] = {
+    "moderation": ("Moderation", "Tools for server management", "🛡️"),
+    "fun": ("Fun", "Games and recreational commands", "🎉"),
+    "actions": ("Actions", "Interactions like hug, kiss, pat", "🤗"),
+    "games": ("Games", "Hangman, TicTacToe, etc.", "🎮"),
+}
+DEFAULT_EMOJI = "📁"
+
+Payload = Mapping[str, Any]
+
+
+def category_of(cog: commands.Cog) -> Optional[str]:
+    """The help category of ``cog``, or ``None`` if it is not listed."""
+    return getattr(cog, "help_category", cog.qualified_name.lower())
+
+
+def _category_payload(title: str, cogs: List[commands.Cog]) -> Payload:
+    embed = SyaaEmbed(title=f"{title} Commands")
+    for cog in cogs:
+        for cmd in cog.get_commands():
+            if cmd.hidden:
+                continue
+            # Use slash command mention if possible, else prefix
+            signature = f"/{cmd.name}" if isinstance(cmd, commands.HybridCommand) else f"!{cmd.name}"
+            embed.add_field(
+                name=f"`{signature}`",
+                value=cmd.description or "No description provided.",
+                inline=False,
+            )
+    if not embed.fields:
+        embed.description = "No commands found in this category."
+    return _freeze(embed)
+
+
+def _home_payload(bot: commands.Bot) -> Payload:
+    embed = SyaaEmbed(
+        title="✨ Syaa Help Center",
+        description=(
+            "Welcome to **Syaa**! A multi-purpose bot designed for fun and style.\n\n"
+            "📂 **Browse Commands**\n"
+            "Use the dropdown menu below to view specific categories.\n\n"
+            "❓ **Support**\n"
+            "If you find a bug or need help, contact the developer."
+        ),
+    )
+    if bot.user is not None:
+        embed.set_thumbnail(url=bot.user.display_avatar.url)
+    embed.set_image(url=HOME_BANNER)
+    return _freeze(embed)
+
+
+def _freeze(embed: discord.Embed) -> Payload:
+    # The timestamp is set when the embed is served; fields become a tuple
+    # so an embed built from the payload cannot change them.
+    payload = embed.to_dict()
+    payload.pop("timestamp", None)
+    if "fields" in payload:
+        payload["fields"] = tuple(payload["fields"])  # type: ignore[typeddict-item]
+    return MappingProxyType(dict(payload))
+
+
+class HelpIndex:
+    """Prebuilt help embeds and select options for the loaded cogs."""
+
+    def __init__(self) -> None:
+        self.payloads: Mapping[str, Payload] = MappingProxyType({})
+        self.options: Tuple[discord.SelectOption, ...] = ()
+
+    def build(self, bot: commands.Bot) -> None:
+        grouped: Dict[str, List[commands.Cog]] = {}
+        for cog in bot.cogs.values():
+            category = category_of(cog)
+            if category is not None:
+                grouped.setdefault(category, []).append(cog)
+
+        known = [category for category in CATEGORIES if category in grouped]
+        others = sorted(category for category in grouped if category not in CATEGORIES)
+        payloads = {HOME: _home_payload(bot)}
         options = [
             discord.SelectOption(
-                label="Home",
-                description="Return to the main help page",
-                emoji="🏠",
-                value="home"
-            ),
-            discord.SelectOption(
-                label="Moderation",
-                description="Tools for server management",
-                emoji="🛡️",
-                value="moderation"
-            ),
-            discord.SelectOption(
-                label="Fun",
-                description="Games and recreational commands",
-                emoji="🎉",
-                value="fun"
-            ),
-            discord.SelectOption(
-                label="Actions",
-                description="Interactions like hug, kiss, pat",
-                emoji="🤗",
-                value="actions"
-            ),
-            discord.SelectOption(
-                label="Games",
-                description="Hangman, TicTacToe, etc.",
-                emoji="🎮",
-                value="games"
-            ),
+                label="Home", description="Return to the main help page", emoji="🏠", value=HOME
+            )
         ]
-        super().__init__(placeholder="Select a category...", min_values=1, max_values=1, options=options)
+        for category in known + others:
+            cogs = grouped[category]
+            label, description, emoji = CATEGORIES.get(
+                category,
+                (
+                    category.title(),
+                    ", ".join(cog.qualified_name for cog in cogs)[:100],
+                    DEFAULT_EMOJI,
+                ),
+            )
+            payloads[category] = _category_payload(label, cogs)
+            options.append(
+                discord.SelectOption(label=label, description=description, emoji=emoji, value=category)
+            )
+
+        self.payloads = MappingProxyType(payloads)
+        self.options = tuple(options)
+        logger.debug("Built help index with categories %s", ", ".join(payloads))
+
+    def embed(self, category: str) -> discord.Embed:
+        """A fresh embed for ``category``; categories that went away show as empty."""
+        payload = self.payloads.get(category)
+        if payload is None:
+            embed = SyaaEmbed(title=f"{category.title()} Commands")
+            embed.description = "No commands found in this category."
+            return embed
+        embed = discord.Embed.from_dict(payload)
+        embed.timestamp = datetime.datetime.now(datetime.timezone.utc)
+        return embed
+
+
+class HelpSelect(discord.ui.Select):
+    """Dropdown menu for selecting help categories."""
+
+    def __init__(self, index: HelpIndex):
+        self.index = index
+        super().__init__(
+            placeholder="Select a category...", min_values=1, max_values=1, options=list(index.options)
+        )
 
     async def callback(self, interaction: discord.Interaction):
         value = self.values[0]
-        
-        if value == "home":
-             embed = self.view.get_home_embed()
-        else:
-             embed = self.get_category_embed(value)
-        
-        await interaction.response.edit_message(embed=embed, view=self.view)
 
-    def get_category_embed(self, category: str) -> discord.Embed:
-        embed = SyaaEmbed(title=f"{category.title()} Commands")
-        
-        # Mapping categories to Cog names properly
-        cog_mapping = {
-            "moderation": "Moderation",
-            "fun": "Fun",
-            "actions": "Actions",
-            "games": ["Hangman", "TicTacToe"] # Special handling for multiple cogs
-        }
-
-        target = cog_mapping.get(category)
-        commands_list = []
-
-        if isinstance(target, list):
-             for t in target:
-                 cog = self.bot.get_cog(t)
-                 if cog:
-                     for cmd in cog.get_commands():
-                        if not cmd.hidden:
-                             commands_list.append(cmd)
-        elif target:
-            cog = self.bot.get_cog(target)
-            if cog:
-                commands_list = cog.get_commands()
-
-        if commands_list:
-            for cmd in commands_list:
-                # Use slash command mention if possible, else prefix
-                signature = f"/{cmd.name}" if isinstance(cmd, commands.HybridCommand) else f"!{cmd.name}"
-                embed.add_field(
-                    name=f"`{signature}`",
-                    value=cmd.description or "No description provided.",
-                    inline=False
-                )
+        if value == HOME:
+            embed = self.view.get_home_embed()
         else:
-            embed.description = "No commands found in this category."
+            embed = self.index.embed(value)
 
-        return embed
+        await interaction.response.edit_message(embed=embed, view=self.view)
 
 
 class HelpView(discord.ui.View):
-    def __init__(self, bot: commands.Bot, user: discord.User):
+    def __init__(self, index: HelpIndex, user: discord.User):
         super().__init__(timeout=180)
-        self.bot = bot
+        self.index = index
         self.user = user
-        self.add_item(HelpSelect(bot))
+        self.add_item(HelpSelect(index))
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         if interaction.user != self.user:
             await interaction.response.send_message("This menu is not for you!", ephemeral=True)
             return False
         return True
-    
+
     def get_home_embed(self) -> discord.Embed:
-        embed = SyaaEmbed(
-            title="✨ Syaa Help Center",
-            description=(
-                "Welcome to **Syaa**! A multi-purpose bot designed for fun and style.\n\n"
-                "📂 **Browse Commands**\n"
-                "Use the dropdown menu below to view specific categories.\n\n"
-                "❓ **Support**\n"
-                "If you find a bug or need help, contact the developer."
-            )
-        )
-        embed.set_thumbnail(url=self.bot.user.display_avatar.url)
-        embed.set_image(url="https://media.tenor.com/PshgR1u72QcAAAAC/anime-welcome.gif") # Placeholder aesthetic banner
+        embed = self.index.embed(HOME)
         embed.set_footer(text=f"Requested by {self.user.display_name}", icon_url=self.user.display_avatar.url)
         return embed
 
 
 class Help(commands.Cog):
+    help_category = None
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.index = HelpIndex()
+
+    async def cog_load(self) -> None:
+        self.index.build(self.bot)
+
+    @commands.Cog.listener()
+    async def on_extensions_changed(self, extension: str) -> None:
+        # Loading this extension already built the index in ``cog_load``.
+        if extension != __name__:
+            self.index.build(self.bot)
 
     @commands.hybrid_command(name="help", description="Show the help menu.")
     async def help(self, ctx: commands.Context):
-        view = HelpView(self.bot, ctx.author)
+        view = HelpView(self.index, ctx.author)
         embed = view.get_home_embed()
         await ctx.send(embed=embed, view=view)
 
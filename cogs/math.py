@@ -1,25 +1,111 @@
-"""Mathematics related commands."""
+"""Mathematics related commands.
+
+``/calc`` never evaluates user input on the event loop.  Expressions are
+handled by the sandboxed evaluator in :mod:`utils.calc` inside a process
+pool, with a hard wall-clock timeout: if a worker runs over, the pool is
+killed and replaced so a pathological input cannot hold up other guilds.
+
+``/calc <expression> for x in <start>..<stop> step <step>`` tabulates an
+expression over a range with NumPy and replies with a summary and a CSV.
+Results too long for a message are written to a temporary file by the
+worker and sent as an attachment.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import uuid
+from concurrent.futures.process import BrokenProcessPool
+
 import discord
 from discord.ext import commands
 
+from utils.calc import RANGE_PATTERN, CalcError, RangeResult, evaluate, evaluate_range
+from utils.workers import WorkerPool
+
+
+logger = logging.getLogger(__name__)
+
+CALC_WORKERS = int(os.getenv("CALC_WORKERS", "2"))
+CALC_TIMEOUT = float(os.getenv("CALC_TIMEOUT", "2"))
+
 
 class Math(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.workers = WorkerPool("calculator", CALC_WORKERS)
+
+    async def cog_load(self) -> None:
+        self.workers.start()
+
+    async def cog_unload(self) -> None:
+        self.workers.shutdown()
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` in a worker, giving up after ``CALC_TIMEOUT``."""
+        try:
+            return await self.workers.run(func, *args, timeout=CALC_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise CalcError(f"Calculation took longer than {CALC_TIMEOUT:g} seconds") from None
+        except BrokenProcessPool:
+            raise CalcError("The calculator crashed, please try again") from None
+        except CalcError:
+            raise
+        except Exception:
+            # The evaluator should only raise CalcError; anything else is a
+            # bug in it and must not reach the user as a traceback.
+            logger.exception("Calculator failed on %s%r", getattr(func, "__name__", func), args)
+            raise CalcError("Something went wrong with that calculation") from None
 
     # perform calculation
     @commands.hybrid_command(name="calc", description="Calculate a mathematical expression")
     async def calculate(self, ctx: commands.Context, *, expression: str) -> None:
         try:
-            result = eval(expression)
-            await ctx.send(f"The result of `{expression}` is `{result}`!")
-        except Exception as exc:
+            if RANGE_PATTERN.fullmatch(expression.strip()):
+                table = await self.run(evaluate_range, expression)
+                await ctx.send(
+                    self.describe_range(table),
+                    file=discord.File(io.BytesIO(table.csv), filename="calc.csv"),
+                )
+                return
+            await self.calculate_single(ctx, expression)
+        except CalcError as exc:
             await ctx.send(f"Error: {exc}")
 
+    async def calculate_single(self, ctx: commands.Context, expression: str) -> None:
+        # The worker only creates this file when the result is too long to
+        # send inline; it is removed again whatever happens.
+        spill_path = os.path.join(tempfile.gettempdir(), f"calc-{uuid.uuid4().hex}.txt")
+        try:
+            result = await self.run(evaluate, expression, spill_path)
+            if not result.spilled:
+                await ctx.send(f"The result of `{expression}` is `{result.text}`!")
+                return
+            await ctx.send(
+                f"The result of `{expression}` is {result.length:,} characters long, "
+                f"so it is attached. It starts with `{result.text[:50]}…`",
+                file=discord.File(spill_path, filename="result.txt"),
+            )
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(spill_path)
+
+    @staticmethod
+    def describe_range(table: RangeResult) -> str:
+        lines = [
+            f"`{table.expression}` for {table.variable} in "
+            f"{table.start:g}..{table.stop:g} step {table.step:g} ({table.points:,} points)",
+            f"Min: `{table.minimum:.10g}`  Max: `{table.maximum:.10g}`  Mean: `{table.mean:.10g}`",
+        ]
+        if table.invalid:
+            lines.append(f"{table.invalid:,} points were undefined or infinite.")
+        return "\n".join(lines)
+
 
 async def setup(bot: commands.Bot) -> None:
     await bot.add_cog(Math(bot))
-
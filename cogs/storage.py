@@ -1,10 +1,336 @@
-"""Database storage layer using Tortoise-ORM."""
+"""Database storage layer using Tortoise-ORM.
+
+Game results are not written to the database one by one.  Every
+``record_*`` call adds a delta to an in-memory write-behind buffer which is
+flushed periodically (or once it grows past a threshold) as a single
+upsert-and-increment transaction.  Reads fold any pending deltas back in so
+players always see up to date numbers.
+
+Stats live in the normalized ``game_stats`` table with one row per
+``(guild_id, user_id, game)``.  Leaderboards are served from per-guild
+in-memory indexes which are loaded lazily from ``GameStats`` and kept current by the ``record_*`` functions.
+Per-user lookups go through a read-through cache that the ``record_*``
+functions update in place.
+
+Cached Tenor search results are persisted here as well so the GIF cache
+starts warm after a restart, and so is the part of a running game that
+cannot be put in its message components (the Hangman word).
+"""
 
 from __future__ import annotations
 
-from typing import List, Tuple
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, DefaultDict, Dict, List, Optional, Tuple, TypeVar
+
+from tortoise.transactions import in_transaction
+
+from database.db import WRITE_CONNECTION, read_connection
+from database.leaderboard import GuildLeaderboard, LeaderboardCache, LeaderboardPage, Row
+from database.models import GameStateRecord, GameStats, GifPoolRecord
+from utils.cache import AsyncTTLCache
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FLUSH_INTERVAL = float(os.getenv("STATS_FLUSH_INTERVAL", "5"))
+FLUSH_THRESHOLD = int(os.getenv("STATS_FLUSH_THRESHOLD", "100"))
+LEADERBOARD_CACHE_GUILDS = int(os.getenv("LEADERBOARD_CACHE_GUILDS", "256"))
+USER_STATS_CACHE_SIZE = int(os.getenv("USER_STATS_CACHE_SIZE", "10000"))
+USER_STATS_CACHE_TTL = float(os.getenv("USER_STATS_CACHE_TTL", "300"))
+
+COUNTERS = ("wins", "losses", "draws")
+GAMES = ("rps", "hangman", "tictactoe")
+
+# Outcome passed to ``record_result`` -> counter it increments
+OUTCOMES = {"win": "wins", "loss": "losses", "draw": "draws"}
 
-from database.models import UserStats
+_UPSERT_SQL = (
+    "INSERT INTO game_stats (guild_id, user_id, game, {columns}) VALUES (?, ?, ?, {params}) "
+    "ON CONFLICT (guild_id, user_id, game) DO UPDATE SET {updates}"
+).format(
+    columns=", ".join(COUNTERS),
+    params=", ".join("?" for _ in COUNTERS),
+    updates=", ".join(f"{c} = {c} + excluded.{c}" for c in COUNTERS),
+)
+
+
+# ----------------------------------------------------------------------
+# Write-behind buffer
+# ----------------------------------------------------------------------
+
+class StatsBuffer:
+    """Accumulate counter increments and write them to the database in bulk.
+
+    Deltas are keyed by ``(guild_id, user_id, game, counter)``.  While a
+    batch is being written it stays visible as ``flushing``, so readers do
+    not wait for the write: they read the database through :meth:`read`
+    and then fold in ``pending_for``/``pending_for_guild``, which count
+    both pending and flushing deltas.  ``lock`` only keeps flushes from
+    running at the same time.
+    """
+
+    def __init__(self, interval: float, threshold: int) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.pending: DefaultDict[Tuple[int, int, str, str], int] = defaultdict(int)
+        self.flushing: Dict[Tuple[int, int, str, str], int] = {}
+        # Set from just before a batch is committed until the flush ends;
+        # ``generation`` counts the flushes that have ended.
+        self.committing = False
+        self.generation = 0
+        self.lock = asyncio.Lock()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, guild_id: int, user_id: int, game: str, counter: str, amount: int = 1) -> None:
+        """Queue ``amount`` to be added to ``counter`` for the given user and game."""
+        self.pending[(guild_id, user_id, game, counter)] += amount
+        if len(self.pending) >= self.threshold:
+            self._wakeup.set()
+
+    def pending_for_guild(self, guild_id: int, game: str) -> Dict[Tuple[int, str], int]:
+        """Return the not yet written deltas of every user in a guild for ``game``."""
+        deltas: DefaultDict[Tuple[int, str], int] = defaultdict(int)
+        for deltas_by_key in (self.flushing, self.pending):
+            for (pending_guild, user_id, pending_game, counter), amount in deltas_by_key.items():
+                if pending_guild == guild_id and pending_game == game:
+                    deltas[(user_id, counter)] += amount
+        return dict(deltas)
+
+    def pending_for(self, guild_id: int, user_id: int, game: str) -> Dict[str, int]:
+        """Return the not yet written deltas for a single user and game."""
+        return {
+            counter: self.pending.get((guild_id, user_id, game, counter), 0)
+            + self.flushing.get((guild_id, user_id, game, counter), 0)
+            for counter in COUNTERS
+        }
+
+    async def read(self, query: Callable[[], Awaitable[T]]) -> T:
+        """Run the stats read ``query`` so unwritten deltas can be folded into it.
+
+        Call ``pending_for``/``pending_for_guild`` right after this returns,
+        without awaiting in between.  The read overlaps a running flush;
+        it is only repeated when a batch was committed while it ran, as it
+        cannot tell whether the result already counts that batch.
+        """
+        while True:
+            generation = self.generation
+            result = await query()
+            if self.generation != generation:
+                continue
+            if not self.committing:
+                return result
+            await self._idle.wait()
+
+    async def flush(self) -> None:
+        """Write every pending delta in one transaction."""
+        async with self.lock:
+            if not self.pending:
+                return
+            batch, self.pending = self.pending, defaultdict(int)
+            self.flushing = batch
+
+            rows: Dict[Tuple[int, int, str], List[int]] = {}
+            for (guild_id, user_id, game, counter), amount in batch.items():
+                row = rows.setdefault((guild_id, user_id, game), [0] * len(COUNTERS))
+                row[COUNTERS.index(counter)] += amount
+            values = [[*key, *row] for key, row in rows.items()]
+
+            try:
+                async with in_transaction(WRITE_CONNECTION) as connection:
+                    await connection.execute_many(_UPSERT_SQL, values)
+                    # Leaving the block commits; from here on a reader cannot
+                    # tell whether it sees the batch.
+                    self.committing = True
+                    self._idle.clear()
+            except Exception:
+                # Put the batch back so nothing is lost; the next flush retries.
+                for key, amount in batch.items():
+                    self.pending[key] += amount
+                raise
+            finally:
+                self.flushing = {}
+                self.committing = False
+                self.generation += 1
+                self._idle.set()
+
+            logger.debug("Flushed %d stat deltas into %d rows", len(batch), len(rows))
+
+    def start(self) -> None:
+        """Start the background flush loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flush loop and drain everything that is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Failed to flush game stats")
+
+
+_buffer = StatsBuffer(FLUSH_INTERVAL, FLUSH_THRESHOLD)
+_leaderboards = LeaderboardCache(LEADERBOARD_CACHE_GUILDS)
+_user_stats: AsyncTTLCache[Tuple[int, int, str], Dict[str, int]] = AsyncTTLCache(
+    USER_STATS_CACHE_SIZE, USER_STATS_CACHE_TTL
+)
+
+
+def start_write_buffer() -> None:
+    """Start flushing buffered game stats in the background."""
+    _buffer.start()
+
+
+async def flush_stats() -> None:
+    """Write all buffered game stats immediately."""
+    await _buffer.flush()
+
+
+async def stop_write_buffer() -> None:
+    """Stop the background flush and drain the buffer (call on shutdown)."""
+    await _buffer.close()
+
+
+def user_stats_cache_stats() -> Dict[str, int]:
+    """Return hit, miss and eviction counters of the per-user stats cache."""
+    return _user_stats.stats()
+
+
+async def _load_counters(guild_id: int, user_id: int, game: str) -> Dict[str, int]:
+    """Return the stored counters for a user with pending deltas folded in."""
+    stats = await _buffer.read(
+        lambda: GameStats.filter(guild_id=guild_id, user_id=user_id, game=game)
+        .using_db(read_connection())
+        .first()
+    )
+    counters = _buffer.pending_for(guild_id, user_id, game)
+    if stats:
+        for counter in COUNTERS:
+            counters[counter] += getattr(stats, counter)
+    return counters
+
+
+async def _get_counters(guild_id: int, user_id: int, game: str) -> Dict[str, int]:
+    """Return a user's counters, served from the cache when possible."""
+    return await _user_stats.get(
+        (guild_id, user_id, game), lambda: _load_counters(guild_id, user_id, game)
+    )
+
+
+async def record_result(guild_id: int, user_id: int, game: str, outcome: str) -> None:
+    """Record a ``"win"``, ``"loss"`` or ``"draw"`` of ``game`` for a user."""
+    if game not in GAMES:
+        raise ValueError(f"Unknown game: {game}")
+    counter = OUTCOMES[outcome]
+    key = (guild_id, user_id, game)
+    _buffer.add(guild_id, user_id, game, counter)
+    if not _user_stats.update(key, lambda counters: {**counters, counter: counters[counter] + 1}):
+        _user_stats.invalidate(key)
+    _leaderboards.apply(
+        (guild_id, game),
+        user_id,
+        wins=int(counter == "wins"),
+        losses=int(counter == "losses"),
+    )
+
+
+async def get_game_stats(guild_id: int, user_id: int, game: str) -> Tuple[int, int, int]:
+    """Return wins, losses and draws of ``game`` for ``user_id`` in ``guild_id``."""
+    counters = await _get_counters(guild_id, user_id, game)
+    return counters["wins"], counters["losses"], counters["draws"]
+
+
+async def _get_board(guild_id: int, game: str) -> GuildLeaderboard:
+    """Return the leaderboard index of ``game`` in ``guild_id``, loading it if needed."""
+    board = _leaderboards.get((guild_id, game))
+    if board is not None:
+        return board
+
+    rows = await _buffer.read(
+        lambda: GameStats.filter(guild_id=guild_id, game=game)
+        .using_db(read_connection())
+        .values_list("user_id", "wins", "losses")
+    )
+    # Another task may have loaded the board while we were reading.
+    board = _leaderboards.get((guild_id, game))
+    if board is not None:
+        return board
+    standings = {user_id: [wins, losses] for user_id, wins, losses in rows}
+    for (user_id, counter), amount in _buffer.pending_for_guild(guild_id, game).items():
+        if counter == "wins":
+            standings.setdefault(user_id, [0, 0])[0] += amount
+        elif counter == "losses":
+            standings.setdefault(user_id, [0, 0])[1] += amount
+    board = GuildLeaderboard(
+        (user_id, wins, losses) for user_id, (wins, losses) in standings.items()
+    )
+    _leaderboards.put((guild_id, game), board)
+    return board
+
+
+async def get_user_rank(guild_id: int, user_id: int, game: str = "rps") -> Optional[int]:
+    """Return the 1-based leaderboard rank of ``user_id`` or ``None``."""
+    board = await _get_board(guild_id, game)
+    return board.rank(user_id)
+
+
+async def get_leaderboard_page(
+    guild_id: int,
+    game: str,
+    limit: int = 10,
+    *,
+    after: Optional[Row] = None,
+    before: Optional[Row] = None,
+    around: Optional[int] = None,
+) -> Optional[LeaderboardPage]:
+    """Return one keyset-addressed page of the ``game`` leaderboard.
+
+    ``after``/``before`` are the last/first ``(user_id, wins, losses)`` row of
+    the page currently shown; ``around`` is a user id whose page is wanted
+    (``None`` is returned if that user is unranked).
+    """
+    board = await _get_board(guild_id, game)
+    if around is not None:
+        return board.page_of(around, limit)
+    if before is not None:
+        return board.page_before(before, limit)
+    return board.page_after(after, limit)
+
+
+async def get_game_leaderboard(
+    guild_id: int, game: str, limit: int = 10, after: Optional[Row] = None
+) -> List[Row]:
+    """Return ``(user_id, wins, losses)`` of the top ``game`` players in ``guild_id``.
+
+    Pass the last row of a previous call as ``after`` to get the next page.
+    """
+    page = await get_leaderboard_page(guild_id, game, limit, after=after)
+    return page.rows
 
 
 # ----------------------------------------------------------------------
@@ -13,29 +339,25 @@ from database.models import UserStats
 
 async def record_win(guild_id: int, user_id: int) -> None:
     """Record a win for the given user (async)."""
-    stats, _ = await UserStats.get_or_create(guild_id=guild_id, user_id=user_id)
-    stats.rps_wins += 1
-    await stats.save()
+    await record_result(guild_id, user_id, "rps", "win")
 
 
 async def record_loss(guild_id: int, user_id: int) -> None:
     """Record a loss for the given user (async)."""
-    stats, _ = await UserStats.get_or_create(guild_id=guild_id, user_id=user_id)
-    stats.rps_losses += 1
-    await stats.save()
+    await record_result(guild_id, user_id, "rps", "loss")
 
 
 def get_user_stats(guild_id: int, user_id: int) -> Tuple[int, int]:
     """Return wins and losses for ``user_id`` in ``guild_id``.
-    
+
     Note: Since this is called from synchronous code in the current Fun cog,
     we would ideally update the Cog to be fully async. However, for now,
     the Cog methods are async so we can await proper DB calls if we refactor them.
-    
-    Wait! The Fun cog calls these synchronously in the original code? 
+
+    Wait! The Fun cog calls these synchronously in the original code?
     Let's check Fun.py. It was: `wins, losses = get_user_stats(...)`
     The original get_user_stats used sqlite3 synchronously.
-    
+
     Since we are now using async ORM, we MUST update Fun.py to await these calls.
     For this file, we will define them as `async def`.
     """
@@ -44,10 +366,8 @@ def get_user_stats(guild_id: int, user_id: int) -> Tuple[int, int]:
 
 async def get_user_stats_async(guild_id: int, user_id: int) -> Tuple[int, int]:
     """Async version of get_user_stats."""
-    stats = await UserStats.get_or_none(guild_id=guild_id, user_id=user_id)
-    if not stats:
-        return 0, 0
-    return stats.rps_wins, stats.rps_losses
+    wins, losses, _ = await get_game_stats(guild_id, user_id, "rps")
+    return wins, losses
 
 
 def get_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int]]:
@@ -55,10 +375,11 @@ def get_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int]
     raise NotImplementedError("Use `get_leaderboard_async`.")
 
 
-async def get_leaderboard_async(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int]]:
-    """Return the top rps players in ``guild_id``."""
-    stats = await UserStats.filter(guild_id=guild_id).order_by("-rps_wins", "rps_losses").limit(limit)
-    return [(s.user_id, s.rps_wins, s.rps_losses) for s in stats]
+async def get_leaderboard_async(
+    guild_id: int, limit: int = 10, after: Optional[Row] = None
+) -> List[Tuple[int, int, int]]:
+    """Return the top rps players in ``guild_id`` (ranked below ``after``, if given)."""
+    return await get_game_leaderboard(guild_id, "rps", limit, after)
 
 
 # ----------------------------------------------------------------------
@@ -66,24 +387,74 @@ async def get_leaderboard_async(guild_id: int, limit: int = 10) -> List[Tuple[in
 # ----------------------------------------------------------------------
 
 async def record_hangman_win(guild_id: int, user_id: int) -> None:
-    stats, _ = await UserStats.get_or_create(guild_id=guild_id, user_id=user_id)
-    stats.hangman_wins += 1
-    await stats.save()
+    await record_result(guild_id, user_id, "hangman", "win")
 
 
 async def record_hangman_loss(guild_id: int, user_id: int) -> None:
-    stats, _ = await UserStats.get_or_create(guild_id=guild_id, user_id=user_id)
-    stats.hangman_losses += 1
-    await stats.save()
+    await record_result(guild_id, user_id, "hangman", "loss")
 
 
 async def get_hangman_user_stats(guild_id: int, user_id: int) -> Tuple[int, int]:
-    stats = await UserStats.get_or_none(guild_id=guild_id, user_id=user_id)
-    if not stats:
-        return 0, 0
-    return stats.hangman_wins, stats.hangman_losses
+    wins, losses, _ = await get_game_stats(guild_id, user_id, "hangman")
+    return wins, losses
+
+
+async def get_hangman_leaderboard(
+    guild_id: int, limit: int = 10, after: Optional[Row] = None
+) -> List[Tuple[int, int, int]]:
+    return await get_game_leaderboard(guild_id, "hangman", limit, after)
+
+
+# ----------------------------------------------------------------------
+# GIF pools
+# ----------------------------------------------------------------------
+
+async def load_gif_pools() -> Dict[str, Tuple[List[str], float]]:
+    """Return every persisted GIF pool as ``{term: (urls, fetched_at)}``."""
+    records = await GifPoolRecord.all().using_db(read_connection()).values_list(
+        "term", "urls", "fetched_at"
+    )
+    return {term: (json.loads(urls), fetched_at) for term, urls, fetched_at in records}
+
+
+async def save_gif_pool(term: str, urls: List[str], fetched_at: float) -> None:
+    """Persist the GIF pool of ``term``, replacing any older one."""
+    async with in_transaction(WRITE_CONNECTION) as connection:
+        await connection.execute_query(
+            "INSERT INTO gif_pools (term, urls, fetched_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (term) DO UPDATE SET urls = excluded.urls, fetched_at = excluded.fetched_at",
+            [term, json.dumps(urls), fetched_at],
+        )
+
+
+# ----------------------------------------------------------------------
+# Game states
+# ----------------------------------------------------------------------
+
+async def save_game_state(key: str, game: str, data: Dict[str, Any]) -> None:
+    """Persist ``data`` for the running game ``key``, replacing any older state."""
+    async with in_transaction(WRITE_CONNECTION) as connection:
+        await connection.execute_query(
+            "INSERT INTO game_states (key, game, data, updated_at) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            [key, game, json.dumps(data), time.time()],
+        )
+
+
+async def load_game_state(key: str) -> Optional[Dict[str, Any]]:
+    """Return the persisted data of game ``key``, or ``None``."""
+    data = (
+        await GameStateRecord.filter(key=key)
+        .using_db(read_connection())
+        .values_list("data", flat=True)
+    )
+    return json.loads(data[0]) if data else None
+
+
+async def delete_game_state(key: str) -> None:
+    await GameStateRecord.filter(key=key).delete()
 
 
-async def get_hangman_leaderboard(guild_id: int, limit: int = 10) -> List[Tuple[int, int, int]]:
-    stats = await UserStats.filter(guild_id=guild_id).order_by("-hangman_wins", "hangman_losses").limit(limit)
-    return [(s.user_id, s.hangman_wins, s.hangman_losses) for s in stats]
+async def prune_game_states(max_age: float) -> int:
+    """Delete states of games without a move for ``max_age`` seconds."""
+    return await GameStateRecord.filter(updated_at__lt=time.time() - max_age).delete()
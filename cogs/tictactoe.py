@@ -1,180 +1,321 @@
-"""Tic-tac-toe game cog."""
+"""Tic-tac-toe game cog.
+
+Games are stateless on the bot side: the board and players are encoded in
+the ``custom_id`` of every cell (:class:`TicTacToeCell`), and one
+registered handler serves all games, including those started before a
+restart.  :class:`~utils.gamestate.GameStore` only remembers the latest
+board of recently played games to reject clicks on outdated boards.
+
+Boards can be 3 x 3, 4 x 4 or 5 x 5 (25 buttons is Discord's limit), with
+``k`` in a row to win.  On 3 x 3 the bot's moves are lookups in the
+perfect-play table of :mod:`utils.tictactoe`; on larger boards they come
+from a time-boxed alpha-beta search in a process pool, so a deep search
+never blocks the event loop or other games.  Easier difficulties mix in
+random moves.
+"""
 
 from __future__ import annotations
 
 import asyncio
+import logging
+import os
 import random
+import re
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Literal, NamedTuple, Optional
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 
+from utils import tictactoe as ttt
+from utils.gamestate import GameStore
+from utils.pagination import LeaderboardView
+from utils.sessions import EVICTION_MESSAGES, Session, SessionLimitError, session_message
+from utils.ui import InfoEmbed, SyaaEmbed
+from utils.workers import WorkerPool
+from .storage import get_game_stats, get_leaderboard_page, get_user_rank, record_result
 
-class TicTacToeView(discord.ui.View):
-    """Tic-tac-toe game view.
 
-    This view manages the game state and interactions for a single game of
-    tic-tac-toe.
-    """
+logger = logging.getLogger(__name__)
 
-    def __init__(
-        self, bot: commands.Bot, player1: discord.Member, player2: discord.Member
-    ):
-        super().__init__(timeout=180.0)
-        self.bot = bot
-        self.player1 = player1
-        self.player2 = player2
-        self.current_player = player1
-        self.board = [0] * 9  # 0: empty, 1: player1, 2: player2
-
-        # Add buttons to the view
-        for i in range(9):
-            self.add_item(
-                TicTacToeButton(style=discord.ButtonStyle.secondary, row=i // 3, custom_id=str(i))
-            )
+TTT_WORKERS = int(os.getenv("TTT_WORKERS", "1"))
+TTT_SEARCH_BUDGET = float(os.getenv("TTT_SEARCH_BUDGET", "1"))
 
-    async def interaction_check(self, interaction: discord.Interaction) -> bool:
-        """Check if the interaction user is the current player."""
-        if interaction.user == self.current_player:
-            return True
-        await interaction.response.send_message(
-            "It's not your turn!", ephemeral=True
-        )
-        return False
-
-    async def on_timeout(self) -> None:
-        """Handle view timeout."""
-        for item in self.children:
-            item.disabled = True
-        # It's possible the message was already edited by the game ending
-        if self.message:
-            await self.message.edit(content="Game timed out.", view=self)
-
-    async def handle_turn(
-        self, interaction: discord.Interaction, button: discord.ui.Button
-    ) -> None:
-        """Handle a player's turn, including the bot's turn if applicable."""
-        position = int(button.custom_id)
-        player_value = 1 if self.current_player == self.player1 else 2
-        player_symbol = "X" if player_value == 1 else "O"
-        button_style = (
-            discord.ButtonStyle.primary
-            if player_value == 1
-            else discord.ButtonStyle.danger
-        )
+DIFFICULTY_CODES = {"easy": "e", "medium": "m", "hard": "h"}
 
-        self.board[position] = player_value
-        button.label = player_symbol
-        button.style = button_style
-        button.disabled = True
 
-        if self.check_win(player_value):
-            await self.end_game(interaction, f"{self.current_player.mention} wins!")
-            return
+class TicTacToeState(NamedTuple):
+    """Everything about a game, small enough to live in a ``custom_id``.
 
-        if 0 not in self.board:
-            await self.end_game(interaction, "It's a draw!")
-            return
+    ``x`` and ``o`` are the bitboards of player 1 (X) and player 2 (O), see
+    :mod:`utils.tictactoe`.  Player 1 always starts, so whose turn it is
+    follows from the board.  ``difficulty`` only matters against the bot.
+    """
 
-        # Switch player
-        self.current_player = (
-            self.player2 if self.current_player == self.player1 else self.player1
+    player1: int
+    player2: int
+    x: int = 0
+    o: int = 0
+    difficulty: str = "medium"
+    size: int = 3
+    k: int = 3
+
+    @classmethod
+    def decode(cls, match: re.Match[str]) -> TicTacToeState:
+        difficulty = next(
+            name for name, code in DIFFICULTY_CODES.items() if code == match["difficulty"]
         )
-        await interaction.response.edit_message(
-            content=f"It's {self.current_player.mention}'s turn.", view=self
+        return cls(
+            int(match["player1"]),
+            int(match["player2"]),
+            int(match["x"], 16),
+            int(match["o"], 16),
+            difficulty,
+            int(match["size"]),
+            int(match["k"]),
         )
 
-        # If the new player is the bot, trigger its move
-        if self.current_player == self.bot.user:
-            await self.bot_move()
-
-    def check_win(self, player_value: int) -> bool:
-        """Check if the specified player has won."""
-        win_conditions = [
-            [0, 1, 2], [3, 4, 5], [6, 7, 8],  # rows
-            [0, 3, 6], [1, 4, 7], [2, 5, 8],  # columns
-            [0, 4, 8], [2, 4, 6],  # diagonals
-        ]
-        for condition in win_conditions:
-            if all(self.board[i] == player_value for i in condition):
-                return True
-        return False
-
-    async def end_game(
-        self, interaction: discord.Interaction, message: str
-    ) -> None:
-        """End the game and disable all buttons."""
-        for item in self.children:
-            item.disabled = True
-
-        # Respond to the interaction that ended the game
-        if not interaction.response.is_done():
-            await interaction.response.edit_message(content=message, view=self)
-        # If the interaction was already responded to (e.g., bot move), edit the original message
-        else:
-            await interaction.edit_original_response(content=message, view=self)
-        self.stop()
-
-    async def bot_move(self) -> None:
-        """Handle the bot's move."""
-        await asyncio.sleep(random.uniform(0.5, 1.5))  # Simulate thinking
-
-        available_spots = [i for i, spot in enumerate(self.board) if spot == 0]
-        if not available_spots:
-            return
-
-        bot_choice_pos = random.choice(available_spots)
-        bot_button = next(
-            item for item in self.children if isinstance(item, discord.ui.Button) and int(item.custom_id) == bot_choice_pos
+    def encode(self) -> str:
+        return (
+            f"{self.player1}:{self.player2}:{self.x:x}:{self.o:x}:"
+            f"{self.size}{self.k}{DIFFICULTY_CODES[self.difficulty]}"
         )
 
-        self.board[bot_choice_pos] = 2  # Bot is always player 2
-        bot_button.label = "O"
-        bot_button.style = discord.ButtonStyle.danger
-        bot_button.disabled = True
-
-        if self.check_win(2):
-            await self.end_game_from_bot(f"{self.current_player.mention} wins!")
-            return
-
-        if 0 not in self.board:
-            await self.end_game_from_bot("It's a draw!")
-            return
-
-        self.current_player = self.player1
-        await self.message.edit(
-            content=f"It's {self.current_player.mention}'s turn.", view=self
+    def cell(self, position: int) -> int:
+        """0 for an empty cell, 1 for X and 2 for O."""
+        if self.x >> position & 1:
+            return 1
+        return 2 if self.o >> position & 1 else 0
+
+    @property
+    def current_player(self) -> int:
+        return self.player1 if ttt.x_to_move(self.x, self.o) else self.player2
+
+    def play(self, position: int) -> TicTacToeState:
+        x, o = ttt.play(self.x, self.o, position)
+        return self._replace(x=x, o=o)
+
+    def winner(self) -> Optional[int]:
+        """The id of the player with ``k`` in a row, if any."""
+        if ttt.has_won(self.x, self.size, self.k):
+            return self.player1
+        if ttt.has_won(self.o, self.size, self.k):
+            return self.player2
+        return None
+
+    @property
+    def is_full(self) -> bool:
+        return self.x | self.o == ttt.full_board(self.size)
+
+
+class TicTacToeCell(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=(
+        r"ttt:(?P<player1>\d+):(?P<player2>\d+):(?P<x>[0-9a-f]+):(?P<o>[0-9a-f]+)"
+        r":(?P<size>[345])(?P<k>[345])(?P<difficulty>[emh]):(?P<position>\d+)"
+    ),
+):
+    """One cell of the board; the whole game state is in its ``custom_id``."""
+
+    def __init__(self, state: TicTacToeState, position: int, finished: bool = False) -> None:
+        value = state.cell(position)
+        super().__init__(
+            discord.ui.Button(
+                label=("\u200b", "X", "O")[value],
+                style=(
+                    discord.ButtonStyle.secondary,
+                    discord.ButtonStyle.primary,
+                    discord.ButtonStyle.danger,
+                )[value],
+                disabled=finished or value != 0,
+                row=position // state.size,
+                custom_id=f"ttt:{state.encode()}:{position}",
+            )
         )
+        self.state = state
+        self.position = position
 
-    async def end_game_from_bot(self, message: str) -> None:
-        """Special version of end_game for when the bot makes the final move."""
-        for item in self.children:
-            item.disabled = True
-        await self.message.edit(content=message, view=self)
-        self.stop()
+    @classmethod
+    async def from_custom_id(
+        cls, interaction: discord.Interaction, item: discord.ui.Button, match: re.Match[str]
+    ) -> TicTacToeCell:
+        return cls(TicTacToeState.decode(match), int(match["position"]))
 
+    async def callback(self, interaction: discord.Interaction) -> None:  # type: ignore[override]
+        cog: TicTacToe = interaction.client.get_cog("TicTacToe")  # type: ignore[assignment]
+        await cog.handle_turn(interaction, self.state, self.position)
 
-class TicTacToeButton(discord.ui.Button):
-    """A button for the tic-tac-toe board."""
 
-    async def callback(self, interaction: discord.Interaction):
-        """Handle button press."""
-        if self.view.board[int(self.custom_id)] != 0:
-            await interaction.response.send_message(
-                "This spot is already taken!", ephemeral=True
-            )
-            return
-        await self.view.handle_turn(interaction, self)
+def board_view(state: TicTacToeState, finished: bool = False) -> discord.ui.View:
+    """``state.size`` rows of cells; every cell is disabled once the game is ``finished``."""
+    view = discord.ui.View(timeout=None)
+    for position in range(state.size * state.size):
+        view.add_item(TicTacToeCell(state, position, finished))
+    return view
 
 
 class TicTacToe(commands.Cog):
     """Tic-tac-toe game commands."""
 
+    help_category = "games"
+
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        # Latest state per message id.
+        self.games: GameStore[int, TicTacToeState] = GameStore()
+        self.workers = WorkerPool("tic-tac-toe search", TTT_WORKERS)
+
+    async def cog_load(self) -> None:
+        self.bot.add_dynamic_items(TicTacToeCell)
+        self.bot.sessions.register("tictactoe", self.on_evicted)
+        self.workers.start()
+
+    async def cog_unload(self) -> None:
+        self.bot.remove_dynamic_items(TicTacToeCell)
+        self.bot.sessions.unregister("tictactoe")
+        self.workers.shutdown()
+
+    async def choose_move(self, state: TicTacToeState) -> Optional[int]:
+        """The bot's move: a table lookup on 3 x 3, a search in the pool otherwise."""
+        if state.size == 3:
+            return ttt.choose_move(state.x, state.o, state.difficulty)
+
+        search = partial(
+            ttt.choose_move,
+            state.x,
+            state.o,
+            state.difficulty,
+            size=state.size,
+            k=state.k,
+            budget=TTT_SEARCH_BUDGET,
+        )
+        try:
+            # The search stops itself after the budget; the timeout only
+            # catches a worker that is stuck or queued behind other searches.
+            return await self.workers.run(search, timeout=TTT_SEARCH_BUDGET + 5)
+        except (asyncio.TimeoutError, BrokenProcessPool):
+            return random.choice(ttt.empty_cells(state.x, state.o, state.size) or [None])
+
+    async def on_evicted(self, session: Session, reason: str) -> None:
+        """Forget an abandoned game and disable its board."""
+        async with self.games.lock(session.key):
+            state = await self.games.get(session.key)
+            self.games.discard(session.key)
+        message = session_message(self.bot, session)
+        if message is None:
+            return
+        view = board_view(state, finished=True) if state is not None else None
+        self.bot.renderer.schedule(message, content=EVICTION_MESSAGES[reason], view=view)
+
+    def render(self, message: discord.Message, state: TicTacToeState, finished: Optional[str]) -> None:
+        """Queue an edit showing ``state``; rapid moves are coalesced."""
+        content = finished or f"It's <@{state.current_player}>'s turn."
+        self.bot.renderer.schedule(
+            message, content=content, view=board_view(state, finished is not None)
+        )
+
+    async def handle_turn(
+        self, interaction: discord.Interaction, state: TicTacToeState, position: int
+    ) -> None:
+        """Handle a player's turn, including the bot's turn if applicable."""
+        key = interaction.message.id
+        async with self.games.lock(key):
+            latest = await self.games.get(key)
+            if latest is not None and latest != state:
+                await interaction.response.send_message(
+                    "This board is out of date, try again.", ephemeral=True
+                )
+                return
+            # Checked before the touch so that only the player to move keeps
+            # the game alive.
+            if interaction.user.id != state.current_player:
+                await interaction.response.send_message("It's not your turn!", ephemeral=True)
+                return
+            if not self.bot.sessions.touch(
+                "tictactoe",
+                key,
+                interaction.guild_id or 0,
+                interaction.channel_id,
+                state.player1,
+                (state.player1, state.player2),
+                key,
+            ):
+                await interaction.response.send_message("This game has expired.", ephemeral=True)
+                return
+            if state.cell(position) != 0:
+                await interaction.response.send_message(
+                    "This spot is already taken!", ephemeral=True
+                )
+                return
+
+            state = state.play(position)
+            self.games.set(key, state)
+            await interaction.response.defer()
+            finished = await self.finish(key, interaction.guild_id or 0, state)
+            self.render(interaction.message, state, finished)
+
+        # If the new player is the bot, trigger its move
+        if finished is None and state.current_player == self.bot.user.id:
+            await self.bot_move(interaction, key)
+
+    async def finish(self, key: int, guild_id: int, state: TicTacToeState) -> Optional[str]:
+        """Store the results if the game is over and return the final message."""
+        winner = state.winner()
+        if winner is None and not state.is_full:
+            return None
+        await self.record_results(guild_id, state, winner)
+        self.bot.sessions.end("tictactoe", key)
+        return f"<@{winner}> wins!" if winner is not None else "It's a draw!"
+
+    async def record_results(
+        self, guild_id: int, state: TicTacToeState, winner: Optional[int]
+    ) -> None:
+        """Store the result for every human player (``None`` means a draw)."""
+        for player in (state.player1, state.player2):
+            if player == self.bot.user.id:
+                continue
+            if winner is None:
+                outcome = "draw"
+            else:
+                outcome = "win" if player == winner else "loss"
+            await record_result(guild_id, player, "tictactoe", outcome)
+
+    async def bot_move(self, interaction: discord.Interaction, key: int) -> None:
+        """Handle the bot's move."""
+        state = await self.games.get(key)
+        if state is not None and state.size == 3:
+            # The table answers instantly; larger boards think for real.
+            await asyncio.sleep(random.uniform(0.5, 1.5))  # Simulate thinking
+
+        async with self.games.lock(key):
+            state = await self.games.get(key)
+            if state is None or state.current_player != self.bot.user.id:
+                return
+            position = await self.choose_move(state)
+            if position is None:
+                return
+
+            state = state.play(position)
+            self.games.set(key, state)
+            finished = await self.finish(key, interaction.guild_id or 0, state)
+            self.render(interaction.message, state, finished)
 
     @commands.hybrid_command(description="Play a game of tic-tac-toe")
+    @app_commands.describe(
+        member="Who to play against (defaults to the bot)",
+        difficulty="How well the bot plays",
+        size="Width and height of the board",
+        k="How many in a row win (defaults to 3 on 3 x 3 and 4 otherwise)",
+    )
     async def tictactoe(
-        self, ctx: commands.Context, member: discord.Member | None = None
+        self,
+        ctx: commands.Context,
+        member: discord.Member | None = None,
+        difficulty: Literal["easy", "medium", "hard"] = "medium",
+        size: Literal[3, 4, 5] = 3,
+        k: Optional[app_commands.Range[int, 3, 5]] = None,
     ) -> None:
         """Starts a tic-tac-toe game."""
         player1 = ctx.author
@@ -188,13 +329,64 @@ class TicTacToe(commands.Cog):
             await ctx.send("You cannot play against yourself.")
             return
 
-        view = TicTacToeView(self.bot, player1, player2)
-        message = await ctx.send(
-            f"Tic-tac-toe: {player1.mention} (X) vs {player2.mention} (O)\n"
-            f"It's {view.current_player.mention}'s turn.",
-            view=view,
-        )
-        view.message = message
+        k = k or min(size, 4)
+        if k > size:
+            await ctx.send(f"You cannot get {k} in a row on a {size} x {size} board.")
+            return
+
+        try:
+            session = await self.bot.sessions.open(
+                "tictactoe",
+                ctx.guild.id if ctx.guild else 0,
+                ctx.channel.id,
+                player1.id,
+                (player1.id, player2.id),
+            )
+        except SessionLimitError as exc:
+            await ctx.send(str(exc))
+            return
+
+        rules = f" ({size} x {size}, {k} in a row)" if size != 3 else ""
+        state = TicTacToeState(player1.id, player2.id, difficulty=difficulty, size=size, k=k)
+        try:
+            message = await ctx.send(
+                f"Tic-tac-toe{rules}: {player1.mention} (X) vs {player2.mention} (O)\n"
+                f"It's {player1.mention}'s turn.",
+                view=board_view(state),
+            )
+        except BaseException:
+            self.bot.sessions.discard(session)
+            raise
+        self.bot.sessions.bind(session, message.id, message.id)
+
+    @commands.hybrid_command(
+        description="Show tic-tac-toe stats for a user or this server's leaderboard"
+    )
+    async def tttstats(
+        self, ctx: commands.Context, member: discord.Member | None = None
+    ) -> None:
+        guild_id = ctx.guild.id if ctx.guild else 0
+
+        if member is not None:
+            wins, losses, draws = await get_game_stats(guild_id, member.id, "tictactoe")
+            rank = await get_user_rank(guild_id, member.id, "tictactoe")
+            embed = SyaaEmbed(title=f"Tic-tac-toe Stats: {member.display_name}")
+            embed.add_field(name="Wins", value=str(wins), inline=True)
+            embed.add_field(name="Losses", value=str(losses), inline=True)
+            embed.add_field(name="Draws", value=str(draws), inline=True)
+            embed.add_field(name="Rank", value=f"#{rank}" if rank else "Unranked", inline=True)
+            embed.set_thumbnail(url=member.display_avatar.url)
+            await ctx.send(embed=embed)
+            return
+
+        fetch = partial(get_leaderboard_page, guild_id, "tictactoe")
+        page = await fetch()
+        if not page.rows:
+            await ctx.send(embed=InfoEmbed("No tic-tac-toe games have been played yet!"))
+            return
+
+        view = LeaderboardView(self.bot, ctx.author, ctx.guild, "🏆 Tic-tac-toe Leaderboard", fetch, page)
+        view.message = await ctx.send(embed=view.build_embed(), view=view)
 
 
 async def setup(bot: commands.Bot) -> None:
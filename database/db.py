@@ -1,24 +1,144 @@
-from tortoise import Tortoise
-
-TORTOISE_ORM = {
-    "connections": {"default": "sqlite://db.sqlite3"},
-    "apps": {
-        "models": {
-            "models": ["database.models", "aerich.models"],
-            "default_connection": "default",
+"""SQLite storage engine setup.
+
+Everything about how the database is opened lives here.  Settings are read
+from the environment (see :meth:`DatabaseSettings.from_env`) and turned into
+one writer connection (``default``) plus a small pool of read-only
+connections.  With ``journal_mode=WAL`` readers never block the writer and
+the writer never blocks readers, so leaderboard reads can run while game
+results are being flushed.
+
+Schema changes are not made here; see :mod:`database.migrations`.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+from urllib.parse import urlencode
+
+from tortoise import Tortoise, connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+
+logger = logging.getLogger(__name__)
+
+WRITE_CONNECTION = "default"
+READ_CONNECTION_PREFIX = "reader_"
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    """Tunable SQLite settings.
+
+    ``cache_size`` follows SQLite's convention: negative values are KiB,
+    positive values are pages.
+    """
+
+    path: str = "db.sqlite3"
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size: int = -64000
+    busy_timeout: int = 5000
+    read_connections: int = 2
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        """Build settings from ``DB_*`` environment variables."""
+        defaults = cls()
+        return cls(
+            path=os.getenv("DB_PATH", defaults.path),
+            journal_mode=os.getenv("DB_JOURNAL_MODE", defaults.journal_mode).upper(),
+            synchronous=os.getenv("DB_SYNCHRONOUS", defaults.synchronous).upper(),
+            mmap_size=int(os.getenv("DB_MMAP_SIZE", defaults.mmap_size)),
+            cache_size=int(os.getenv("DB_CACHE_SIZE", defaults.cache_size)),
+            busy_timeout=int(os.getenv("DB_BUSY_TIMEOUT", defaults.busy_timeout)),
+            read_connections=max(1, int(os.getenv("DB_READ_CONNECTIONS", defaults.read_connections))),
+        )
+
+    def pragmas(self) -> Dict[str, Any]:
+        return {
+            "journal_mode": self.journal_mode,
+            "synchronous": self.synchronous,
+            "mmap_size": self.mmap_size,
+            "cache_size": self.cache_size,
+            "busy_timeout": self.busy_timeout,
         }
-    },
-}
-
-async def init_db():
-    """Initialize the database connection."""
-    await Tortoise.init(
-        db_url="sqlite://db.sqlite3",
-        modules={"models": ["database.models"]}
+
+    def url(self, read_only: bool = False) -> str:
+        """Return a Tortoise ``sqlite://`` URL; query parameters become pragmas."""
+        pragmas = self.pragmas()
+        if read_only:
+            pragmas["query_only"] = 1
+        return f"sqlite://{self.path}?{urlencode(pragmas)}"
+
+
+def build_tortoise_config(settings: DatabaseSettings) -> Dict[str, Any]:
+    """Return the Tortoise config for ``settings``: one writer, N readers."""
+    db_connections = {WRITE_CONNECTION: settings.url()}
+    for index in range(settings.read_connections):
+        db_connections[f"{READ_CONNECTION_PREFIX}{index}"] = settings.url(read_only=True)
+    return {
+        "connections": db_connections,
+        "apps": {
+            "models": {
+                "models": ["database.models"],
+                "default_connection": WRITE_CONNECTION,
+            }
+        },
+    }
+
+
+SETTINGS = DatabaseSettings.from_env()
+TORTOISE_ORM = build_tortoise_config(SETTINGS)
+
+_readers: Optional[Iterator[str]] = None
+
+
+def read_connection() -> BaseDBAsyncClient:
+    """Return the next read-only connection from the pool (round robin)."""
+    return connections.get(next(_readers))
+
+
+async def init_db(settings: Optional[DatabaseSettings] = None):
+    """Initialize the database connections."""
+    global _readers
+
+    settings = settings or SETTINGS
+    await Tortoise.init(config=build_tortoise_config(settings))
+    _readers = itertools.cycle(
+        [f"{READ_CONNECTION_PREFIX}{index}" for index in range(settings.read_connections)]
     )
-    # In production, use migrations (aerich). For now, generate schema automatically.
-    await Tortoise.generate_schemas()
+    # The schema itself is managed by ``database.migrations``.
+    await report_settings(settings)
+
+
+async def report_settings(settings: DatabaseSettings) -> Dict[str, Any]:
+    """Log the pragmas SQLite actually applied on the writer connection."""
+    connection = connections.get(WRITE_CONNECTION)
+    applied = {}
+    for pragma in settings.pragmas():
+        _, rows = await connection.execute_query(f"PRAGMA {pragma}")
+        applied[pragma] = rows[0][0] if rows else None
+
+    logger.info(
+        "Database %s ready with %d read connection(s): %s",
+        settings.path,
+        settings.read_connections,
+        ", ".join(f"{key}={value}" for key, value in applied.items()),
+    )
+    if str(applied.get("journal_mode", "")).upper() != settings.journal_mode:
+        logger.warning(
+            "Requested journal_mode=%s but SQLite is using %s",
+            settings.journal_mode,
+            applied.get("journal_mode"),
+        )
+    return applied
+
 
 async def close_db():
-    """Close the database connection."""
+    """Close the database connections."""
     await Tortoise.close_connections()
@@ -0,0 +1,135 @@
+"""In-memory leaderboard indexes.
+
+Each :class:`GuildLeaderboard` keeps the standings of one game in one guild
+in a :class:`~sortedcontainers.SortedList` ordered by
+``(-wins, losses, user_id)``, so top-N reads are a slice, rank lookups are
+a binary search, and moving a player after a result costs O(log n) rather
+than shifting the rest of a plain list.  Pages are addressed by keyset: the
+``(user_id, wins, losses)`` row on the edge of the current page is the
+cursor, and finding the next page is a binary search for that row's sort
+key, so every page costs the same no matter how deep it is.
+
+:class:`LeaderboardCache` holds the indexes of recently used guilds and
+evicts the least recently used ones.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, NamedTuple, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+
+SortKey = Tuple[int, int, int]
+Row = Tuple[int, int, int]
+
+
+class LeaderboardPage(NamedTuple):
+    """A slice of a leaderboard: ``(user_id, wins, losses)`` rows."""
+
+    rows: List[Row]
+    start_rank: int
+    total: int
+
+
+class GuildLeaderboard:
+    """Sorted standings for a single game in a single guild."""
+
+    def __init__(self, rows: Iterable[Tuple[int, int, int]] = ()) -> None:
+        self._stats: Dict[int, Tuple[int, int]] = {}
+        for user_id, wins, losses in rows:
+            if wins or losses:
+                self._stats[user_id] = (wins, losses)
+        self._keys: SortedList = SortedList(
+            self._key(user_id, wins, losses)
+            for user_id, (wins, losses) in self._stats.items()
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @staticmethod
+    def _key(user_id: int, wins: int, losses: int) -> SortKey:
+        return (-wins, losses, user_id)
+
+    def update(self, user_id: int, wins: int = 0, losses: int = 0) -> None:
+        """Add ``wins`` and ``losses`` to the standing of ``user_id``.
+
+        Draws change neither, and players without wins or losses are not
+        ranked (see ``__init__``), so they are ignored.
+        """
+        if not wins and not losses:
+            return
+        old_wins, old_losses = self._stats.get(user_id, (0, 0))
+        if user_id in self._stats:
+            self._keys.remove(self._key(user_id, old_wins, old_losses))
+
+        new_wins, new_losses = old_wins + wins, old_losses + losses
+        self._stats[user_id] = (new_wins, new_losses)
+        self._keys.add(self._key(user_id, new_wins, new_losses))
+
+    def top(self, limit: int) -> List[Row]:
+        """Return ``(user_id, wins, losses)`` for the best ``limit`` players."""
+        return self._page(0, limit).rows
+
+    def _page(self, start: int, limit: int) -> LeaderboardPage:
+        start = max(0, min(start, len(self._keys)))
+        rows = [
+            (user_id, -neg_wins, losses)
+            for neg_wins, losses, user_id in self._keys.islice(start, start + limit)
+        ]
+        return LeaderboardPage(rows, start + 1, len(self._keys))
+
+    def page_after(self, cursor: Optional[Row], limit: int) -> LeaderboardPage:
+        """Return the ``limit`` rows ranked directly below ``cursor``."""
+        if cursor is None:
+            return self._page(0, limit)
+        user_id, wins, losses = cursor
+        return self._page(self._keys.bisect_right(self._key(user_id, wins, losses)), limit)
+
+    def page_before(self, cursor: Row, limit: int) -> LeaderboardPage:
+        """Return the ``limit`` rows ranked directly above ``cursor``."""
+        user_id, wins, losses = cursor
+        end = self._keys.bisect_left(self._key(user_id, wins, losses))
+        return self._page(max(0, end - limit), min(end, limit))
+
+    def page_of(self, user_id: int, limit: int) -> Optional[LeaderboardPage]:
+        """Return the page (aligned to ``limit``) that contains ``user_id``."""
+        rank = self.rank(user_id)
+        if rank is None:
+            return None
+        return self._page((rank - 1) // limit * limit, limit)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """Return the 1-based rank of ``user_id`` or ``None`` if unranked."""
+        stats = self._stats.get(user_id)
+        if stats is None:
+            return None
+        return self._keys.bisect_left(self._key(user_id, *stats)) + 1
+
+
+class LeaderboardCache:
+    """LRU mapping of ``(guild_id, game)`` to :class:`GuildLeaderboard`."""
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._boards: OrderedDict[Hashable, GuildLeaderboard] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[GuildLeaderboard]:
+        board = self._boards.get(key)
+        if board is not None:
+            self._boards.move_to_end(key)
+        return board
+
+    def put(self, key: Hashable, board: GuildLeaderboard) -> None:
+        self._boards[key] = board
+        self._boards.move_to_end(key)
+        while len(self._boards) > self.max_size:
+            self._boards.popitem(last=False)
+
+    def apply(self, key: Hashable, user_id: int, wins: int = 0, losses: int = 0) -> None:
+        """Update a loaded board; boards that are not cached are left alone."""
+        board = self._boards.get(key)
+        if board is not None:
+            board.update(user_id, wins, losses)
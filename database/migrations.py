@@ -0,0 +1,170 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in ``schema_migrations``.  On startup
+:func:`apply_migrations` reads that table and runs only what is missing, so a
+warm start costs a single query instead of a full schema introspection.
+
+Migrations marked ``online`` (index builds and similar work that queries do
+not depend on for correctness) are skipped at startup and applied by
+:func:`apply_online_migrations` in the background once the bot is running.
+To change the schema, append a new :class:`Migration` with the next version
+number; never edit one that has already shipped.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Set, Tuple
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+from database.db import WRITE_CONNECTION
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single schema change.
+
+    ``statements`` are executed in order inside one transaction; ``apply``
+    is an optional coroutine run in the same transaction for changes that
+    need logic, such as data moves.
+    """
+
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    apply: Optional[Callable[[BaseDBAsyncClient], Awaitable[None]]] = None
+    online: bool = False
+
+
+async def _move_legacy_stats(connection: BaseDBAsyncClient) -> None:
+    """Copy the wide ``user_stats`` rows into ``game_stats``.
+
+    The old table is kept as ``user_stats_legacy`` rather than dropped.
+    """
+    _, tables = await connection.execute_query(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'user_stats'"
+    )
+    if not tables:
+        return
+
+    for game in ("rps", "hangman"):
+        await connection.execute_query(
+            "INSERT INTO game_stats (guild_id, user_id, game, wins, losses, draws) "
+            f"SELECT guild_id, user_id, ?, {game}_wins, {game}_losses, 0 FROM user_stats "
+            f"WHERE {game}_wins > 0 OR {game}_losses > 0",
+            [game],
+        )
+    await connection.execute_query("ALTER TABLE user_stats RENAME TO user_stats_legacy")
+
+
+MIGRATIONS: Tuple[Migration, ...] = (
+    Migration(
+        1,
+        "create game_stats",
+        (
+            'CREATE TABLE IF NOT EXISTS "game_stats" ('
+            '"id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, '
+            '"guild_id" BIGINT NOT NULL, '
+            '"user_id" BIGINT NOT NULL, '
+            '"game" VARCHAR(32) NOT NULL, '
+            '"wins" INT NOT NULL DEFAULT 0, '
+            '"losses" INT NOT NULL DEFAULT 0, '
+            '"draws" INT NOT NULL DEFAULT 0, '
+            'UNIQUE ("guild_id", "user_id", "game"))',
+        ),
+    ),
+    Migration(2, "move legacy user_stats", apply=_move_legacy_stats),
+    Migration(
+        3,
+        "leaderboard covering index",
+        # Matches the leaderboard sort order (wins DESC, losses ASC, user_id)
+        # and carries every selected column, so reads never touch the table.
+        (
+            "CREATE INDEX IF NOT EXISTS idx_game_stats_leaderboard "
+            "ON game_stats (guild_id, game, wins DESC, losses ASC, user_id, draws)",
+        ),
+        online=True,
+    ),
+    Migration(
+        4,
+        "create gif_pools",
+        (
+            'CREATE TABLE IF NOT EXISTS "gif_pools" ('
+            '"term" VARCHAR(100) PRIMARY KEY NOT NULL, '
+            '"urls" TEXT NOT NULL, '
+            '"fetched_at" REAL NOT NULL)',
+        ),
+    ),
+    Migration(
+        5,
+        "create game_states",
+        (
+            'CREATE TABLE IF NOT EXISTS "game_states" ('
+            '"key" VARCHAR(32) PRIMARY KEY NOT NULL, '
+            '"game" VARCHAR(32) NOT NULL, '
+            '"data" TEXT NOT NULL, '
+            '"updated_at" REAL NOT NULL)',
+        ),
+    ),
+)
+
+
+async def _applied_versions(connection: BaseDBAsyncClient) -> Set[int]:
+    await connection.execute_script(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY NOT NULL, "
+        "name TEXT NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    )
+    _, rows = await connection.execute_query("SELECT version FROM schema_migrations")
+    return {row[0] for row in rows}
+
+
+async def _run(migration: Migration) -> None:
+    async with in_transaction(WRITE_CONNECTION) as transaction:
+        for statement in migration.statements:
+            # Not execute_script: sqlite3.executescript() commits first.
+            await transaction.execute_query(statement)
+        if migration.apply is not None:
+            await migration.apply(transaction)
+        await transaction.execute_query(
+            "INSERT INTO schema_migrations (version, name) VALUES (?, ?)",
+            [migration.version, migration.name],
+        )
+    logger.info("Applied migration %d: %s", migration.version, migration.name)
+
+
+async def _apply(online: bool) -> int:
+    applied = await _applied_versions(connections.get(WRITE_CONNECTION))
+    pending = [
+        migration
+        for migration in MIGRATIONS
+        if migration.version not in applied and migration.online == online
+    ]
+    for migration in pending:
+        await _run(migration)
+    return len(pending)
+
+
+async def apply_migrations() -> int:
+    """Apply pending blocking migrations; returns how many were applied."""
+    count = await _apply(online=False)
+    if not count:
+        logger.debug("Database schema is up to date")
+    return count
+
+
+async def apply_online_migrations() -> int:
+    """Apply pending online migrations; meant to run as a background task.
+
+    A failed or cancelled migration is rolled back and retried on the next
+    start; the caller logs the error.
+    """
+    return await _apply(online=True)
@@ -1,24 +1,54 @@
 from tortoise import fields, models
 
-class UserStats(models.Model):
-    """Model to store user game statistics."""
-    
-    # Composite primary key simulation: We will use ID as PK but enforce uniqueness on guild_id + user_id
+class GameStats(models.Model):
+    """Model to store a user's results for a single game.
+
+    There is one row per (guild_id, user_id, game), so adding a game needs
+    no schema change.  Leaderboards are read through the covering index
+    created in :mod:`database.migrations`.
+    """
+
     id = fields.IntField(pk=True)
     guild_id = fields.BigIntField()
     user_id = fields.BigIntField()
-    
-    # RPS Stats
-    rps_wins = fields.IntField(default=0)
-    rps_losses = fields.IntField(default=0)
-    
-    # Hangman Stats
-    hangman_wins = fields.IntField(default=0)
-    hangman_losses = fields.IntField(default=0)
+    game = fields.CharField(max_length=32)
+
+    wins = fields.IntField(default=0)
+    losses = fields.IntField(default=0)
+    draws = fields.IntField(default=0)
+
+    class Meta:
+        table = "game_stats"
+        unique_together = (("guild_id", "user_id", "game"),)
+
+    def __str__(self):
+        return f"GameStats(user={self.user_id}, guild={self.guild_id}, game={self.game})"
+
+
+class GifPoolRecord(models.Model):
+    """Persisted Tenor search results for one search term."""
+
+    term = fields.CharField(max_length=100, pk=True)
+    urls = fields.TextField()  # JSON encoded list of GIF URLs
+    fetched_at = fields.FloatField()  # Unix timestamp of the Tenor search
+
+    class Meta:
+        table = "gif_pools"
+
+    def __str__(self):
+        return f"GifPoolRecord(term={self.term})"
+
+
+class GameStateRecord(models.Model):
+    """Persisted part of a running game, for games that outlive a restart."""
+
+    key = fields.CharField(max_length=32, pk=True)
+    game = fields.CharField(max_length=32)
+    data = fields.TextField()  # JSON encoded game specific state
+    updated_at = fields.FloatField()  # Unix timestamp of the last save
 
     class Meta:
-        table = "user_stats"
-        unique_together = (("guild_id", "user_id"),)
+        table = "game_states"
 
     def __str__(self):
-        return f"UserStats(user={self.user_id}, guild={self.guild_id})"
+        return f"GameStateRecord(key={self.key}, game={self.game})"
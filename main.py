@@ -8,15 +8,21 @@ before the bot connects to Discord.
 
 from __future__ import annotations
 
+import asyncio
 import logging
 import os
 import traceback
 
+import aiohttp
 import discord
 from discord.ext import commands
 from discord import app_commands
 from dotenv import load_dotenv
 
+from utils.gateway_record import GatewayRecorder
+from utils.render import RenderScheduler
+from utils.sessions import SessionManager
+
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -26,6 +32,26 @@ load_dotenv()  # Load environment variables from .env file
 TOKEN = os.getenv("DISCORD_TOKEN")
 DEFAULT_PREFIX = "!"
 
+# Shared outbound HTTP client (see ``SyaaBot.http_session``)
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_SIZE_PER_HOST = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+
+# Running game limits (see ``SyaaBot.sessions``)
+GAME_MAX_SESSIONS = int(os.getenv("GAME_MAX_SESSIONS", "5000"))
+GAME_MAX_PER_GUILD = int(os.getenv("GAME_MAX_PER_GUILD", "100"))
+GAME_MAX_PER_CHANNEL = int(os.getenv("GAME_MAX_PER_CHANNEL", "10"))
+GAME_IDLE_TIMEOUT = float(os.getenv("GAME_IDLE_TIMEOUT", "600"))
+GAME_DUPLICATES = os.getenv("GAME_DUPLICATES", "replace")
+# Minimum seconds between two edits of the same game message
+RENDER_INTERVAL = float(os.getenv("RENDER_INTERVAL", "1"))
+
+# Record anonymized gateway events for benchmarks/gateway_replay.py
+GATEWAY_RECORD_PATH = os.getenv("GATEWAY_RECORD_PATH")
+GATEWAY_RECORD_MAX_EVENTS = int(os.getenv("GATEWAY_RECORD_MAX_EVENTS", "100000"))
+
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.INFO),
@@ -44,14 +70,67 @@ class SyaaBot(commands.Bot):
             command_prefix=commands.when_mentioned_or(DEFAULT_PREFIX),
             intents=intents,
             help_command=None,
+            # Raw gateway messages are only dispatched for the recorder.
+            enable_debug_events=bool(GATEWAY_RECORD_PATH),
+        )
+        # Bot-lifetime HTTP client for cogs; created in ``setup_hook`` because
+        # it has to be bound to the running event loop.
+        self.http_session: aiohttp.ClientSession | None = None
+        # Every running game, so game load stays bounded.
+        self.sessions = SessionManager(
+            max_sessions=GAME_MAX_SESSIONS,
+            max_per_guild=GAME_MAX_PER_GUILD,
+            max_per_channel=GAME_MAX_PER_CHANNEL,
+            idle_timeout=GAME_IDLE_TIMEOUT,
+            duplicates=GAME_DUPLICATES,
         )
+        # Coalesces edits of game messages.
+        self.renderer = RenderScheduler(RENDER_INTERVAL)
+        self.recorder: GatewayRecorder | None = None
+        # Index builds and other online migrations, started in ``setup_hook``.
+        self._online_migrations: asyncio.Task[int] | None = None
 
     async def setup_hook(self) -> None:
         """Load extensions and sync the application command tree."""
 
-        # Initialize Database
+        # Pooled keep-alive connections are reused by every cog
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_SIZE,
+            limit_per_host=HTTP_POOL_SIZE_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        self.http_session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+        )
+
+        # Initialize Database and bring the schema up to date. Online
+        # migrations (index builds) finish in the background.
         from database.db import init_db
+        from database.migrations import apply_migrations, apply_online_migrations
         await init_db()
+        await apply_migrations()
+        self._online_migrations = asyncio.create_task(apply_online_migrations())
+        self._online_migrations.add_done_callback(self._online_migrations_done)
+
+        # Start writing buffered game stats in the background
+        from cogs.storage import start_write_buffer
+        start_write_buffer()
+
+        # Evict idle games in the background
+        self.sessions.start()
+
+        if GATEWAY_RECORD_PATH:
+            self.recorder = GatewayRecorder(
+                GATEWAY_RECORD_PATH,
+                bot_id=self.user.id,
+                application_id=self.application_id,
+                prefixes=(DEFAULT_PREFIX,),
+                max_events=GATEWAY_RECORD_MAX_EVENTS,
+            )
+            self.add_listener(self.recorder.on_socket_raw_receive, "on_socket_raw_receive")
+            logger.info("Recording gateway events to %s", GATEWAY_RECORD_PATH)
 
         # Load available extensions
         for extension in [
@@ -71,6 +150,54 @@ class SyaaBot(commands.Bot):
         # Sync slash commands
         await self.tree.sync()
 
+    # Cogs that index other cogs (the help menu) rebuild on this event.
+    # ``reload_extension`` is not overridden: it calls ``load_extension``,
+    # which already dispatches it once.
+    async def load_extension(self, name: str, *, package: str | None = None) -> None:
+        await super().load_extension(name, package=package)
+        self.dispatch("extensions_changed", self._resolve_name(name, package))
+
+    async def unload_extension(self, name: str, *, package: str | None = None) -> None:
+        await super().unload_extension(name, package=package)
+        self.dispatch("extensions_changed", self._resolve_name(name, package))
+
+    @staticmethod
+    def _online_migrations_done(task: asyncio.Task[int]) -> None:
+        if task.cancelled():
+            logger.info("Online migrations were cancelled; they will run on next start")
+        elif task.exception() is not None:
+            logger.error(
+                "Online migrations failed; they will be retried on next start",
+                exc_info=task.exception(),
+            )
+        elif task.result():
+            logger.info("Applied %d online migration(s)", task.result())
+
+    async def close(self) -> None:
+        """Close the HTTP client, drain buffered game stats and close the database."""
+        if self.is_closed():
+            return
+
+        # Send the last renders while the connection is still open.
+        await self.renderer.close()
+        await super().close()
+        await self.sessions.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+        if self.http_session is not None:
+            await self.http_session.close()
+
+        from cogs.storage import stop_write_buffer
+        from database.db import close_db
+        # An index build must not be running when the database is closed;
+        # the migration is rolled back and runs again on next start.
+        if self._online_migrations is not None:
+            self._online_migrations.cancel()
+            await asyncio.gather(self._online_migrations, return_exceptions=True)
+        await stop_write_buffer()
+        await close_db()
+
     async def on_command_error(
         self, ctx: commands.Context, error: commands.CommandError
     ) -> None:
@@ -151,5 +278,6 @@ async def prefix(interaction: discord.Interaction) -> None:
     )
 
 
-bot.run(TOKEN)
+if __name__ == "__main__":
+    bot.run(TOKEN)
 
@@ -0,0 +1,11 @@
+from cogs.actions import Actions, load_fallback_gifs
+
+
+def test_every_action_has_a_fallback_gif():
+    fallback = load_fallback_gifs()
+    verbs = [command.name for command in Actions.__cog_commands__ if not command.hidden]
+    assert verbs
+    for verb in verbs:
+        assert fallback.get(verb), f"assets/gifs/{verb}/ has no GIF"
+        for path in fallback[verb]:
+            assert path.read_bytes().startswith(b"GIF89a")
@@ -0,0 +1,93 @@
+import math
+
+import pytest
+
+from utils.calc import MAX_EXPRESSION_LENGTH, CalcError, evaluate, evaluate_range
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "().__class__",
+        "(1).real",
+        "x",
+        "__import__('os')",
+        "open('calc.txt')",
+        "sum(range(10))",
+        "(lambda: 1)()",
+        "[x for x in (1, 2)]",
+        "{x for x in (1, 2)}",
+        "sqrt(x=2)",
+    ],
+)
+def test_rejects_everything_but_arithmetic(expression):
+    with pytest.raises(CalcError):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["9**9**9", "2**100000000", "2**-(10**9) as fraction", "factorial(10**6)", "10**10**5 * 10**10**5"],
+)
+def test_rejects_huge_results_before_computing_them(expression):
+    with pytest.raises(CalcError, match="too large"):
+        evaluate(expression)
+
+
+def test_rejects_long_expressions():
+    with pytest.raises(CalcError, match="longer than"):
+        evaluate("1+" * MAX_EXPRESSION_LENGTH + "1")
+
+
+def test_step_budget():
+    assert evaluate("1+1+1+1", max_steps=10).text == "4"
+    with pytest.raises(CalcError, match="too expensive"):
+        evaluate("+".join(["1"] * 20), max_steps=10)
+
+
+def test_float_mode():
+    assert evaluate("2 ** 10 + sqrt(16)").text == "1028"
+    with pytest.raises(CalcError, match="Division by zero"):
+        evaluate("1 / 0")
+
+
+def test_decimal_mode():
+    assert evaluate("sqrt(2) to 30 digits").text == "1.41421356237309504880168872421"
+    assert evaluate("pi to 20 digits").text == "3.1415926535897932385"
+    assert evaluate("e to 20 digits").text == "2.7182818284590452354"
+    assert evaluate("1/3 to 5 digits").text == "0.33333"
+
+
+def test_decimal_series_precision_is_limited():
+    assert evaluate("exp(1) to 10 digits").text == "2.718281828"
+    for expression in ("exp(1) to 2000 digits", "log(2) to 2000 digits", "2 ** 0.5 to 2000 digits"):
+        with pytest.raises(CalcError, match="limited to"):
+            evaluate(expression)
+
+
+def test_fraction_mode():
+    assert evaluate("1/3 + 1/6 as fraction").text == "1/2"
+    assert evaluate("(2/3) ** -2 as fraction").text == "9/4"
+
+
+def test_long_results_are_spilled(tmp_path):
+    spill = tmp_path / "result.txt"
+    result = evaluate("factorial(1000)", str(spill))
+    assert result.spilled
+    assert spill.read_text() == str(math.factorial(1000))
+    assert result.length == len(spill.read_text())
+
+
+def test_range():
+    table = evaluate_range("x**2 for x in 0..1 step 0.5")
+    assert table.points == 3
+    assert (table.minimum, table.maximum) == (0, 1)
+    assert table.csv.decode().splitlines() == ["x,result", "0,0", "0.5,0.25", "1,1"]
+
+
+@pytest.mark.parametrize(
+    "text", ["x for x in (-1)**0.5..2", "x for x in 0..1e308", "x for x in 1..0", "x for x in 0..1 step 0"]
+)
+def test_rejects_bad_ranges(text):
+    with pytest.raises(CalcError):
+        evaluate_range(text)
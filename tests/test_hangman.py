@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+from cogs.hangman import Hangman, HangmanState
+
+
+class Sessions:
+    def __init__(self):
+        self.touched = []
+
+    def touch(self, game, key, *args):
+        self.touched.append((game, key))
+        return True
+
+
+def interaction(user_id):
+    sent = []
+
+    async def send_message(content, **kwargs):
+        sent.append(content)
+
+    return SimpleNamespace(
+        user=SimpleNamespace(id=user_id),
+        channel_id=5,
+        message=SimpleNamespace(id=7),
+        response=SimpleNamespace(send_message=send_message),
+        sent=sent,
+    )
+
+
+def check(state, user_id, turn=False):
+    sessions = Sessions()
+    cog = Hangman(SimpleNamespace(sessions=sessions))
+    clicked = interaction(user_id)
+    allowed = asyncio.run(cog.check_player(clicked, state, turn))
+    return allowed, clicked.sent, sessions.touched
+
+
+def test_only_the_players_clicks_keep_a_game_alive():
+    state = HangmanState("g", "otter", (1, 2), False, None, 3)
+    assert check(state, 1) == (True, [], [("hangman", "g")])
+    assert check(state, 9) == (False, ["You're not playing this game."], [])
+
+
+def test_a_click_out_of_turn_does_not_keep_a_game_alive():
+    state = HangmanState("g", "otter", (1, 99), True, None, 3, turn=1)
+    assert check(state, 1, turn=True) == (False, ["It's not your turn!"], [])
+    # A hint is not a turn.
+    assert check(state, 1) == (True, [], [("hangman", "g")])
@@ -0,0 +1,85 @@
+import random
+
+from database.leaderboard import GuildLeaderboard, LeaderboardCache
+
+
+def reference(stats):
+    """Rows sorted the slow way: most wins, then fewest losses, then user id."""
+    rows = [(user_id, wins, losses) for user_id, (wins, losses) in stats.items() if wins or losses]
+    return sorted(rows, key=lambda row: (-row[1], row[2], row[0]))
+
+
+def test_ordering_and_unranked_players():
+    board = GuildLeaderboard([(1, 3, 1), (2, 3, 0), (3, 5, 9), (4, 0, 0)])
+    assert board.top(10) == [(3, 5, 9), (2, 3, 0), (1, 3, 1)]
+    assert len(board) == 3
+    assert board.rank(2) == 2
+    assert board.rank(4) is None
+
+
+def test_update_matches_a_full_sort():
+    rng = random.Random(7)
+    stats = {user_id: (rng.randrange(5), rng.randrange(5)) for user_id in range(200)}
+    board = GuildLeaderboard((user_id, *counts) for user_id, counts in stats.items())
+    for _ in range(2000):
+        user_id = rng.randrange(250)
+        wins, losses = rng.choice([(1, 0), (0, 1), (0, 0)])
+        board.update(user_id, wins, losses)
+        old_wins, old_losses = stats.get(user_id, (0, 0))
+        stats[user_id] = (old_wins + wins, old_losses + losses)
+    expected = reference(stats)
+    assert board.top(len(expected) + 5) == expected
+    for rank, (user_id, _, _) in enumerate(expected, 1):
+        assert board.rank(user_id) == rank
+
+
+def test_draws_do_not_rank_a_player():
+    board = GuildLeaderboard()
+    board.update(1)
+    assert len(board) == 0 and board.rank(1) is None
+
+
+def test_keyset_paging():
+    rows = [(user_id, 100 - user_id, user_id % 3) for user_id in range(25)]
+    board = GuildLeaderboard(rows)
+    expected = reference({user_id: (wins, losses) for user_id, wins, losses in rows})
+
+    first = board.page_after(None, 10)
+    assert first.rows == expected[:10] and first.start_rank == 1 and first.total == 25
+    second = board.page_after(first.rows[-1], 10)
+    assert second.rows == expected[10:20] and second.start_rank == 11
+    last = board.page_after(second.rows[-1], 10)
+    assert last.rows == expected[20:]
+    assert board.page_after(last.rows[-1], 10).rows == []
+
+    assert board.page_before(second.rows[0], 10).rows == expected[:10]
+    assert board.page_before(last.rows[0], 10).rows == expected[10:20]
+    assert board.page_before(expected[3], 10).rows == expected[:3]
+
+
+def test_paging_around_a_user():
+    board = GuildLeaderboard((user_id, 100 - user_id, 0) for user_id in range(25))
+    page = board.page_of(13, 10)
+    assert page.start_rank == 11
+    assert [row[0] for row in page.rows] == list(range(10, 20))
+    assert board.page_of(99, 10) is None
+
+
+def test_cursor_survives_updates():
+    board = GuildLeaderboard((user_id, 100 - user_id, 0) for user_id in range(20))
+    first = board.page_after(None, 5)
+    # A player from further down moves onto the first page.
+    board.update(15, wins=50)
+    assert [row[0] for row in board.page_after(first.rows[-1], 5).rows] == [5, 6, 7, 8, 9]
+
+
+def test_cache_evicts_least_recently_used():
+    cache = LeaderboardCache(2)
+    boards = [GuildLeaderboard() for _ in range(3)]
+    cache.put("a", boards[0])
+    cache.put("b", boards[1])
+    assert cache.get("a") is boards[0]
+    cache.put("c", boards[2])
+    assert cache.get("b") is None
+    cache.apply("a", 1, wins=1)
+    assert boards[0].rank(1) == 1
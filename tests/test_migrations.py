@@ -0,0 +1,106 @@
+import asyncio
+import sqlite3
+
+import pytest
+from tortoise import connections
+
+import database.migrations as migrations
+from database.db import WRITE_CONNECTION, DatabaseSettings, close_db, init_db
+
+
+LEGACY_SCHEMA = (
+    'CREATE TABLE "user_stats" ('
+    '"id" INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL, '
+    '"guild_id" BIGINT NOT NULL, '
+    '"user_id" BIGINT NOT NULL, '
+    '"rps_wins" INT NOT NULL DEFAULT 0, '
+    '"rps_losses" INT NOT NULL DEFAULT 0, '
+    '"hangman_wins" INT NOT NULL DEFAULT 0, '
+    '"hangman_losses" INT NOT NULL DEFAULT 0, '
+    'UNIQUE ("guild_id", "user_id"))'
+)
+
+
+def run(path, scenario):
+    async def wrapper():
+        await init_db(DatabaseSettings(path=str(path), read_connections=1))
+        try:
+            return await scenario(connections.get(WRITE_CONNECTION))
+        finally:
+            await close_db()
+
+    return asyncio.run(wrapper())
+
+
+def test_legacy_stats_are_moved(tmp_path):
+    path = tmp_path / "legacy.sqlite3"
+    with sqlite3.connect(path) as legacy:
+        legacy.execute(LEGACY_SCHEMA)
+        legacy.executemany(
+            "INSERT INTO user_stats (guild_id, user_id, rps_wins, rps_losses, hangman_wins, hangman_losses) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(1, 10, 3, 1, 0, 0), (1, 11, 0, 0, 2, 5), (2, 10, 1, 0, 1, 0), (2, 12, 0, 0, 0, 0)],
+        )
+    legacy.close()
+
+    async def scenario(connection):
+        await migrations.apply_migrations()
+        _, rows = await connection.execute_query(
+            "SELECT guild_id, user_id, game, wins, losses, draws FROM game_stats ORDER BY 1, 2, 3"
+        )
+        _, tables = await connection.execute_query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'user_stats%'"
+        )
+        return [tuple(row) for row in rows], {row[0] for row in tables}
+
+    rows, tables = run(path, scenario)
+    assert rows == [
+        (1, 10, "rps", 3, 1, 0),
+        (1, 11, "hangman", 2, 5, 0),
+        (2, 10, "hangman", 1, 0, 0),
+        (2, 10, "rps", 1, 0, 0),
+    ]
+    assert tables == {"user_stats_legacy"}
+
+
+def test_fresh_database_and_warm_start(tmp_path):
+    path = tmp_path / "fresh.sqlite3"
+
+    async def scenario(connection):
+        first = await migrations.apply_migrations()
+        online = await migrations.apply_online_migrations()
+        again = await migrations.apply_migrations() + await migrations.apply_online_migrations()
+        _, versions = await connection.execute_query("SELECT version FROM schema_migrations")
+        return first, online, again, sorted(row[0] for row in versions)
+
+    first, online, again, versions = run(path, scenario)
+    blocking = [m.version for m in migrations.MIGRATIONS if not m.online]
+    assert first == len(blocking)
+    assert online == len(migrations.MIGRATIONS) - len(blocking)
+    assert again == 0
+    assert versions == [m.version for m in migrations.MIGRATIONS]
+
+
+def test_failed_migration_is_rolled_back(tmp_path, monkeypatch):
+    path = tmp_path / "broken.sqlite3"
+    broken = migrations.Migration(
+        99,
+        "broken",
+        ('CREATE TABLE "half_done" ("id" INTEGER PRIMARY KEY)', "NOT VALID SQL"),
+    )
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS + (broken,))
+
+    async def scenario(connection):
+        with pytest.raises(Exception):
+            await migrations.apply_migrations()
+        _, tables = await connection.execute_query(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'half_done'"
+        )
+        _, versions = await connection.execute_query(
+            "SELECT version FROM schema_migrations WHERE version = 99"
+        )
+        return tables, versions
+
+    tables, versions = run(path, scenario)
+    assert not tables
+    assert not versions
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import aiohttp
+
+from utils.render import RenderScheduler
+
+
+class Message:
+    def __init__(self, message_id, channel_id=1, error=None):
+        self.id = message_id
+        self.channel = SimpleNamespace(id=channel_id)
+        self.error = error
+        self.edits = []
+
+    async def edit(self, **fields):
+        if self.error is not None:
+            raise self.error
+        self.edits.append(fields)
+
+
+def test_renders_are_merged():
+    async def scenario():
+        renderer = RenderScheduler(interval=0.05, channel_window=0.2)
+        message = Message(1)
+        renderer.schedule(message, content="a")
+        await asyncio.sleep(0.01)
+        renderer.schedule(message, content="b", view=None)
+        renderer.schedule(message, content="c")
+        await asyncio.sleep(0.3)
+        await renderer.close()
+        return message.edits, renderer.stats()
+
+    edits, stats = asyncio.run(scenario())
+    assert edits == [{"content": "a"}, {"content": "c", "view": None}]
+    assert stats["dropped"] == 1 and stats["pending"] == 0
+
+
+def test_edits_are_paced_per_channel():
+    async def scenario():
+        renderer = RenderScheduler(interval=0.01, channel_edits=2, channel_window=0.3)
+        loop = asyncio.get_running_loop()
+        times = []
+
+        async def edit(**fields):
+            times.append(loop.time())
+
+        for message_id in range(4):
+            message = Message(message_id)
+            message.edit = edit
+            renderer.schedule(message, content="x")
+        other = Message(99, channel_id=2)
+        renderer.schedule(other, content="y")
+        await asyncio.sleep(0.05)
+        early = len(times)
+        await asyncio.sleep(0.4)
+        await renderer.close()
+        return early, times, other.edits
+
+    early, times, other = asyncio.run(scenario())
+    assert early == 2
+    assert len(times) == 4
+    assert times[2] - times[0] >= 0.29
+    assert other == [{"content": "y"}]
+
+
+def test_a_failed_edit_does_not_strand_the_channel():
+    async def scenario():
+        renderer = RenderScheduler(interval=0.01, channel_window=0.1)
+        messages = [
+            Message(0, error=aiohttp.ClientError()),
+            Message(1, error=asyncio.TimeoutError()),
+            Message(2, error=RuntimeError("Session is closed")),
+            Message(3),
+        ]
+        for message in messages:
+            renderer.schedule(message, content=str(message.id))
+        await asyncio.sleep(0.2)
+        stats = renderer.stats()
+        await renderer.close()
+        return messages[3].edits, stats
+
+    edits, stats = asyncio.run(scenario())
+    assert edits == [{"content": "3"}]
+    assert stats["failed"] == 3 and stats["sent"] == 1 and stats["pending"] == 0
@@ -0,0 +1,133 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import aiohttp
+import pytest
+
+import cogs.actions as actions
+from benchmarks.fake_tenor import FakeTenor
+from utils.gifs import GifPoolCache
+from utils.resilience import CircuitBreaker, CircuitOpenError, call_with_budget
+
+
+def run_with_tenor(monkeypatch, scenario, **fake_options):
+    """Run ``scenario(fake, cog)`` with an Actions cog searching a FakeTenor."""
+    monkeypatch.setattr(actions, "TENOR_API_KEY", "test")
+
+    async def wrapper():
+        fake = FakeTenor(**fake_options)
+        monkeypatch.setattr(actions, "TENOR_SEARCH_URL", await fake.start())
+        async with aiohttp.ClientSession() as session:
+            cog = actions.Actions(SimpleNamespace(http_session=session))
+            try:
+                return await scenario(fake, cog)
+            finally:
+                await cog.gifs.close()
+                await fake.stop()
+
+    return asyncio.run(wrapper())
+
+
+def test_breaker_opens_after_failures_and_half_opens_after_the_cooldown(monkeypatch):
+    async def scenario(fake, cog):
+        breaker = CircuitBreaker("tenor", failure_threshold=3, reset_timeout=0.3)
+
+        def call():
+            return call_with_budget(
+                lambda: cog.search_gifs("hug"), budget=1, breaker=breaker, retries=0
+            )
+
+        for _ in range(3):
+            with pytest.raises(aiohttp.ClientResponseError):
+                await call()
+        assert breaker.state == CircuitBreaker.OPEN
+        with pytest.raises(CircuitOpenError):
+            await call()
+        assert fake.requests == 3
+
+        # After the cooldown one trial goes through; a failure re-opens.
+        await asyncio.sleep(0.35)
+        with pytest.raises(aiohttp.ClientResponseError):
+            await call()
+        assert breaker.state == CircuitBreaker.OPEN and fake.requests == 4
+
+        fake.failure_rate = 0.0
+        await asyncio.sleep(0.35)
+        assert len(await call()) == fake.results
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    run_with_tenor(monkeypatch, scenario, failure_rate=1.0)
+
+
+def test_slow_tenor_serves_the_cached_pool_within_the_budget(monkeypatch):
+    monkeypatch.setattr(actions, "TENOR_BUDGET", 0.3)
+
+    async def scenario(fake, cog):
+        cached = ["https://cached/hug.gif"]
+
+        async def load():
+            # Old enough to be refreshed on the next pick.
+            return {"hug": (cached, time.time() - 3600)}
+
+        cache = GifPoolCache(cog.fetch_gifs, ttl=60, refresh_ahead=10, load=load)
+        cache.start_loading()
+        started = time.monotonic()
+        assert await cache.get("hug") == cached[0]
+        assert await cache.get("kiss") is None
+        elapsed = time.monotonic() - started
+        # The refresh of "hug" runs out of budget too and keeps the old pool.
+        pool = await cache.refresh("hug")
+        await cache.close()
+        return elapsed, pool.urls
+
+    elapsed, urls = run_with_tenor(monkeypatch, scenario, latency=2.0)
+    assert elapsed < 1.0
+    assert urls == ["https://cached/hug.gif"]
+
+
+def test_slow_tenor_without_a_pool_sends_the_fallback_gif(monkeypatch):
+    monkeypatch.setattr(actions, "TENOR_BUDGET", 0.3)
+
+    async def scenario(fake, cog):
+        sent = []
+
+        async def send(**kwargs):
+            sent.append(kwargs)
+
+        ctx = SimpleNamespace(author=SimpleNamespace(name="alice"), send=send)
+        member = SimpleNamespace(id=2, name="bob")
+        started = time.monotonic()
+        await cog.hug.callback(cog, ctx, member)
+        return time.monotonic() - started, sent
+
+    elapsed, sent = run_with_tenor(monkeypatch, scenario, latency=2.0)
+    assert elapsed < 1.0
+    [message] = sent
+    assert message["file"].filename.endswith(".gif")
+    assert message["embed"].image.url == f"attachment://{message['file'].filename}"
+
+
+def test_stale_pool_is_served_while_it_is_refreshed(monkeypatch):
+    async def scenario(fake, cog):
+        stale = ["https://stale/pat.gif"]
+
+        async def load():
+            return {"pat": (stale, time.time() - 3600)}
+
+        cache = GifPoolCache(cog.fetch_gifs, ttl=60, refresh_ahead=10, load=load)
+        cache.start_loading()
+        picks = [await cache.get("pat") for _ in range(5)]
+        pool = await cache.refresh("pat")
+        fresh = await cache.get("pat")
+        await cache.close()
+        return picks, pool.urls, fresh, fake.requests
+
+    picks, urls, fresh, requests = run_with_tenor(
+        monkeypatch, scenario, latency=0.2
+    )
+    # Every pick was answered from the stale pool, and the five picks
+    # shared one background refresh.
+    assert picks == ["https://stale/pat.gif"] * 5
+    assert len(urls) == 100 and fresh in urls
+    assert requests == 1
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from utils import tictactoe as ttt
+
+
+def positions(count, seed=1):
+    """Random reachable 3 x 3 positions that are still being played."""
+    rng = random.Random(seed)
+    found = set()
+    while len(found) < count:
+        x = o = 0
+        for _ in range(rng.randrange(8)):
+            if ttt.has_won(x) or ttt.has_won(o):
+                break
+            x, o = ttt.play(x, o, rng.choice(ttt.empty_cells(x, o)))
+        if not (ttt.has_won(x) or ttt.has_won(o)):
+            found.add((x, o))
+    return sorted(found)
+
+
+def test_stored_table_matches_a_fresh_solve():
+    assert ttt.TABLE == ttt.build_table()
+    assert ttt.load_table(ttt.TABLE_PATH.with_name("missing.bin")) == ttt.TABLE
+
+
+def test_empty_board_is_a_draw():
+    assert ttt.TABLE[ttt.index(0, 0)] == 0
+    assert set(ttt.move_scores(0, 0).values()) == {0}
+
+
+def test_table_takes_and_blocks_wins():
+    # X on 0 and 1, O on 3 and 4, X to move: 2 wins at once.
+    x, o = 0b000000011, 0b000011000
+    assert ttt.best_moves(x, o) == [2]
+    # With X threatening 2, O to move wins on 5 instead of blocking.
+    x |= 1 << 8
+    assert ttt.best_moves(x, o) == [5]
+
+
+@pytest.mark.parametrize("x, o", positions(40))
+def test_search_agrees_with_the_table(x, o):
+    result = ttt.search(x, o, 3, 3, budget=60)
+    table_score = ttt.TABLE[ttt.index(x, o)]
+    # Same outcome: win, draw or loss for the player to move.
+    assert (result.score > 0) - (result.score < 0) == (table_score > 0) - (table_score < 0)
+    assert result.move in ttt.best_moves(x, o)
+
+
+def test_search_on_larger_boards_takes_and_blocks_wins():
+    # 4 x 4, four in a row: X has 0, 1, 2 and moves; 3 wins.
+    x, o = 0b0111, 0b0111 << 4
+    assert ttt.search(x, o, 4, 4, budget=5).move == 3
+    # O to move with X threatening 12 on the diagonal 3, 6, 9, 12.
+    x, o = (1 << 3) | (1 << 6) | (1 << 9) | (1 << 0), (1 << 1) | (1 << 5) | (1 << 15)
+    assert ttt.search(x, o, 4, 4, budget=5).move == 12
+
+
+def test_choose_move():
+    assert ttt.choose_move(ttt.FULL, 0) is None
+    rng = random.Random(0)
+    for x, o in positions(20, seed=2):
+        assert ttt.choose_move(x, o, "hard", rng) in ttt.best_moves(x, o)
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from utils.words import LETTER_ORDER, WordCorpus, build_corpus
+
+
+WORDS = {
+    ("en", "animals"): ["cat", "cow", "dog", "bat", "rat", "owl", "horse", "mouse", "moose", "goose", "zebra"],
+    ("en", "food"): ["tea", "pie", "ham", "bread", "toast", "pasta", "bacon", "melon"],
+    ("fr", "animaux"): ["chat", "loup", "ours", "cheval"],
+}
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    source = tmp_path_factory.mktemp("words")
+    for (language, category), words in WORDS.items():
+        (source / language).mkdir(exist_ok=True)
+        (source / language / f"{category}.txt").write_text("\n".join(words) + "\n")
+    target = source / "corpus.bin"
+    build_corpus(source, target)
+    corpus = WordCorpus(target)
+    yield corpus
+    corpus.close()
+
+
+def fits(word, pattern, guessed):
+    """The slow definition of a candidate for ``pattern``."""
+    if len(word) != len(pattern):
+        return False
+    shown = set(pattern)
+    for char, hint in zip(word, pattern):
+        if hint == "_":
+            if char in guessed and char in shown:
+                return False
+        elif char != hint:
+            return False
+    return not any(letter in word for letter in guessed if letter not in shown)
+
+
+def reveal(word, guessed):
+    return "".join(char if char in guessed else "_" for char in word)
+
+
+def test_filter_matches_a_scan(corpus):
+    rng = random.Random(3)
+    words = [word for (language, _), group in WORDS.items() if language == "en" for word in group]
+    for _ in range(300):
+        secret = rng.choice(words)
+        guessed = set(rng.sample(LETTER_ORDER, rng.randrange(8)))
+        pattern = reveal(secret, guessed)
+        index = corpus.candidates("en", len(secret))
+        bits = index.filter(pattern, guessed)
+        expected = sorted(word for word in words if fits(word, pattern, guessed))
+        assert secret in expected
+        assert sorted(index.words(bits, limit=100)) == expected
+        assert bits.bit_count() == len(expected)
+
+
+def test_filter_by_category(corpus):
+    index = corpus.candidates("en", 3)
+    category = corpus.categories.index("food")
+    bits = index.filter("___", set(), category)
+    assert sorted(index.words(bits)) == ["ham", "pie", "tea"]
+
+
+def test_best_guess(corpus):
+    # moose and goose are out: a hit on "o" would have shown their second "o".
+    assert corpus.best_guess("en", "_o_se", {"o", "s", "e"}) == ("r", 1, 2)
+    # "r" missed, which leaves mouse.
+    assert corpus.best_guess("en", "_o_se", {"o", "s", "e", "r"}) == ("u", 1, 1)
+
+
+def test_best_guess_without_candidates(corpus):
+    guess = corpus.best_guess("en", "__________", {"e"})
+    assert guess.letter == LETTER_ORDER[1] and guess.candidates == 0
+    assert corpus.best_guess("de", "___", set()).letter == LETTER_ORDER[0]
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.calc import evaluate
+from utils.workers import WorkerPool
+
+
+def test_timeout_resets_the_pool_and_serves_the_next_call():
+    async def scenario():
+        pool = WorkerPool("test", 2)
+        pool.start()
+        try:
+            assert (await pool.run(evaluate, "1+1", timeout=30)).text == "2"
+            hung = pool.executor
+            with pytest.raises(asyncio.TimeoutError):
+                await pool.run(time.sleep, 60, timeout=0.5)
+            assert pool.resets == 1
+            assert pool.executor is not hung
+            assert (await pool.run(evaluate, "2*3", timeout=30)).text == "6"
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_calls_killed_by_another_reset_are_retried():
+    async def scenario():
+        pool = WorkerPool("test", 2)
+        pool.start()
+        try:
+            # Warm the workers up so the innocent call is running when the
+            # hung one times out.
+            await asyncio.gather(*(pool.run(evaluate, "1", timeout=30) for _ in range(2)))
+            hung = pool.run(time.sleep, 60, timeout=1)
+            innocent = pool.run(time.sleep, 2, timeout=30)
+            results = await asyncio.gather(hung, innocent, return_exceptions=True)
+            assert isinstance(results[0], asyncio.TimeoutError)
+            assert results[1] is None
+            assert pool.resets == 1
+        finally:
+            pool.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,127 @@
+"""Small asyncio-aware caching helpers."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class AsyncTTLCache(Generic[K, V]):
+    """Bounded read-through LRU cache with a per-entry time to live.
+
+    Concurrent misses for the same key share a single call to the loader.
+    Counters for hits, misses, coalesced misses, expirations and evictions
+    are kept so the cache can be sized from real traffic.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[K, Tuple[float, V]] = OrderedDict()
+        self._inflight: Dict[K, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: K) -> Optional[Tuple[float, V]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: K, value: V) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: K, loader: Callable[[], Awaitable[V]]) -> V:
+        """Return the cached value for ``key``, calling ``loader`` on a miss."""
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Retrieve the outcome so an unawaited failure is not reported as lost.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._drop_inflight(key, future)
+            future.cancel()
+            raise
+        except Exception as exc:
+            self._drop_inflight(key, future)
+            future.set_exception(exc)
+            raise
+
+        # Only store the result if the key was not invalidated meanwhile.
+        if self._drop_inflight(key, future):
+            self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _drop_inflight(self, key: K, future: asyncio.Future) -> bool:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            return True
+        return False
+
+    def update(self, key: K, func: Callable[[V], V]) -> bool:
+        """Replace a cached value with ``func(value)``.
+
+        Returns ``False`` if the key is not cached, leaving the cache as is.
+        """
+        entry = self._lookup(key)
+        if entry is None:
+            return False
+        self._entries[key] = (entry[0], func(entry[1]))
+        return True
+
+    def set(self, key: K, value: V) -> None:
+        """Cache ``value`` for ``key``, replacing any value or load in progress."""
+        self._inflight.pop(key, None)
+        self._store(key, value)
+
+    def invalidate(self, key: K) -> None:
+        """Forget ``key`` and discard the result of any load in progress."""
+        self._entries.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the cache counters and current size."""
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+        }
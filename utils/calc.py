@@ -0,0 +1,750 @@
+"""Sandboxed arithmetic evaluator used by ``/calc``.
+
+Expressions are parsed with :mod:`ast` and evaluated by walking the tree;
+only numbers, a whitelist of operators and the functions/constants in
+:data:`FUNCTIONS`/:data:`CONSTANTS` are accepted, so there is no way to
+reach attributes, builtins or the filesystem.  Every step is charged
+against a :class:`Budget`, and operations whose result would be huge
+(``9**9**9``, ``factorial(10**6)``) are rejected before they are computed.
+
+:func:`compile_expression` turns an expression into a tree of closures
+once and keeps the result in an LRU cache, so repeated expressions skip
+parsing and validation.  The same compiled form is used by
+:func:`evaluate_range`, which calls it with NumPy arrays to tabulate an
+expression over a range in one pass.
+
+Besides floats, expressions can be evaluated with :mod:`decimal` to a
+given number of digits (``sqrt(2) to 100 digits``) or exactly with
+:mod:`fractions` (``1/3 + 1/6 as fraction``).  Results too long for a
+chat message are written to a file in chunks instead of being turned into
+one big string.
+
+:func:`evaluate` and :func:`evaluate_range` are plain top-level functions
+so they can be run in a process pool; the caller is expected to add a
+wall-clock timeout on top.
+"""
+
+from __future__ import annotations
+
+import ast
+import decimal
+import functools
+import io
+import math
+import operator
+import os
+import re
+from decimal import Decimal
+from fractions import Fraction
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+try:
+    import numpy as np
+except ImportError:  # range mode is optional
+    np = None
+
+
+Number = Union[int, float]
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_NODES = 200
+MAX_STEPS = 10_000
+# Longest result allowed, in decimal digits.  Anything longer than
+# MAX_INLINE_LENGTH is sent as a file rather than in the message.
+MAX_RESULT_DIGITS = 100_000
+MAX_INT_BITS = int(MAX_RESULT_DIGITS * math.log2(10))
+MAX_INLINE_LENGTH = 1_500
+# Largest precision accepted by "to N digits".
+MAX_PRECISION = 10_000
+# exp(), log() and non-integer powers are series expansions whose cost
+# grows with the square of the precision (about 40 ms at 1,000 digits, and
+# seconds at a few thousand), so they get a lower limit and are charged
+# against the step budget before they run.
+MAX_SERIES_PRECISION = 1_000
+# Largest number of points a range evaluation may produce.
+MAX_POINTS = 100_000
+COMPILE_CACHE_SIZE = int(os.getenv("CALC_CACHE_SIZE", "1024"))
+# Integers are written in pieces of at most this many digits, which also
+# stays under Python's limit on int/str conversions.
+DIGIT_CHUNK = 4_000
+LOG10_2 = math.log10(2)
+
+RANGE_PATTERN = re.compile(
+    r"(?P<expression>.+?)\s+for\s+(?P<variable>[A-Za-z_]\w*)\s+in\s+"
+    r"(?P<start>.+?)\s*\.\.\s*(?P<stop>.+?)(?:\s+step\s+(?P<step>.+))?",
+    re.DOTALL,
+)
+MODE_PATTERN = re.compile(
+    r"(?P<expression>.+?)\s+"
+    r"(?:(?:to|with)\s+(?P<digits>\d+)\s+digits|as\s+(?P<fraction>fractions?))",
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+class CalcError(Exception):
+    """The expression is invalid or too expensive; the message is user-facing."""
+
+
+def _integer(value: Any, name: str) -> int:
+    try:
+        integral = float(value).is_integer()
+    except OverflowError:
+        integral = isinstance(value, int)
+    if not integral:
+        raise CalcError(f"{name}() needs whole numbers")
+    return int(value)
+
+
+def _factorial(n: Any) -> int:
+    n = _integer(n, "factorial")
+    if n < 0:
+        raise CalcError("factorial() needs a non-negative integer")
+    if n > 1 and math.lgamma(n + 1) / math.log(2) > MAX_INT_BITS:
+        raise CalcError("factorial() result would be too large")
+    return math.factorial(n)
+
+
+def _gcd(*values: Any) -> int:
+    return math.gcd(*(_integer(value, "gcd") for value in values))
+
+
+def _round(value: Any, ndigits: Any = 0) -> Any:
+    # round(x, -n) computes 10**n internally, so keep ndigits small.
+    ndigits = _integer(ndigits, "round")
+    if abs(ndigits) > 100:
+        raise CalcError("round() digits must be between -100 and 100")
+    return round(value, ndigits)
+
+
+FUNCTIONS: Dict[str, Callable[..., Number]] = {
+    "abs": abs,
+    "round": _round,
+    "min": min,
+    "max": max,
+    "sqrt": math.sqrt,
+    "exp": math.exp,
+    "log": math.log,
+    "log2": math.log2,
+    "log10": math.log10,
+    "sin": math.sin,
+    "cos": math.cos,
+    "tan": math.tan,
+    "asin": math.asin,
+    "acos": math.acos,
+    "atan": math.atan,
+    "atan2": math.atan2,
+    "sinh": math.sinh,
+    "cosh": math.cosh,
+    "tanh": math.tanh,
+    "hypot": math.hypot,
+    "degrees": math.degrees,
+    "radians": math.radians,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "gcd": _gcd,
+    "factorial": _factorial,
+}
+
+CONSTANTS: Dict[str, Number] = {
+    "pi": math.pi,
+    "e": math.e,
+    "tau": math.tau,
+}
+
+BINARY_OPERATORS: Dict[type, Callable[[Any, Any], Number]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+UNARY_OPERATORS: Dict[type, Callable[[Any], Number]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+def _np_log(value: Any, base: Any = None) -> Any:
+    return np.log(value) if base is None else np.log(value) / np.log(base)
+
+
+def _np_round(value: Any, ndigits: Any = 0) -> Any:
+    ndigits = _integer(ndigits, "round")
+    if abs(ndigits) > 100:
+        raise CalcError("round() digits must be between -100 and 100")
+    return np.round(value, ndigits)
+
+
+# Element-wise versions of FUNCTIONS for range mode.  Functions that only
+# make sense for integers (factorial, gcd) are left out.
+NUMPY_FUNCTIONS: Dict[str, Callable[..., Any]] = {}
+if np is not None:
+    NUMPY_FUNCTIONS = {
+        "abs": np.abs,
+        "round": _np_round,
+        "min": lambda *values: functools.reduce(np.minimum, values),
+        "max": lambda *values: functools.reduce(np.maximum, values),
+        "sqrt": np.sqrt,
+        "exp": np.exp,
+        "log": _np_log,
+        "log2": np.log2,
+        "log10": np.log10,
+        "sin": np.sin,
+        "cos": np.cos,
+        "tan": np.tan,
+        "asin": np.arcsin,
+        "acos": np.arccos,
+        "atan": np.arctan,
+        "atan2": np.arctan2,
+        "sinh": np.sinh,
+        "cosh": np.cosh,
+        "tanh": np.tanh,
+        "hypot": np.hypot,
+        "degrees": np.degrees,
+        "radians": np.radians,
+        "floor": np.floor,
+        "ceil": np.ceil,
+    }
+
+
+def _to_decimal(value: Any) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(value)
+
+
+def _decimal_log(value: Any, base: Any = None) -> Decimal:
+    result = _to_decimal(value).ln()
+    return result if base is None else result / _to_decimal(base).ln()
+
+
+@functools.lru_cache(maxsize=16)
+def _pi_digits(digits: int) -> Tuple[int, int]:
+    """``(pi * one, one)`` as integers with ``one = 10**(digits + 10)``, by Machin's formula."""
+    one = 10 ** (digits + 10)
+
+    def arctan_inverse(x: int) -> int:
+        total = term = one // x
+        x_squared, n, sign = x * x, 3, -1
+        while term:
+            term //= x_squared
+            total += sign * (term // n)
+            sign, n = -sign, n + 2
+        return total
+
+    return 4 * (4 * arctan_inverse(5) - arctan_inverse(239)), one
+
+
+def _decimal_pi() -> Decimal:
+    scaled, one = _pi_digits(decimal.getcontext().prec)
+    return Decimal(scaled) / Decimal(one)
+
+
+@functools.lru_cache(maxsize=16)
+def _e_digits(digits: int) -> Tuple[int, int]:
+    """``(e * one, one)`` as integers with ``one = 10**(digits + 10)``, summing ``1/k!``."""
+    one = 10 ** (digits + 10)
+    total = term = one
+    k = 1
+    while term:
+        term //= k
+        total += term
+        k += 1
+    return total, one
+
+
+def _decimal_e() -> Decimal:
+    scaled, one = _e_digits(decimal.getcontext().prec)
+    return Decimal(scaled) / Decimal(one)
+
+
+# Functions available in precision mode; everything is computed to the
+# requested number of digits by the decimal context.
+DECIMAL_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "round": _round,
+    "min": min,
+    "max": max,
+    "sqrt": lambda value: _to_decimal(value).sqrt(),
+    "exp": lambda value: _to_decimal(value).exp(),
+    "log": _decimal_log,
+    "log10": lambda value: _to_decimal(value).log10(),
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "gcd": _gcd,
+    "factorial": _factorial,
+}
+
+# Functions whose results stay exact for fractions.
+FRACTION_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "abs": abs,
+    "round": _round,
+    "min": min,
+    "max": max,
+    "floor": math.floor,
+    "ceil": math.ceil,
+    "gcd": _gcd,
+    "factorial": _factorial,
+}
+
+
+def _fraction_pow(base: Fraction, exponent: Fraction) -> Fraction:
+    if exponent.denominator != 1:
+        raise CalcError("Fraction mode only supports whole-number powers")
+    return base ** exponent.numerator
+
+
+class Mode(NamedTuple):
+    """How literals, names and functions are interpreted."""
+
+    name: str
+    literal: Callable[[Number], Any]
+    functions: Mapping[str, Callable[..., Any]]
+    constants: Mapping[str, Callable[[], Any]]
+    operators: Mapping[type, Callable[[Any, Any], Any]] = BINARY_OPERATORS
+    # Functions computed by a series expansion at the context precision.
+    series: FrozenSet[str] = frozenset()
+
+
+_FLOAT_CONSTANTS = {name: (lambda value=value: value) for name, value in CONSTANTS.items()}
+
+MODES: Dict[str, Mode] = {
+    "float": Mode("normal mode", lambda value: value, FUNCTIONS, _FLOAT_CONSTANTS),
+    "vector": Mode("range mode", lambda value: value, NUMPY_FUNCTIONS, _FLOAT_CONSTANTS),
+    "decimal": Mode(
+        "precision mode",
+        lambda value: Decimal(repr(value)),
+        DECIMAL_FUNCTIONS,
+        {
+            "pi": _decimal_pi,
+            "e": _decimal_e,
+            "tau": lambda: 2 * _decimal_pi(),
+        },
+        series=frozenset({"exp", "log", "log10"}),
+    ),
+    "fraction": Mode(
+        "fraction mode",
+        lambda value: Fraction(repr(value)),
+        FRACTION_FUNCTIONS,
+        {},
+        {**BINARY_OPERATORS, ast.Pow: _fraction_pow},
+    ),
+}
+
+
+def _bits(value: Any) -> int:
+    if isinstance(value, int):
+        return value.bit_length()
+    if isinstance(value, Fraction):
+        return value.numerator.bit_length() + value.denominator.bit_length()
+    if isinstance(value, Decimal):
+        # Every decimal result is rounded to the context precision.
+        return decimal.getcontext().prec * 10 // 3
+    return 0
+
+
+def _log2(value: Any) -> float:
+    """Size of an exact number in bits, used to estimate powers."""
+    if isinstance(value, Fraction):
+        return _log2(value.numerator) + _log2(value.denominator)
+    return math.log2(abs(value)) if value else 0.0
+
+
+def check_size(op: type, left: Any, right: Any) -> None:
+    """Reject exact operations whose result would exceed ``MAX_INT_BITS``."""
+    exact = (int, Fraction)
+    if not isinstance(left, exact) or not isinstance(right, exact):
+        return
+    if op is ast.Pow:
+        # int ** -n is a float, but Fraction ** -n is exact and just as big.
+        exponent = right if isinstance(left, int) and isinstance(right, int) else abs(right)
+        if exponent * _log2(left) > MAX_INT_BITS:
+            raise CalcError("Result would be too large")
+    elif isinstance(left, Fraction) or isinstance(right, Fraction) or op is ast.Mult:
+        # Adding or dividing fractions multiplies their denominators.
+        if _bits(left) + _bits(right) > MAX_INT_BITS:
+            raise CalcError("Result would be too large")
+
+
+class Budget:
+    """Counts evaluation steps and raises once ``max_steps`` is exceeded."""
+
+    def __init__(self, max_steps: int = MAX_STEPS) -> None:
+        self.max_steps = max_steps
+        self.steps = 0
+
+    def charge(self, steps: int = 1) -> None:
+        self.steps += steps
+        if self.steps > self.max_steps:
+            raise CalcError("Expression is too expensive to evaluate")
+
+
+def charge_series(budget: Budget) -> None:
+    """Charge a decimal series expansion at the current precision, or reject it."""
+    precision = decimal.getcontext().prec
+    if precision > MAX_SERIES_PRECISION:
+        raise CalcError(
+            f"exp(), log() and non-integer powers are limited to {MAX_SERIES_PRECISION:,} digits"
+        )
+    budget.charge(precision * precision // 2_500)
+
+
+def _is_series_pow(op: type, exponent: Any) -> bool:
+    return op is ast.Pow and isinstance(exponent, Decimal) and exponent != exponent.to_integral_value()
+
+
+# A compiled expression: called with variable values and a Budget.
+Compiled = Callable[[Mapping[str, Any], Budget], Any]
+
+
+def parse(expression: str) -> ast.expr:
+    """Parse ``expression`` and check its size; returns the expression node."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise CalcError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError:
+        raise CalcError("Invalid expression") from None
+    if sum(1 for _ in ast.walk(tree)) > MAX_NODES:
+        raise CalcError("Expression is too long")
+    return tree.body
+
+
+def _compile(node: ast.AST, variables: FrozenSet[str], mode: Mode) -> Compiled:
+    """Turn ``node`` into a tree of closures, validating it on the way."""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise CalcError("Only numbers are allowed")
+        value = mode.literal(node.value)
+
+        def constant(env: Mapping[str, Any], budget: Budget) -> Any:
+            budget.charge()
+            return value
+
+        return constant
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in variables:
+
+            def variable(env: Mapping[str, Any], budget: Budget) -> Any:
+                budget.charge()
+                return env[name]
+
+            return variable
+        if name not in CONSTANTS:
+            raise CalcError(f"Unknown name: {name}")
+        if name not in mode.constants:
+            raise CalcError(f"{name} is not available in {mode.name}")
+        # Looked up on every call: precision mode computes it to the
+        # current number of digits.
+        get_constant = mode.constants[name]
+
+        def named_constant(env: Mapping[str, Any], budget: Budget) -> Any:
+            budget.charge()
+            return get_constant()
+
+        return named_constant
+
+    if isinstance(node, ast.UnaryOp):
+        unary = UNARY_OPERATORS.get(type(node.op))
+        if unary is None:
+            raise CalcError("Unsupported operator")
+        operand = _compile(node.operand, variables, mode)
+
+        def unary_op(env: Mapping[str, Any], budget: Budget) -> Any:
+            budget.charge()
+            return unary(operand(env, budget))
+
+        return unary_op
+
+    if isinstance(node, ast.BinOp):
+        op_type = type(node.op)
+        binary = mode.operators.get(op_type)
+        if binary is None:
+            hint = " (use ** for powers)" if op_type is ast.BitXor else ""
+            raise CalcError(f"Unsupported operator{hint}")
+        left = _compile(node.left, variables, mode)
+        right = _compile(node.right, variables, mode)
+
+        def binary_op(env: Mapping[str, Any], budget: Budget) -> Any:
+            budget.charge()
+            a = left(env, budget)
+            b = right(env, budget)
+            check_size(op_type, a, b)
+            if _is_series_pow(op_type, b):
+                charge_series(budget)
+            # Big-number work costs roughly one step per machine word.
+            budget.charge(max(_bits(a), _bits(b)) // 64)
+            return binary(a, b)
+
+        return binary_op
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise CalcError("Unknown function")
+        if node.func.id not in mode.functions:
+            raise CalcError(f"{node.func.id}() is not supported in {mode.name}")
+        if node.keywords:
+            raise CalcError("Keyword arguments are not supported")
+        func = mode.functions[node.func.id]
+        series = node.func.id in mode.series
+        args = [_compile(arg, variables, mode) for arg in node.args]
+
+        def call(env: Mapping[str, Any], budget: Budget) -> Any:
+            budget.charge()
+            values = [arg(env, budget) for arg in args]
+            if series:
+                charge_series(budget)
+            return func(*values)
+
+        return call
+
+    raise CalcError("Unsupported syntax")
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(
+    expression: str, variables: Tuple[str, ...] = (), mode: str = "float"
+) -> Compiled:
+    """Parse and compile ``expression`` once; repeated calls hit an LRU cache.
+
+    ``mode`` is a key of :data:`MODES`: ``"vector"`` swaps the math
+    functions for their NumPy counterparts so the result can be called with
+    arrays for ``variables``, ``"decimal"`` and ``"fraction"`` turn every
+    literal into a :class:`~decimal.Decimal` or :class:`~fractions.Fraction`.
+    Invalid expressions raise :class:`CalcError` and are not cached.
+    """
+    if mode == "vector" and np is None:
+        raise CalcError("Range mode needs NumPy installed")
+    return _compile(parse(expression), frozenset(variables), MODES[mode])
+
+
+def _run(compiled: Compiled, env: Mapping[str, Any], max_steps: int) -> Any:
+    try:
+        return compiled(env, Budget(max_steps))
+    except CalcError:
+        raise
+    except ZeroDivisionError:
+        raise CalcError("Division by zero") from None
+    except (OverflowError, decimal.Overflow):
+        raise CalcError("Result is out of range") from None
+    except decimal.DecimalException:
+        raise CalcError("Invalid operation") from None
+    except (TypeError, ValueError) as exc:
+        raise CalcError(str(exc)) from None
+
+
+class CalcResult(NamedTuple):
+    """A formatted result.
+
+    When ``spilled`` is true the full result was written to the file passed
+    to :func:`evaluate` and ``text`` only holds its beginning.
+    """
+
+    text: str
+    length: int
+    spilled: bool = False
+
+
+def estimate_length(value: Any) -> int:
+    """Upper bound on ``len(format_result(value))``, without formatting it."""
+    if isinstance(value, int):
+        return int(value.bit_length() * LOG10_2) + 2
+    if isinstance(value, Fraction):
+        return estimate_length(value.numerator) + estimate_length(value.denominator) + 1
+    if isinstance(value, Decimal):
+        return decimal.getcontext().prec + 16
+    return 32
+
+
+@functools.lru_cache(maxsize=64)
+def _power_of_ten(exponent: int) -> int:
+    return 10**exponent
+
+
+def _write_digits(value: int, out: TextIO, width: int = 0) -> None:
+    """Write non-negative ``value`` in decimal, zero-padded to ``width``.
+
+    Large values are split in half by a power of ten and written piece by
+    piece, so no string longer than :data:`DIGIT_CHUNK` is ever built.
+    """
+    digits = int(value.bit_length() * LOG10_2) + 1
+    if digits <= DIGIT_CHUNK:
+        out.write(str(value).rjust(width, "0"))
+        return
+    half = digits // 2
+    high, low = divmod(value, _power_of_ten(half))
+    if high or width:
+        _write_digits(high, out, max(width - half, 0))
+        _write_digits(low, out, half)
+    else:
+        _write_digits(low, out)
+
+
+def write_result(value: Any, out: TextIO) -> None:
+    """Write ``value`` as :func:`format_result` would, in chunks."""
+    if isinstance(value, Fraction):
+        write_result(value.numerator, out)
+        if value.denominator != 1:
+            out.write("/")
+            _write_digits(value.denominator, out)
+    elif isinstance(value, int):
+        if value < 0:
+            out.write("-")
+        _write_digits(abs(value), out)
+    else:
+        # Floats and decimals are bounded by their precision.
+        out.write(format_result(value))
+
+
+def format_result(value: Any) -> str:
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    return str(value)
+
+
+def _finish(value: Any, spill_path: Optional[str]) -> CalcResult:
+    length = estimate_length(value)
+    if length > MAX_RESULT_DIGITS + 16:
+        raise CalcError("Result would be too large")
+    if length <= MAX_INLINE_LENGTH:
+        text = format_result(value)
+        return CalcResult(text, len(text))
+    if spill_path is None:
+        raise CalcError("Result is too long to send")
+    with open(spill_path, "w", encoding="ascii") as out:
+        write_result(value, out)
+        length = out.tell()
+    with open(spill_path, encoding="ascii") as file:
+        preview = file.read(100)
+    return CalcResult(preview, length, spilled=True)
+
+
+def evaluate(
+    expression: str, spill_path: Optional[str] = None, max_steps: int = MAX_STEPS
+) -> CalcResult:
+    """Evaluate ``expression`` and return the formatted result.
+
+    A trailing ``to N digits`` evaluates with N significant digits, and
+    ``as fraction`` evaluates exactly.  Results longer than
+    :data:`MAX_INLINE_LENGTH` are written to ``spill_path``.
+
+    Raises :class:`CalcError` with a user-facing message on any failure.
+    """
+    match = MODE_PATTERN.fullmatch(expression.strip())
+    if match is None:
+        return _finish(_run(compile_expression(expression), {}, max_steps), spill_path)
+
+    if match["fraction"]:
+        compiled = compile_expression(match["expression"], mode="fraction")
+        return _finish(_run(compiled, {}, max_steps), spill_path)
+
+    digits = int(match["digits"])
+    if not 1 <= digits <= MAX_PRECISION:
+        raise CalcError(f"Precision must be between 1 and {MAX_PRECISION:,} digits")
+    compiled = compile_expression(match["expression"], mode="decimal")
+    with decimal.localcontext() as context:
+        context.prec = digits
+        context.Emax = MAX_RESULT_DIGITS
+        context.Emin = -MAX_RESULT_DIGITS
+        value = _run(compiled, {}, max_steps)
+        if isinstance(value, (int, Decimal)):
+            # Round results that did not come out of a decimal operation
+            # (a literal, or factorial() and friends) to the precision too.
+            value = +_to_decimal(value)
+        return _finish(value, spill_path)
+
+
+class RangeResult(NamedTuple):
+    """Summary of a range evaluation plus the full table as CSV."""
+
+    expression: str
+    variable: str
+    start: float
+    stop: float
+    step: float
+    points: int
+    invalid: int
+    minimum: float
+    maximum: float
+    mean: float
+    csv: bytes
+
+
+def _bound(expression: str) -> float:
+    value = _run(compile_expression(expression), {}, MAX_STEPS)
+    if not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise CalcError(f"Range bound `{expression}` is not a finite real number")
+    return float(value)
+
+
+def evaluate_range(text: str, max_points: int = MAX_POINTS) -> RangeResult:
+    """Tabulate ``<expr> for <var> in <start>..<stop> [step <step>]``.
+
+    The expression is compiled once and called a single time with a NumPy
+    array for the variable, so the cost does not depend on Python-level
+    loops over the points.  The stop value is included when the steps land
+    on it.
+    """
+    match = RANGE_PATTERN.fullmatch(text.strip())
+    if match is None:
+        raise CalcError("Use `<expression> for x in <start>..<stop> step <step>`")
+    expression, variable = match["expression"], match["variable"]
+    if variable in CONSTANTS or variable in FUNCTIONS:
+        raise CalcError(f"`{variable}` cannot be used as the range variable")
+
+    start, stop = _bound(match["start"]), _bound(match["stop"])
+    step = _bound(match["step"]) if match["step"] else 1.0
+    if step <= 0:
+        raise CalcError("Step must be positive")
+    if stop < start:
+        raise CalcError("The range must not end before it starts")
+    # Small tolerance so 0..1 step 0.1 includes 1.
+    span = (stop - start) / step + 1e-9
+    if not span < max_points:
+        raise CalcError(f"The range has too many points; the limit is {max_points:,}")
+    points = math.floor(span) + 1
+
+    compiled = compile_expression(expression, (variable,), mode="vector")
+    xs = start + step * np.arange(points, dtype=np.float64)
+    with np.errstate(all="ignore"):
+        ys = _run(compiled, {variable: xs}, MAX_STEPS)
+        ys = np.broadcast_to(np.asarray(ys, dtype=np.float64), xs.shape)
+
+    finite = np.isfinite(ys)
+    valid = ys[finite]
+    buffer = io.BytesIO()
+    np.savetxt(
+        buffer,
+        np.column_stack((xs, ys)),
+        fmt="%.12g",
+        delimiter=",",
+        header=f"{variable},result",
+        comments="",
+    )
+    return RangeResult(
+        expression=expression,
+        variable=variable,
+        start=start,
+        stop=stop,
+        step=step,
+        points=points,
+        invalid=points - int(finite.sum()),
+        minimum=float(valid.min()) if valid.size else math.nan,
+        maximum=float(valid.max()) if valid.size else math.nan,
+        mean=float(valid.mean()) if valid.size else math.nan,
+        csv=buffer.getvalue(),
+    )
@@ -0,0 +1,67 @@
+"""State store for the persistent game components.
+
+Game messages carry their state in component ``custom_id``s (see the
+``DynamicItem`` subclasses in the game cogs), so one registered handler per
+game type serves every running game and games keep working across
+restarts.  The :class:`discord.ui.View` wrapped around those items for each
+send or edit is throwaway: it holds no state and the bot never keeps it.
+What a ``custom_id`` cannot do is kept here:
+
+* the latest state of recently played games, so a click on a component
+  rendered from an older state is resolved against the current one;
+* a lock per game, so concurrent clicks are applied one after another.
+
+Entries expire after ``ttl`` seconds without a move; the next click then
+rebuilds the state from its ``custom_id`` (and, for data players must not
+see such as the Hangman word, from the database) through the loader given
+to :meth:`GameStore.get`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, TypeVar
+
+from utils.cache import AsyncTTLCache
+
+
+K = TypeVar("K", bound=Hashable)
+S = TypeVar("S")
+
+DEFAULT_MAX_GAMES = 10_000
+DEFAULT_TTL = 60 * 60
+
+
+async def _no_state() -> None:
+    return None
+
+
+class GameStore(Generic[K, S]):
+    """Latest state and a lock for each recently played game."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_GAMES, ttl: float = DEFAULT_TTL) -> None:
+        self._states: AsyncTTLCache[K, Optional[S]] = AsyncTTLCache(max_size, ttl)
+        # Locks only live while a move holds or waits for them.
+        self._locks: weakref.WeakValueDictionary[K, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def lock(self, key: K) -> asyncio.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+    async def get(
+        self, key: K, loader: Callable[[], Awaitable[Optional[S]]] = _no_state
+    ) -> Optional[S]:
+        """The latest state of ``key``, or ``loader()`` if it is not in memory."""
+        return await self._states.get(key, loader)
+
+    def set(self, key: K, state: S) -> None:
+        self._states.set(key, state)
+
+    def discard(self, key: K) -> None:
+        self._states.invalidate(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._states.stats(), "locks": len(self._locks)}
@@ -0,0 +1,224 @@
+"""Recording anonymized gateway traffic for load tests.
+
+When ``GATEWAY_RECORD_PATH`` is set, the bot writes every
+``MESSAGE_CREATE``, ``INTERACTION_CREATE`` and ``GUILD_MEMBER_*`` event
+it receives to that file, and ``benchmarks/gateway_replay.py`` plays the
+file back against a fake Discord to measure the whole bot at a realistic
+mix of commands, clicks and chatter.
+
+Events are anonymized before they are written:
+
+* every snowflake in a string value (ids, mentions in content, ids
+  embedded in ``custom_id``) is replaced by a sequential id starting at
+  :data:`ANON_BASE`, consistently within a recording, so the bot's own
+  id, reply chains and game custom ids still line up;
+* user names, nicknames, avatars and channel names are dropped;
+* message content is replaced by ``x`` characters of the same length,
+  except for commands (messages starting with a prefix or a mention of
+  the bot), which the replay needs verbatim;
+* attachments, embeds and quoted messages are dropped, and interaction
+  tokens are blanked.
+
+A recording is a gzip-compressed text file.  The first line is a JSON
+header with the anonymized ids of the bot user and the application; each
+following line is ``[seconds since start, event name, payload]``.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT = "syaa-gateway"
+VERSION = 1
+
+RECORDED_EVENTS = frozenset(
+    {
+        "MESSAGE_CREATE",
+        "INTERACTION_CREATE",
+        "GUILD_MEMBER_ADD",
+        "GUILD_MEMBER_UPDATE",
+        "GUILD_MEMBER_REMOVE",
+    }
+)
+
+# Anonymized ids are ANON_BASE, ANON_BASE + 1, ... in order of first sight.
+ANON_BASE = 10**17
+SNOWFLAKE = re.compile(r"(?<!\d)\d{17,20}(?!\d)")
+
+# String values that look like snowflakes but are bitfields.
+_BITFIELD_KEYS = frozenset({"permissions", "app_permissions"})
+_CLEARED_USER_KEYS = (
+    "global_name", "avatar", "banner", "avatar_decoration_data",
+    "clan", "primary_guild", "collectibles",
+)
+_DROPPED_MESSAGE_KEYS = ("referenced_message", "message_snapshots", "poll", "call")
+
+Recording = Tuple[Dict[str, Any], List[Tuple[float, str, Dict[str, Any]]]]
+
+
+def map_snowflakes(payload: Any, replace: Callable[[str], str]) -> Any:
+    """Apply ``replace`` to every snowflake in the string values of ``payload``."""
+    if isinstance(payload, dict):
+        return {
+            key: value if key in _BITFIELD_KEYS else map_snowflakes(value, replace)
+            for key, value in payload.items()
+        }
+    if isinstance(payload, list):
+        return [map_snowflakes(value, replace) for value in payload]
+    if isinstance(payload, str) and len(payload) >= 17:
+        return SNOWFLAKE.sub(lambda match: replace(match.group()), payload)
+    return payload
+
+
+def is_command(content: str, prefixes: Sequence[str], bot_id: str) -> bool:
+    """Whether ``content`` invokes a prefix command of the bot with id ``bot_id``."""
+    return content.startswith((*prefixes, f"<@{bot_id}>", f"<@!{bot_id}>"))
+
+
+def _mask(text: Optional[str]) -> Optional[str]:
+    return "x" * len(text) if text else text
+
+
+class Anonymizer:
+    """Strips personal data from gateway payloads, keeping ids consistent."""
+
+    def __init__(self, prefixes: Sequence[str] = ()) -> None:
+        self.prefixes = tuple(prefixes)
+        self._ids: Dict[str, str] = {}
+
+    def snowflake(self, value: str) -> str:
+        anonymized = self._ids.get(value)
+        if anonymized is None:
+            anonymized = self._ids[value] = str(ANON_BASE + len(self._ids))
+        return anonymized
+
+    def _scrub(self, payload: Any) -> None:
+        if isinstance(payload, list):
+            for value in payload:
+                self._scrub(value)
+            return
+        if not isinstance(payload, dict):
+            return
+        if "username" in payload:
+            payload["username"] = f"user{int(payload.get('id', ANON_BASE)) - ANON_BASE}"
+            payload["discriminator"] = "0"
+            payload.pop("email", None)
+            for key in _CLEARED_USER_KEYS:
+                if key in payload:
+                    payload[key] = None
+        for key in ("nick", "avatar", "banner", "topic"):
+            if payload.get(key) is not None:
+                payload[key] = None
+        channel = payload.get("channel")
+        if isinstance(channel, dict) and "name" in channel:
+            channel["name"] = "channel"
+        for value in payload.values():
+            self._scrub(value)
+
+    def _scrub_message(self, message: Dict[str, Any], keep_content: bool) -> None:
+        if not keep_content:
+            message["content"] = _mask(message.get("content"))
+        message["attachments"] = []
+        message["embeds"] = []
+        for key in _DROPPED_MESSAGE_KEYS:
+            message.pop(key, None)
+
+    def event(self, name: str, data: Dict[str, Any], bot_id: str) -> Dict[str, Any]:
+        """The anonymized copy of event ``name``; ``bot_id`` is the anonymized bot id."""
+        data = map_snowflakes(data, self.snowflake)
+        self._scrub(data)
+        if name == "MESSAGE_CREATE":
+            author = data.get("author") or {}
+            command = not author.get("bot") and is_command(
+                data.get("content", ""), self.prefixes, bot_id
+            )
+            self._scrub_message(data, keep_content=command)
+        elif name == "INTERACTION_CREATE":
+            if "token" in data:
+                data["token"] = ""
+            if isinstance(data.get("message"), dict):
+                self._scrub_message(data["message"], keep_content=False)
+        return data
+
+
+class GatewayRecorder:
+    """Writes anonymized gateway events to a recording.
+
+    Add :meth:`on_socket_raw_receive` as a listener of a bot created with
+    ``enable_debug_events=True``, which dispatches every raw gateway
+    message.  At most ``max_events`` events are written; later ones are
+    ignored.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        bot_id: int,
+        application_id: Optional[int],
+        prefixes: Sequence[str] = (),
+        max_events: int = 100_000,
+    ) -> None:
+        self.path = path
+        self.max_events = max_events
+        self.anonymizer = Anonymizer(prefixes)
+        self.bot_id = self.anonymizer.snowflake(str(bot_id))
+        self.events = 0
+        self._started = time.monotonic()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        header = {
+            "format": FORMAT,
+            "version": VERSION,
+            "bot_id": self.bot_id,
+            "application_id": (
+                self.anonymizer.snowflake(str(application_id)) if application_id else None
+            ),
+            "prefixes": list(prefixes),
+        }
+        self._write(header)
+
+    def _write(self, record: Any) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False))
+        self._file.write("\n")
+
+    async def on_socket_raw_receive(self, raw: str) -> None:
+        if self._file.closed or not any(name in raw for name in RECORDED_EVENTS):
+            return
+        message = json.loads(raw)
+        name = message.get("t")
+        if message.get("op") != 0 or name not in RECORDED_EVENTS:
+            return
+        try:
+            data = self.anonymizer.event(name, message["d"], self.bot_id)
+        except Exception:
+            logger.exception("Failed to anonymize a %s event", name)
+            return
+        self._write([round(time.monotonic() - self._started, 3), name, data])
+        self.events += 1
+        if self.events >= self.max_events:
+            logger.info("Recorded %d gateway events to %s, stopping", self.events, self.path)
+            self.close()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_recording(path: str) -> Recording:
+    """The header and ``(offset, event, payload)`` records of a recording."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        header = json.loads(next(file))
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a gateway recording")
+        if header.get("version") != VERSION:
+            raise ValueError(f"Unsupported gateway recording version {header.get('version')}")
+        events = [tuple(json.loads(line)) for line in file if line.strip()]
+    return header, events  # type: ignore[return-value]
+
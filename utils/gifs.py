@@ -0,0 +1,173 @@
+"""Per-search-term GIF pools.
+
+A Tenor search returns up to 100 results; instead of keeping one and
+throwing the rest away, :class:`GifPoolCache` keeps the whole list for each
+search term and serves random picks from memory.  Pools are refreshed in
+the background shortly before they expire (stale-while-revalidate), and
+concurrent refreshes of the same term share one upstream request.
+
+Pools can optionally be persisted: the cache loads them in the background
+when :meth:`GifPoolCache.start_loading` is called and writes every refreshed
+pool back without making the caller wait.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from utils.resilience import UpstreamUnavailableError
+
+
+logger = logging.getLogger(__name__)
+
+# Returns the GIF URLs for a search term; may raise on upstream errors.  The
+# second argument is True for background refreshes, which are low priority.
+GifFetcher = Callable[[str, bool], Awaitable[List[str]]]
+# Persistence hooks: load every stored pool / save one pool.
+PoolLoader = Callable[[], Awaitable[Dict[str, Tuple[List[str], float]]]]
+PoolSaver = Callable[[str, List[str], float], Awaitable[None]]
+
+
+@dataclass
+class GifPool:
+    """The search results for one term and when they were fetched."""
+
+    urls: List[str]
+    fetched_at: float
+    last: Optional[str] = field(default=None, compare=False)
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def pick(self) -> Optional[str]:
+        """Return a random URL, avoiding the one served last time."""
+        if not self.urls:
+            return None
+        choices = [url for url in self.urls if url != self.last] or self.urls
+        self.last = random.choice(choices)
+        return self.last
+
+
+class GifPoolCache:
+    """Cache of :class:`GifPool` objects keyed by search term.
+
+    ``ttl`` is how long a pool is considered fresh; once less than
+    ``refresh_ahead`` seconds remain, the next pick triggers a background
+    refresh.  Stale pools keep being served until a refresh succeeds.
+    """
+
+    def __init__(
+        self,
+        fetch: GifFetcher,
+        ttl: float,
+        refresh_ahead: float,
+        load: Optional[PoolLoader] = None,
+        save: Optional[PoolSaver] = None,
+    ) -> None:
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.load = load
+        self.save = save
+        self._pools: Dict[str, GifPool] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._loading: Optional[asyncio.Task] = None
+        self._saving: Set[asyncio.Task] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    async def get(self, term: str) -> Optional[str]:
+        """Return a random GIF URL for ``term``."""
+        if self._loading is not None and not self._loading.done():
+            await asyncio.shield(self._loading)
+
+        pool = self._pools.get(term)
+        if pool is None or not pool.urls:
+            self.misses += 1
+            pool = await self.refresh(term)
+            return pool.pick() if pool else None
+
+        self.hits += 1
+        if pool.age() >= self.ttl - self.refresh_ahead and term not in self._inflight:
+            self._start_refresh(term, background=True)
+        return pool.pick()
+
+    def start_loading(self) -> None:
+        """Load persisted pools in the background (no-op without a loader)."""
+        if self.load is not None and self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+
+    async def _load(self) -> None:
+        try:
+            stored = await self.load()
+        except Exception:
+            logger.warning("Failed to load persisted GIF pools", exc_info=True)
+            return
+        for term, (urls, fetched_at) in stored.items():
+            # A refresh may have finished while we were loading; keep it.
+            if term not in self._pools and urls:
+                self._pools[term] = GifPool(urls, fetched_at)
+        logger.info("Loaded %d persisted GIF pools", len(stored))
+
+    async def refresh(self, term: str) -> Optional[GifPool]:
+        """Fetch ``term`` again, joining a refresh that is already running."""
+        task = self._inflight.get(term) or self._start_refresh(term, background=False)
+        return await asyncio.shield(task)
+
+    def _start_refresh(self, term: str, background: bool) -> asyncio.Task:
+        task = asyncio.create_task(self._refresh(term, background))
+        self._inflight[term] = task
+        task.add_done_callback(lambda _: self._inflight.pop(term, None))
+        return task
+
+    async def _refresh(self, term: str, background: bool) -> Optional[GifPool]:
+        current = self._pools.get(term)
+        self.refreshes += 1
+        try:
+            urls = await self.fetch(term, background)
+        except UpstreamUnavailableError as exc:
+            logger.debug("Skipped refreshing GIFs for %r: %s", term, exc)
+            return current
+        except Exception:
+            logger.warning("Failed to refresh GIFs for %r", term, exc_info=True)
+            return current
+
+        if not urls:
+            return current
+        pool = GifPool(urls, time.time(), last=current.last if current else None)
+        self._pools[term] = pool
+        if self.save is not None:
+            task = asyncio.create_task(self._save(term, pool))
+            self._saving.add(task)
+            task.add_done_callback(self._saving.discard)
+        return pool
+
+    async def _save(self, term: str, pool: GifPool) -> None:
+        try:
+            await self.save(term, pool.urls, pool.fetched_at)
+        except Exception:
+            logger.warning("Failed to persist GIFs for %r", term, exc_info=True)
+
+    async def close(self) -> None:
+        """Cancel loads and refreshes still running and finish pending saves."""
+        tasks = list(self._inflight.values())
+        if self._loading is not None:
+            tasks.append(self._loading)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, *self._saving, return_exceptions=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "terms": len(self._pools),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+        }
@@ -0,0 +1,111 @@
+"""Paginated leaderboard view shared by the game cogs."""
+
+from __future__ import annotations
+
+from typing import Awaitable, Callable, Optional
+
+import discord
+from discord.ext import commands
+
+from database.leaderboard import LeaderboardPage
+from utils.ui import SyaaEmbed
+
+# Called with ``after=``, ``before=`` or ``around=`` to fetch another page;
+# see :func:`cogs.storage.get_leaderboard_page`.
+PageFetcher = Callable[..., Awaitable[Optional[LeaderboardPage]]]
+
+
+class LeaderboardView(discord.ui.View):
+    """Leaderboard with previous/next/jump-to-me buttons.
+
+    Pages are fetched by keyset (the edge row of the page on screen), so
+    moving to page 500 costs the same as moving to page 2.
+    """
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        user: discord.abc.User,
+        guild: Optional[discord.Guild],
+        title: str,
+        fetch: PageFetcher,
+        page: LeaderboardPage,
+        page_size: int = 10,
+    ) -> None:
+        super().__init__(timeout=120)
+        self.bot = bot
+        self.user = user
+        self.guild = guild
+        self.title = title
+        self.fetch = fetch
+        self.page = page
+        self.page_size = page_size
+        self.message: Optional[discord.Message] = None
+        self._update_buttons()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user != self.user:
+            await interaction.response.send_message("This menu is not for you!", ephemeral=True)
+            return False
+        return True
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            await self.message.edit(view=self)
+
+    def _display_name(self, user_id: int) -> str:
+        user = self.guild.get_member(user_id) if self.guild else self.bot.get_user(user_id)
+        return user.display_name if user else f"User {user_id}"
+
+    def _update_buttons(self) -> None:
+        last_rank = self.page.start_rank + len(self.page.rows) - 1
+        self.previous_page.disabled = self.page.start_rank <= 1
+        self.next_page.disabled = last_rank >= self.page.total
+
+    def build_embed(self) -> discord.Embed:
+        lines = []
+        for rank, (user_id, wins, losses) in enumerate(self.page.rows, start=self.page.start_rank):
+            name = self._display_name(user_id)
+            if user_id == self.user.id:
+                name = f"__{name}__"
+            lines.append(f"`{rank}.` **{name}** • {wins}W / {losses}L")
+
+        embed = SyaaEmbed(title=self.title)
+        embed.description = "\n".join(lines)
+        last_rank = self.page.start_rank + len(self.page.rows) - 1
+        embed.set_request_footer(
+            self.user, f"Ranks {self.page.start_rank}–{last_rank} of {self.page.total}"
+        )
+        return embed
+
+    async def show(self, interaction: discord.Interaction, page: Optional[LeaderboardPage]) -> None:
+        if page is None or not page.rows:
+            await interaction.response.send_message(
+                "Nothing to show there yet!", ephemeral=True
+            )
+            return
+        self.page = page
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.build_embed(), view=self)
+
+    @discord.ui.button(label="Previous", emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        first = self.page.rows[0]
+        await self.show(interaction, await self.fetch(self.page_size, before=first))
+
+    @discord.ui.button(label="Next", emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        last = self.page.rows[-1]
+        await self.show(interaction, await self.fetch(self.page_size, after=last))
+
+    @discord.ui.button(label="Me", emoji="📍", style=discord.ButtonStyle.primary)
+    async def jump_to_me(self, interaction: discord.Interaction, button: discord.ui.Button):
+        page = await self.fetch(self.page_size, around=self.user.id)
+        if page is None:
+            await interaction.response.send_message(
+                "You're not on this leaderboard yet!", ephemeral=True
+            )
+            return
+        await self.show(interaction, page)
@@ -0,0 +1,65 @@
+"""Token-bucket quota for outbound API calls."""
+
+from __future__ import annotations
+
+import time
+from typing import Dict
+
+from utils.resilience import UpstreamUnavailableError
+
+
+class QuotaExceededError(UpstreamUnavailableError):
+    """Raised instead of calling an upstream when its quota is used up."""
+
+
+class TokenBucket:
+    """Token bucket with two priorities.
+
+    Tokens refill at ``rate`` per second up to ``capacity``.  High priority
+    callers (a user waiting on a cache miss) may use every token; low
+    priority callers (background refreshes) only get one while more than
+    ``reserve`` tokens are left, so refreshes can never starve users.
+    Acquiring never waits: callers that are denied should degrade instead.
+    """
+
+    def __init__(self, rate: float, capacity: float, reserve: float = 0.0) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = min(reserve, capacity)
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+        self.granted = {"high": 0, "low": 0}
+        self.denied = {"high": 0, "low": 0}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, low_priority: bool = False) -> bool:
+        """Take a token if one is available to this priority."""
+        self._refill()
+        priority = "low" if low_priority else "high"
+        floor = self.reserve if low_priority else 0.0
+        if self.tokens - 1 < floor:
+            self.denied[priority] += 1
+            return False
+        self.tokens -= 1
+        self.granted[priority] += 1
+        return True
+
+    def acquire(self, low_priority: bool = False) -> None:
+        """Like :meth:`try_acquire` but raises :class:`QuotaExceededError`."""
+        if not self.try_acquire(low_priority):
+            raise QuotaExceededError("quota exhausted")
+
+    def stats(self) -> Dict[str, object]:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 2),
+            "capacity": self.capacity,
+            "rate_per_minute": self.rate * 60,
+            "granted": dict(self.granted),
+            "denied": dict(self.denied),
+        }
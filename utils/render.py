@@ -0,0 +1,184 @@
+"""Coalescing message edits for game boards.
+
+Every move in a game used to edit its message straight away.  Fast games
+(two players racing through a Hangman word, or a move followed by the
+bot's reply) then hit Discord's edit rate limits and the edits queue up
+behind 429 backoffs.
+
+Game handlers now acknowledge the interaction at once and hand the new
+render to :class:`RenderScheduler`.  Discord limits message edits per
+channel, so renders are paced per channel: at most ``channel_edits``
+edits every ``channel_window`` seconds, shared in turn by the messages
+waiting in that channel, and at most one edit per message every
+``interval`` seconds.  Renders of a message that arrive while it waits
+are merged and only the latest one is sent.  A render that is
+overwritten before it is sent is counted as dropped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Protocol, Tuple
+
+import discord
+
+
+logger = logging.getLogger(__name__)
+
+# Discord allows about 5 message edits per 5 seconds in a channel.
+CHANNEL_EDITS = 5
+CHANNEL_WINDOW = 5.0
+
+
+class Editable(Protocol):
+    id: int
+    channel: Any
+
+    async def edit(self, **fields: Any) -> Any:
+        ...
+
+
+class _Channel:
+    """Renders waiting in one channel and its recent edits."""
+
+    def __init__(self) -> None:
+        # Message ids in the order they are served.
+        self.queue: OrderedDict[int, None] = OrderedDict()
+        self.edits: Deque[float] = deque()
+        self.last_edit: Dict[int, float] = {}
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task[None] | None = None
+
+
+class RenderScheduler:
+    """Paces message edits per channel and per message."""
+
+    def __init__(
+        self,
+        interval: float,
+        channel_edits: int = CHANNEL_EDITS,
+        channel_window: float = CHANNEL_WINDOW,
+    ) -> None:
+        self.interval = interval
+        self.channel_edits = channel_edits
+        self.channel_window = channel_window
+        self._pending: Dict[int, Tuple[Editable, Dict[str, Any]]] = {}
+        self._channels: Dict[int, _Channel] = {}
+
+        self.scheduled = 0
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def schedule(self, message: Editable, **fields: Any) -> None:
+        """Render ``fields`` (``Message.edit`` arguments) on ``message`` soon.
+
+        Fields of a render that has not been sent yet are kept unless the
+        new render sets them too, so a view-only update does not lose a
+        pending embed.
+        """
+        self.scheduled += 1
+        pending = self._pending.get(message.id)
+        if pending is not None:
+            self.dropped += 1
+            fields = {**pending[1], **fields}
+        self._pending[message.id] = (message, fields)
+
+        channel_id = message.channel.id
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self._channels[channel_id] = _Channel()
+        channel.queue[message.id] = None
+        channel.wakeup.set()
+        if channel.task is None:
+            channel.task = asyncio.create_task(self._run(channel_id, channel))
+
+    async def _send(self, message: Editable, fields: Dict[str, Any]) -> None:
+        try:
+            await message.edit(**fields)
+        except discord.HTTPException:
+            # The message may have been deleted; the game carries on without it.
+            self.failed += 1
+            logger.debug("Failed to render message %s", message.id, exc_info=True)
+        except Exception:
+            # A dropped connection or a closed session must not end the
+            # channel's task and strand the renders queued behind this one.
+            self.failed += 1
+            logger.exception("Failed to render message %s", message.id)
+        else:
+            self.sent += 1
+
+    def _delay(self, channel: _Channel, now: float) -> Tuple[float, int | None]:
+        """Seconds until the channel may edit again, and the message to edit then."""
+        while channel.edits and now - channel.edits[0] >= self.channel_window:
+            channel.edits.popleft()
+        for message_id, edited in list(channel.last_edit.items()):
+            if now - edited >= self.interval:
+                del channel.last_edit[message_id]
+        if len(channel.edits) >= self.channel_edits:
+            return channel.edits[0] + self.channel_window - now, None
+        waits = []
+        for message_id in channel.queue:
+            edited = channel.last_edit.get(message_id)
+            if edited is None:
+                return 0.0, message_id
+            waits.append(edited + self.interval - now)
+        return min(waits), None
+
+    async def _run(self, channel_id: int, channel: _Channel) -> None:
+        try:
+            while True:
+                channel.wakeup.clear()
+                if not channel.queue:
+                    # Linger until every limit has expired, so the pacing
+                    # state can be dropped with the task.
+                    try:
+                        await asyncio.wait_for(
+                            channel.wakeup.wait(), max(self.channel_window, self.interval)
+                        )
+                    except asyncio.TimeoutError:
+                        if not channel.queue:
+                            return
+                    continue
+                now = time.monotonic()
+                delay, message_id = self._delay(channel, now)
+                if message_id is None:
+                    # Woken early when a render for another message arrives.
+                    try:
+                        await asyncio.wait_for(channel.wakeup.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                del channel.queue[message_id]
+                entry = self._pending.pop(message_id, None)
+                if entry is None:
+                    continue
+                channel.edits.append(now)
+                channel.last_edit[message_id] = now
+                await self._send(*entry)
+        finally:
+            if self._channels.get(channel_id) is channel:
+                del self._channels[channel_id]
+
+    async def close(self) -> None:
+        """Send every pending render now and stop."""
+        tasks = [channel.task for channel in self._channels.values() if channel.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._channels.clear()
+        pending, self._pending = self._pending, {}
+        await asyncio.gather(*(self._send(*entry) for entry in pending.values()))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "scheduled": self.scheduled,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "pending": len(self._pending),
+            "channels": len(self._channels),
+        }
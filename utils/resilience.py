@@ -0,0 +1,149 @@
+"""Helpers for calling flaky upstream services.
+
+:class:`CircuitBreaker` stops calls to an upstream after repeated failures
+and lets a single trial call through once ``reset_timeout`` has passed.
+:func:`call_with_budget` runs a call under a total latency budget, retrying
+with jittered exponential backoff only while enough of the budget is left.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when a call is skipped without contacting the upstream."""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker.
+
+    The circuit opens after ``failure_threshold`` consecutive failures.
+    While open every call is rejected; after ``reset_timeout`` seconds one
+    trial call is allowed (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Return whether a call may go through right now."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("Circuit %s closed", self.name)
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def record_cancelled(self) -> None:
+        """Release a half-open trial whose call was cancelled."""
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning("Circuit %s opened after %d failures", self.name, self.failures)
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
+
+
+async def call_with_budget(
+    func: Callable[[], Awaitable[T]],
+    *,
+    budget: float,
+    breaker: CircuitBreaker,
+    retries: int = 2,
+    base_delay: float = 0.1,
+    min_attempt: float = 0.2,
+    before_attempt: Optional[Callable[[], None]] = None,
+) -> T:
+    """Call ``func`` within ``budget`` seconds in total.
+
+    Each attempt gets whatever is left of the budget.  Failures and timeouts
+    are reported to ``breaker``; a retry only happens if, after its jittered
+    backoff, at least ``min_attempt`` seconds would remain for the attempt.
+    ``before_attempt`` runs once the breaker has let an attempt through,
+    right before the call, and may raise to skip it (spending one quota
+    token per upstream request, for example).
+    Raises :class:`CircuitOpenError` if the breaker rejects the call, or the
+    last error once retries or budget run out.
+    """
+    deadline = time.monotonic() + budget
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit is open")
+        if before_attempt is not None:
+            try:
+                before_attempt()
+            except Exception:
+                # Nothing was sent, so release a half-open trial slot.
+                breaker.record_cancelled()
+                raise
+
+        try:
+            result = await asyncio.wait_for(func(), timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            breaker.record_cancelled()
+            raise
+        except Exception:
+            breaker.record_failure()
+            attempt += 1
+            # Full jitter: anywhere between no wait and the exponential cap.
+            delay = random.uniform(0, base_delay * 2 ** attempt)
+            remaining = deadline - time.monotonic()
+            if attempt > retries or remaining - delay < min_attempt:
+                raise
+            await asyncio.sleep(delay)
+            continue
+
+        breaker.record_success()
+        return result
@@ -0,0 +1,309 @@
+"""Registry of running game sessions.
+
+Game components are stateless (see :mod:`utils.gamestate`), so nothing
+else knows how many games are running.  :class:`SessionManager` tracks
+every game by guild, channel and the member who started it, and:
+
+* rejects new games over the per-guild, per-channel and global caps;
+* rejects or replaces (``duplicates="replace"``) a member's running game
+  of the same kind when they start another one;
+* ends games nobody has touched for ``idle_timeout`` seconds, from a
+  background sweep;
+* reports counts and the approximate memory used through :meth:`stats`.
+
+Cogs register a callback per game kind with :meth:`register`; it is
+awaited when one of their sessions is evicted, to drop the game's state
+and tell the players.  A game is opened before its message is sent and
+bound to its key (and message) afterwards::
+
+    session = await bot.sessions.open("tictactoe", guild_id, channel_id, owner, players)
+    message = await ctx.send(...)
+    bot.sessions.bind(session, message.id, message.id)
+
+Sessions are only kept in memory.  After a restart, games still running
+on Discord are adopted again by :meth:`touch` on their next move.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import discord
+
+
+logger = logging.getLogger(__name__)
+
+# Keys of evicted games are remembered so late clicks get a clear answer.
+EXPIRED_MEMORY = 10_000
+
+DUPLICATE_POLICIES = ("reject", "replace")
+
+# What players see on the message of an evicted game.
+EVICTION_MESSAGES = {
+    "idle": "This game ended because nobody played for a while.",
+    "replaced": "This game was replaced by a newer one.",
+}
+
+
+class SessionLimitError(Exception):
+    """Raised when a new game would exceed a limit; the message is for the user."""
+
+
+@dataclass(eq=False)
+class Session:
+    game: str
+    guild_id: int
+    channel_id: int
+    owner: int
+    players: Tuple[int, ...]
+    key: Optional[Hashable] = None
+    message_id: Optional[int] = None
+    started: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+
+
+EvictCallback = Callable[[Session, str], Awaitable[None]]
+
+
+def session_message(client: discord.Client, session: Session) -> Optional[discord.PartialMessage]:
+    """The message of ``session``, for editing it without fetching it first."""
+    if session.message_id is None:
+        return None
+    channel = client.get_partial_messageable(session.channel_id)
+    return channel.get_partial_message(session.message_id)
+
+
+class SessionManager:
+    """Running games with concurrency caps and idle eviction."""
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_per_guild: int,
+        max_per_channel: int,
+        idle_timeout: float,
+        duplicates: str = "replace",
+        sweep_interval: float = 30.0,
+    ) -> None:
+        if duplicates not in DUPLICATE_POLICIES:
+            raise ValueError(f"duplicates must be one of {DUPLICATE_POLICIES}")
+        self.max_sessions = max_sessions
+        self.max_per_guild = max_per_guild
+        self.max_per_channel = max_per_channel
+        self.idle_timeout = idle_timeout
+        self.duplicates = duplicates
+        self.sweep_interval = sweep_interval
+
+        # Least recently active first.
+        self._sessions: OrderedDict[Session, None] = OrderedDict()
+        self._by_key: Dict[Tuple[str, Hashable], Session] = {}
+        self._by_guild: Dict[int, Set[Session]] = {}
+        self._by_channel: Dict[int, Set[Session]] = {}
+        self._by_owner: Dict[Tuple[int, str], Session] = {}
+        self._expired: OrderedDict[Tuple[str, Hashable], None] = OrderedDict()
+        self._callbacks: Dict[str, EvictCallback] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+
+        self.rejected = 0
+        self.evicted: Counter[str] = Counter()
+
+    def register(self, game: str, on_evict: EvictCallback) -> None:
+        self._callbacks[game] = on_evict
+
+    def unregister(self, game: str) -> None:
+        self._callbacks.pop(game, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def open(
+        self,
+        game: str,
+        guild_id: int,
+        channel_id: int,
+        owner: int,
+        players: Tuple[int, ...] = (),
+    ) -> Session:
+        """Start tracking a new game, or raise :class:`SessionLimitError`."""
+        previous = self._by_owner.get((owner, game))
+        if previous is not None:
+            if self.duplicates == "reject":
+                self.rejected += 1
+                raise SessionLimitError(
+                    "You already have a game running, finish it before starting another one."
+                )
+            await self.evict(previous, "replaced")
+
+        if len(self._sessions) >= self.max_sessions:
+            limit = "Too many games are running right now"
+        elif len(self._by_guild.get(guild_id, ())) >= self.max_per_guild:
+            limit = f"This server already has {self.max_per_guild} games running"
+        elif len(self._by_channel.get(channel_id, ())) >= self.max_per_channel:
+            limit = f"This channel already has {self.max_per_channel} games running"
+        else:
+            limit = None
+        if limit is not None:
+            self.rejected += 1
+            raise SessionLimitError(f"{limit}, try again later.")
+
+        session = Session(game, guild_id, channel_id, owner, tuple(players) or (owner,))
+        self._add(session)
+        return session
+
+    def bind(self, session: Session, key: Hashable, message_id: Optional[int] = None) -> None:
+        """Attach the key moves are looked up by (and the game's message)."""
+        session.key = key
+        session.message_id = message_id
+        if session in self._sessions:
+            self._by_key[(session.game, key)] = session
+
+    def touch(
+        self,
+        game: str,
+        key: Hashable,
+        guild_id: int,
+        channel_id: int,
+        owner: int,
+        players: Tuple[int, ...] = (),
+        message_id: Optional[int] = None,
+    ) -> bool:
+        """Mark a game as active; ``False`` if it was evicted and must not continue.
+
+        Unknown games (started before a restart) are adopted without
+        checking the caps, since they are already running.
+        """
+        session = self._by_key.get((game, key))
+        if session is not None:
+            session.last_active = time.monotonic()
+            self._sessions.move_to_end(session)
+            return True
+        if (game, key) in self._expired:
+            return False
+        session = Session(game, guild_id, channel_id, owner, tuple(players) or (owner,))
+        self._add(session)
+        self.bind(session, key, message_id)
+        return True
+
+    def end(self, game: str, key: Hashable) -> None:
+        """Stop tracking a finished game."""
+        session = self._by_key.get((game, key))
+        if session is not None:
+            self._remove(session)
+
+    def discard(self, session: Session) -> None:
+        """Stop tracking a game that never started (its message failed to send)."""
+        self._remove(session)
+
+    def is_expired(self, game: str, key: Hashable) -> bool:
+        return (game, key) in self._expired
+
+    async def evict(self, session: Session, reason: str) -> None:
+        """End ``session`` early and let its cog clean up."""
+        if session not in self._sessions:
+            return
+        self._remove(session)
+        self.evicted[reason] += 1
+        if session.key is not None:
+            self._expired[(session.game, session.key)] = None
+            while len(self._expired) > EXPIRED_MEMORY:
+                self._expired.popitem(last=False)
+        callback = self._callbacks.get(session.game)
+        if callback is None:
+            return
+        try:
+            await callback(session, reason)
+        except Exception:
+            logger.exception("Failed to clean up %s session %s", session.game, session.key)
+
+    async def evict_idle(self) -> int:
+        """Evict every session idle for longer than ``idle_timeout``."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = []
+        for session in self._sessions:
+            if session.last_active > cutoff:
+                break
+            idle.append(session)
+        for session in idle:
+            await self.evict(session, "idle")
+        return len(idle)
+
+    def _add(self, session: Session) -> None:
+        self._sessions[session] = None
+        self._by_guild.setdefault(session.guild_id, set()).add(session)
+        self._by_channel.setdefault(session.channel_id, set()).add(session)
+        self._by_owner[(session.owner, session.game)] = session
+
+    def _remove(self, session: Session) -> None:
+        if self._sessions.pop(session, False) is False:
+            return
+        if session.key is not None:
+            self._by_key.pop((session.game, session.key), None)
+        for index, group in (
+            (self._by_guild, session.guild_id),
+            (self._by_channel, session.channel_id),
+        ):
+            members = index[group]
+            members.discard(session)
+            if not members:
+                del index[group]
+        if self._by_owner.get((session.owner, session.game)) is session:
+            del self._by_owner[(session.owner, session.game)]
+
+    def start(self) -> None:
+        """Start the background idle sweep."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                evicted = await self.evict_idle()
+            except Exception:
+                logger.exception("Failed to evict idle game sessions")
+            else:
+                if evicted:
+                    logger.debug("Evicted %d idle game sessions", evicted)
+
+    def approximate_size(self) -> int:
+        """Rough bytes held by the registry (sessions and their indexes)."""
+        containers = (
+            self._sessions, self._by_key, self._by_guild, self._by_channel,
+            self._by_owner, self._expired,
+        )
+        size = sum(sys.getsizeof(container) for container in containers)
+        size += sum(sys.getsizeof(members) for members in self._by_guild.values())
+        size += sum(sys.getsizeof(members) for members in self._by_channel.values())
+        size += sum(
+            sys.getsizeof(session) + sys.getsizeof(session.__dict__) + sys.getsizeof(session.players)
+            for session in self._sessions
+        )
+        return size
+
+    def stats(self) -> Dict[str, int]:
+        by_game = Counter(session.game for session in self._sessions)
+        return {
+            "sessions": len(self._sessions),
+            **{f"sessions_{game}": count for game, count in sorted(by_game.items())},
+            "guilds": len(self._by_guild),
+            "channels": len(self._by_channel),
+            "rejected": self.rejected,
+            "evicted_idle": self.evicted["idle"],
+            "replaced": self.evicted["replaced"],
+            "bytes": self.approximate_size(),
+        }
@@ -0,0 +1,353 @@
+"""Tic-tac-toe bitboards, a perfect-play move table and a search engine.
+
+A position is a pair of bitboards, one for X and one for O, where bit
+``i`` is cell ``i`` counted row by row from the top left.  X always moves
+first, so whose turn it is follows from the number of pieces.  A game is
+won with ``k`` pieces in a row on an ``size`` x ``size`` board;
+:func:`win_masks` lists the winning lines for each ``(size, k)``.  On the
+classic 3 x 3 board wins are looked up in :data:`WINNING`, which records
+for every 9-bit board whether it covers one of the eight :data:`WIN_MASKS`.
+
+A depth-first minimax solves the 5,478 positions reachable from the empty
+board ahead of time and stores their scores in :data:`TABLE`, a signed
+byte array indexed by the base-3 encoding of the position (``3 ** 9``
+entries, about 19 KiB).  The array ships as :data:`TABLE_PATH` and is read
+on import; it is only solved again if that file is missing or damaged.  Scores are from the point of view of the player to move:
+``0`` is a draw, a positive score a win and a negative score a loss, and
+the magnitude is one more than the number of empty cells left when the
+game ends, so quicker wins and slower losses score higher.  Choosing a
+move is then one table lookup per empty cell.
+
+Larger boards (up to 5 x 5, Discord's 25 buttons) are too big to solve
+ahead of time.  :func:`search` runs a negamax alpha-beta search with
+iterative deepening under a time budget, returning the best move of the
+deepest completed iteration.  Positions are cached in a transposition
+table keyed by a Zobrist hash, and leaves are scored by counting the
+winning lines each player can still complete.  The search is CPU bound
+pure Python; callers run it in a process pool.
+
+Rebuild the stored table with::
+
+    python -m utils.tictactoe
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+@lru_cache(maxsize=None)
+def win_masks(size: int, k: int) -> Tuple[int, ...]:
+    """Bitmasks of every line of ``k`` cells on a ``size`` x ``size`` board."""
+    masks = []
+    for row in range(size):
+        for col in range(size):
+            # Right, down and both diagonals.
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row, end_col = row + d_row * (k - 1), col + d_col * (k - 1)
+                if 0 <= end_row < size and 0 <= end_col < size:
+                    masks.append(
+                        sum(1 << (row + d_row * i) * size + col + d_col * i for i in range(k))
+                    )
+    return tuple(masks)
+
+
+@lru_cache(maxsize=None)
+def masks_through(size: int, k: int) -> Tuple[Tuple[int, ...], ...]:
+    """For each cell, the winning lines that contain it."""
+    return tuple(
+        tuple(mask for mask in win_masks(size, k) if mask >> cell & 1)
+        for cell in range(size * size)
+    )
+
+
+def full_board(size: int) -> int:
+    return (1 << size * size) - 1
+
+
+WIN_MASKS = win_masks(3, 3)
+FULL = full_board(3)
+
+WINNING = bytes(any(bits & mask == mask for mask in WIN_MASKS) for bits in range(FULL + 1))
+
+# Base-3 weight of each 9-bit board, so a position's index is
+# ``_TRITS[x] + 2 * _TRITS[o]``.
+_TRITS = [sum(3**i for i in range(9) if bits >> i & 1) for bits in range(FULL + 1)]
+
+TABLE_PATH = Path(__file__).resolve().parent.parent / "assets" / "tictactoe" / "table.bin"
+
+UNREACHABLE = -128
+
+# Chance that the bot plays an optimal move; otherwise it plays any
+# empty cell.
+DIFFICULTIES = {"easy": 0.3, "medium": 0.7, "hard": 1.0}
+
+
+def index(x: int, o: int) -> int:
+    return _TRITS[x] + 2 * _TRITS[o]
+
+
+def x_to_move(x: int, o: int) -> bool:
+    return x.bit_count() == o.bit_count()
+
+
+def empty_cells(x: int, o: int, size: int = 3) -> List[int]:
+    empty = full_board(size) & ~(x | o)
+    return [cell for cell in range(size * size) if empty >> cell & 1]
+
+
+def has_won(bits: int, size: int = 3, k: int = 3) -> bool:
+    if size == 3:
+        return bool(WINNING[bits])
+    return any(bits & mask == mask for mask in win_masks(size, k))
+
+
+def play(x: int, o: int, cell: int) -> tuple[int, int]:
+    """The position after the player to move takes ``cell``."""
+    if x_to_move(x, o):
+        return x | 1 << cell, o
+    return x, o | 1 << cell
+
+
+def _solve(table: array, x: int, o: int) -> int:
+    i = index(x, o)
+    if table[i] != UNREACHABLE:
+        return table[i]
+    empty = FULL & ~(x | o)
+    if WINNING[x] or WINNING[o]:
+        # The previous move won the game.
+        score = -(1 + empty.bit_count())
+    elif not empty:
+        score = 0
+    else:
+        score = max(-_solve(table, *play(x, o, cell)) for cell in empty_cells(x, o))
+    table[i] = score
+    return score
+
+
+def build_table() -> array:
+    table = array("b", [UNREACHABLE]) * 3**9
+    _solve(table, 0, 0)
+    return table
+
+
+def load_table(path: Path = TABLE_PATH) -> array:
+    """The table stored at ``path``, or a freshly solved one if it is unusable."""
+    table = array("b")
+    try:
+        table.frombytes(path.read_bytes())
+    except OSError:
+        return build_table()
+    # The empty board is a draw.
+    if len(table) != 3**9 or table[0] != 0:
+        return build_table()
+    return table
+
+
+TABLE = load_table()
+
+
+def move_scores(x: int, o: int) -> Dict[int, int]:
+    """The score of each empty cell for the player to move."""
+    return {cell: -TABLE[index(*play(x, o, cell))] for cell in empty_cells(x, o)}
+
+
+def best_moves(x: int, o: int) -> List[int]:
+    scores = move_scores(x, o)
+    best = max(scores.values(), default=None)
+    return [cell for cell, score in scores.items() if score == best]
+
+
+WIN_SCORE = 1_000_000_000
+# Leaf score of a line holding ``n`` pieces of one player and none of the
+# other.
+LINE_WEIGHTS = tuple(10**n for n in range(6))
+
+EXACT, LOWER, UPPER = range(3)
+
+
+class SearchResult(NamedTuple):
+    move: int
+    score: int
+    depth: int
+    nodes: int
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(size: int) -> Tuple[Tuple[int, int], ...]:
+    """A random 64-bit key per cell for X and for O."""
+    rng = random.Random(size)
+    return tuple((rng.getrandbits(64), rng.getrandbits(64)) for _ in range(size * size))
+
+
+@lru_cache(maxsize=None)
+def move_order(size: int) -> Tuple[int, ...]:
+    """Cells from the centre outwards, the usual strongest moves first."""
+    centre = (size - 1) / 2
+    return tuple(
+        sorted(
+            range(size * size),
+            key=lambda cell: abs(cell // size - centre) + abs(cell % size - centre),
+        )
+    )
+
+
+class _Searcher:
+    def __init__(self, size: int, k: int, deadline: float) -> None:
+        self.full = full_board(size)
+        self.masks = win_masks(size, k)
+        self.through = masks_through(size, k)
+        self.keys = zobrist_keys(size)
+        self.order = move_order(size)
+        self.deadline = deadline
+        self.nodes = 0
+        # hash -> (depth, bound, score, best move).  The hash covers the
+        # pieces only, which also fixes the side to move and the ply.
+        self.table: Dict[int, Tuple[int, int, int, int]] = {}
+
+    def evaluate(self, me: int, them: int) -> int:
+        score = 0
+        for mask in self.masks:
+            mine, theirs = me & mask, them & mask
+            if not theirs:
+                score += LINE_WEIGHTS[mine.bit_count()]
+            if not mine:
+                score -= LINE_WEIGHTS[theirs.bit_count()]
+        return score
+
+    def negamax(
+        self, me: int, them: int, side: int, key: int, depth: int, alpha: int, beta: int, ply: int
+    ) -> int:
+        self.nodes += 1
+        if not self.nodes & 1023 and time.monotonic() > self.deadline:
+            raise _OutOfTime
+        empty = self.full & ~(me | them)
+        if not empty:
+            return 0
+        if depth == 0:
+            return self.evaluate(me, them)
+
+        original_alpha = alpha
+        best_move = -1
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, bound, score, best_move = entry
+            if entry_depth >= depth:
+                if bound == EXACT:
+                    return score
+                if bound == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+
+        moves = [cell for cell in self.order if empty >> cell & 1]
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+
+        best = -WIN_SCORE - 1
+        for cell in moves:
+            placed = me | 1 << cell
+            if any(placed & mask == mask for mask in self.through[cell]):
+                score = WIN_SCORE - ply
+            else:
+                score = -self.negamax(
+                    them, placed, 1 - side, key ^ self.keys[cell][side],
+                    depth - 1, -beta, -alpha, ply + 1,
+                )
+            if score > best:
+                best, best_move = score, cell
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best <= original_alpha:
+            bound = UPPER
+        elif best >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[key] = (depth, bound, best, best_move)
+        return best
+
+
+def search(
+    x: int, o: int, size: int, k: int, budget: float, max_depth: Optional[int] = None
+) -> Optional[SearchResult]:
+    """Search for the best move of the player to move for about ``budget`` seconds.
+
+    Returns ``None`` if the board is full.  The result is the best move of
+    the deepest iteration that finished in time (at least the first one).
+    """
+    empty = empty_cells(x, o, size)
+    if not empty:
+        return None
+    deadline = time.monotonic() + budget
+    # The first iteration is cheap, so it always finishes and there is a move.
+    searcher = _Searcher(size, k, deadline=float("inf"))
+    side = 0 if x_to_move(x, o) else 1
+    me, them = (x, o) if side == 0 else (o, x)
+    key = 0
+    for cell in range(size * size):
+        if x >> cell & 1:
+            key ^= searcher.keys[cell][0]
+        elif o >> cell & 1:
+            key ^= searcher.keys[cell][1]
+
+    result = SearchResult(empty[0], 0, 0, 0)
+    for depth in range(1, min(len(empty), max_depth or len(empty)) + 1):
+        try:
+            score = searcher.negamax(me, them, side, key, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+        except _OutOfTime:
+            break
+        searcher.deadline = deadline
+        result = SearchResult(searcher.table[key][3], score, depth, searcher.nodes)
+        if abs(score) > WIN_SCORE - size * size:
+            break  # The game is decided within the horizon.
+    return result
+
+
+def choose_move(
+    x: int,
+    o: int,
+    difficulty: str = "hard",
+    rng: Optional[random.Random] = None,
+    size: int = 3,
+    k: int = 3,
+    budget: float = 1.0,
+) -> Optional[int]:
+    """A move for the player to move at ``difficulty``, or ``None`` if the board is full.
+
+    On 3 x 3 boards the move comes from :data:`TABLE`; on larger boards
+    from :func:`search`, which may take up to ``budget`` seconds.
+    """
+    rng = rng or random
+    moves = empty_cells(x, o, size)
+    if not moves:
+        return None
+    if rng.random() >= DIFFICULTIES[difficulty]:
+        return rng.choice(moves)
+    if size == 3:
+        return rng.choice(best_moves(x, o))
+    return search(x, o, size, k, budget).move
+
+
+def main() -> None:
+    TABLE_PATH.parent.mkdir(exist_ok=True)
+    TABLE_PATH.write_bytes(build_table().tobytes())
+    print(f"Wrote {TABLE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
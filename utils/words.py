@@ -0,0 +1,460 @@
+"""Indexed word corpus for Hangman, read through ``mmap``.
+
+Word lists are plain text files, one word per line, stored as
+``<source>/<language>/<category>.txt``.  :func:`build_corpus` turns them
+into a single binary file:
+
+* a fixed header (:data:`HEADER`),
+* a JSON metadata block with the language and category names and the
+  bucket table,
+* ``count + 1`` little-endian ``uint32`` offsets into the word blob,
+* the word blob itself (ASCII, no separators).
+
+Words are sorted by ``(language, category, length, difficulty)``, so each
+bucket of the index is one contiguous run of word indices.  Difficulty is
+a letter-frequency score: the average rarity of the distinct letters in a
+word, split into easy/medium/hard by tertiles per language.
+
+:class:`WordCorpus` keeps only the metadata in Python objects.  Words are
+read from the mapped file on demand, and a filtered random sample costs a
+bisect over the matching buckets, which are cached per filter.
+
+For hints and the Hangman bot, :meth:`WordCorpus.candidates` builds a
+:class:`CandidateIndex` per language and word length: Python int bitsets
+with one bit per word, for every (position, letter) pair and every letter.
+Narrowing the candidates to a partly revealed word and ranking the
+remaining letters is then a few dozen integer ``&``/``bit_count``
+operations instead of a scan over the words.
+
+Rebuild the corpus by hand with::
+
+    python -m utils.words assets/words
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import functools
+import json
+import math
+import mmap
+import random
+import string
+import struct
+import unicodedata
+from array import array
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+
+WORDS_DIR = Path(__file__).resolve().parent.parent / "assets" / "words"
+CORPUS_NAME = "corpus.bin"
+
+MAGIC = b"HMWC"
+VERSION = 1
+# magic, version, word count, metadata offset, metadata length,
+# offsets offset, blob offset
+HEADER = struct.Struct("<4sHxxIIIII")
+OFFSET = struct.Struct("<I")
+
+DIFFICULTIES = ("easy", "medium", "hard")
+# Characters a word may contain after normalisation; anything but letters
+# is shown as-is in the game.
+ALLOWED = frozenset("abcdefghijklmnopqrstuvwxyz -'")
+MIN_LENGTH = 3
+MAX_LENGTH = 30
+# Guess order used when no word in the corpus fits the pattern.
+LETTER_ORDER = "etaoinsrhldcumfpgwybvkxjqz"
+
+
+class Bucket(NamedTuple):
+    language: int
+    category: int
+    length: int
+    difficulty: int
+    start: int
+    count: int
+
+
+class Guess(NamedTuple):
+    """Best next letter and how many of the ``candidates`` contain it."""
+
+    letter: Optional[str]
+    matches: int
+    candidates: int
+
+
+def _bitset(indices: Iterable[int], size: int) -> int:
+    """An int with the bits in ``indices`` set, built without big-int shifts."""
+    buffer = bytearray((size + 7) // 8)
+    for index in indices:
+        buffer[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class CandidateIndex:
+    """Bitsets over the words of one language and length.
+
+    Bit ``i`` of every bitset stands for the word at corpus index
+    ``indices[i]``.  ``at[position, char]`` marks the words with ``char``
+    at ``position``, ``contains[letter]`` the words containing ``letter``
+    anywhere and ``in_category[category]`` the words of a category.
+    """
+
+    def __init__(self, corpus: WordCorpus, buckets: Iterable[Bucket]) -> None:
+        self.corpus = corpus
+        self.indices = array("I")
+        at: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+        contains: Dict[str, List[int]] = defaultdict(list)
+        in_category: Dict[int, List[int]] = defaultdict(list)
+        for bucket in buckets:
+            for index in range(bucket.start, bucket.start + bucket.count):
+                bit = len(self.indices)
+                self.indices.append(index)
+                word = corpus.word(index)
+                for position, char in enumerate(word):
+                    at[position, char].append(bit)
+                for letter in set(word):
+                    contains[letter].append(bit)
+                in_category[bucket.category].append(bit)
+
+        size = len(self.indices)
+        self.all = (1 << size) - 1
+        self.at = {key: _bitset(bits, size) for key, bits in at.items()}
+        self.contains = {key: _bitset(bits, size) for key, bits in contains.items()}
+        self.in_category = {key: _bitset(bits, size) for key, bits in in_category.items()}
+
+    def filter(
+        self, pattern: Sequence[str], guessed: Iterable[str], category: Optional[int] = None
+    ) -> int:
+        """Bitset of the words that fit ``pattern`` (``"_"`` for hidden letters).
+
+        Letters in ``guessed`` that are not shown in the pattern are misses,
+        and no hidden position can hold a letter that was guessed correctly,
+        since a hit reveals every occurrence.
+        """
+        bits = self.all if category is None else self.in_category.get(category, 0)
+        shown = set(pattern)
+        hits = [letter for letter in guessed if letter in shown]
+        for letter in guessed:
+            if letter not in shown:
+                bits &= ~self.contains.get(letter, 0)
+        for position, char in enumerate(pattern):
+            if char == "_":
+                for letter in hits:
+                    bits &= ~self.at.get((position, letter), 0)
+            else:
+                bits &= self.at.get((position, char), 0)
+        return bits
+
+    def best_letter(self, bits: int, guessed: Iterable[str]) -> Guess:
+        """The unguessed letter contained in most of the words in ``bits``."""
+        guessed = set(guessed)
+        candidates = bits.bit_count()
+        best: Optional[str] = None
+        best_matches = -1
+        # LETTER_ORDER breaks ties, and is the answer when nothing fits.
+        for letter in LETTER_ORDER:
+            if letter in guessed:
+                continue
+            matches = (bits & self.contains.get(letter, 0)).bit_count()
+            if matches > best_matches:
+                best, best_matches = letter, matches
+        return Guess(best, max(best_matches, 0), candidates)
+
+    def words(self, bits: int, limit: int = 10) -> List[str]:
+        """Up to ``limit`` of the words in ``bits``."""
+        found = []
+        while bits and len(found) < limit:
+            lowest = bits & -bits
+            found.append(self.corpus.word(self.indices[lowest.bit_length() - 1]))
+            bits ^= lowest
+        return found
+
+
+def normalise(word: str) -> Optional[str]:
+    """Lower-case ``word`` and strip accents; ``None`` if it is unusable."""
+    word = unicodedata.normalize("NFKD", word.strip().lower())
+    word = "".join(char for char in word if not unicodedata.combining(char))
+    if not MIN_LENGTH <= len(word) <= MAX_LENGTH or not set(word) <= ALLOWED:
+        return None
+    if not any(char.isalpha() for char in word):
+        return None
+    return word
+
+
+def _read_sources(source: Path) -> Dict[Tuple[str, str], List[str]]:
+    words: Dict[Tuple[str, str], List[str]] = {}
+    for path in sorted(source.glob("*/*.txt")):
+        key = (path.parent.name, path.stem)
+        with path.open(encoding="utf-8") as file:
+            normalised = (normalise(line) for line in file if not line.startswith("#"))
+            words[key] = sorted({word for word in normalised if word})
+    return words
+
+
+def _rarity(words: Iterable[str]) -> Dict[str, float]:
+    """Rarity (``-log2`` of the frequency) of each letter across ``words``."""
+    counts = Counter(char for word in words for char in word if char.isalpha())
+    total = sum(counts.values())
+    return {char: -math.log2(count / total) for char, count in counts.items()}
+
+
+def difficulty_score(word: str, rarity: Dict[str, float]) -> float:
+    letters = {char for char in word if char.isalpha()}
+    return sum(rarity[char] for char in letters) / len(letters)
+
+
+def build_corpus(source: Path, target: Path) -> int:
+    """Build ``target`` from the word lists in ``source``; returns the word count."""
+    lists = _read_sources(source)
+    languages = sorted({language for language, _ in lists})
+    categories = sorted({category for _, category in lists})
+
+    entries: List[Tuple[int, int, int, int, str]] = []
+    thresholds: Dict[str, List[float]] = {}
+    for language_index, language in enumerate(languages):
+        language_words = [
+            (category, word) for (lang, category), words in lists.items()
+            if lang == language for word in words
+        ]
+        if not language_words:
+            continue
+        rarity = _rarity(word for _, word in language_words)
+        scores = sorted(difficulty_score(word, rarity) for _, word in language_words)
+        cuts = [scores[len(scores) // 3], scores[2 * len(scores) // 3]]
+        thresholds[language] = cuts
+        for category, word in language_words:
+            level = bisect.bisect_right(cuts, difficulty_score(word, rarity))
+            entries.append(
+                (language_index, categories.index(category), len(word), level, word)
+            )
+    entries.sort()
+
+    buckets: List[List[int]] = []
+    for index, (language, category, length, level, _) in enumerate(entries):
+        if buckets and buckets[-1][:4] == [language, category, length, level]:
+            buckets[-1][5] += 1
+        else:
+            buckets.append([language, category, length, level, index, 1])
+
+    metadata = json.dumps(
+        {
+            "languages": languages,
+            "categories": categories,
+            "thresholds": thresholds,
+            "buckets": buckets,
+        },
+        separators=(",", ":"),
+    ).encode()
+    blob = b"".join(entry[4].encode("ascii") for entry in entries)
+    offsets = bytearray()
+    position = 0
+    for entry in entries:
+        offsets += OFFSET.pack(position)
+        position += len(entry[4])
+    offsets += OFFSET.pack(position)
+
+    metadata_offset = HEADER.size
+    offsets_offset = metadata_offset + len(metadata)
+    blob_offset = offsets_offset + len(offsets)
+    header = HEADER.pack(
+        MAGIC, VERSION, len(entries), metadata_offset, len(metadata), offsets_offset, blob_offset
+    )
+
+    partial = target.with_suffix(".tmp")
+    with partial.open("wb") as file:
+        file.write(header)
+        file.write(metadata)
+        file.write(offsets)
+        file.write(blob)
+    partial.replace(target)
+    return len(entries)
+
+
+def is_stale(source: Path, target: Path) -> bool:
+    """Whether ``target`` is missing or older than any word list in ``source``."""
+    if not target.exists():
+        return True
+    built = target.stat().st_mtime
+    return any(path.stat().st_mtime > built for path in source.glob("*/*.txt"))
+
+
+class WordCorpus:
+    """Read-only view of a corpus file built by :func:`build_corpus`."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            self.word_count,
+            metadata_offset,
+            metadata_length,
+            self._offsets,
+            self._blob,
+        ) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} word corpus")
+
+        metadata = json.loads(self._map[metadata_offset:metadata_offset + metadata_length])
+        self.languages: List[str] = metadata["languages"]
+        self.categories: List[str] = metadata["categories"]
+        self.thresholds: Dict[str, List[float]] = metadata["thresholds"]
+        self.buckets = [Bucket(*bucket) for bucket in metadata["buckets"]]
+        self._select = functools.lru_cache(maxsize=256)(self._select_uncached)
+        self.candidates = functools.lru_cache(maxsize=64)(self._candidates_uncached)
+
+    def __len__(self) -> int:
+        return self.word_count
+
+    def word(self, index: int) -> str:
+        """The word at ``index``, read straight from the mapped file."""
+        if not 0 <= index < self.word_count:
+            raise IndexError(index)
+        position = self._offsets + index * OFFSET.size
+        start, end = struct.unpack_from("<II", self._map, position)
+        return self._map[self._blob + start:self._blob + end].decode("ascii")
+
+    def categories_for(self, language: str) -> List[str]:
+        """Category names that have words in ``language``."""
+        if language not in self.languages:
+            return []
+        language_index = self.languages.index(language)
+        used = {bucket.category for bucket in self.buckets if bucket.language == language_index}
+        return [self.categories[index] for index in sorted(used)]
+
+    def _select_uncached(
+        self,
+        language: Optional[str],
+        category: Optional[str],
+        difficulty: Optional[str],
+        min_length: int,
+        max_length: int,
+    ) -> Tuple[Tuple[Bucket, ...], Tuple[int, ...]]:
+        def index_of(names: Sequence[str], name: Optional[str]) -> Optional[int]:
+            if name is None:
+                return None
+            return names.index(name) if name in names else -1
+
+        language_index = index_of(self.languages, language)
+        category_index = index_of(self.categories, category)
+        level = index_of(DIFFICULTIES, difficulty)
+
+        selected: List[Bucket] = []
+        cumulative: List[int] = []
+        total = 0
+        for bucket in self.buckets:
+            if language_index is not None and bucket.language != language_index:
+                continue
+            if category_index is not None and bucket.category != category_index:
+                continue
+            if level is not None and bucket.difficulty != level:
+                continue
+            if not min_length <= bucket.length <= max_length:
+                continue
+            total += bucket.count
+            selected.append(bucket)
+            cumulative.append(total)
+        return tuple(selected), tuple(cumulative)
+
+    def count(
+        self,
+        language: Optional[str] = None,
+        category: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        min_length: int = MIN_LENGTH,
+        max_length: int = MAX_LENGTH,
+    ) -> int:
+        """Number of words matching the filters."""
+        _, cumulative = self._select(language, category, difficulty, min_length, max_length)
+        return cumulative[-1] if cumulative else 0
+
+    def sample(
+        self,
+        language: Optional[str] = None,
+        category: Optional[str] = None,
+        difficulty: Optional[str] = None,
+        min_length: int = MIN_LENGTH,
+        max_length: int = MAX_LENGTH,
+        rng: Optional[random.Random] = None,
+    ) -> Optional[str]:
+        """A uniformly random word matching the filters, or ``None``."""
+        buckets, cumulative = self._select(language, category, difficulty, min_length, max_length)
+        if not cumulative:
+            return None
+        pick = (rng or random).randrange(cumulative[-1])
+        position = bisect.bisect_right(cumulative, pick)
+        bucket = buckets[position]
+        before = cumulative[position - 1] if position else 0
+        return self.word(bucket.start + pick - before)
+
+    def _candidates_uncached(self, language: str, length: int) -> Optional[CandidateIndex]:
+        if language not in self.languages:
+            return None
+        language_index = self.languages.index(language)
+        buckets = [
+            bucket for bucket in self.buckets
+            if bucket.language == language_index and bucket.length == length
+        ]
+        return CandidateIndex(self, buckets) if buckets else None
+
+    def best_guess(
+        self,
+        language: str,
+        pattern: Sequence[str],
+        guessed: Iterable[str],
+        category: Optional[str] = None,
+    ) -> Guess:
+        """The letter most likely to be in the word behind ``pattern``.
+
+        Only words of the same language (and ``category``, if given) and
+        length are considered; with no such word the next letter in
+        :data:`LETTER_ORDER` is suggested.
+        """
+        guessed = set(guessed)
+        index = self.candidates(language, len(pattern))
+        if index is None:
+            letter = next((char for char in LETTER_ORDER if char not in guessed), None)
+            return Guess(letter, 0, 0)
+        category_index = self.categories.index(category) if category in self.categories else None
+        return index.best_letter(index.filter(pattern, guessed, category_index), guessed)
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def load_corpus(source: Path = WORDS_DIR, target: Optional[Path] = None) -> WordCorpus:
+    """Open the corpus for ``source``, rebuilding it first if it is stale."""
+    target = target or source / CORPUS_NAME
+    if is_stale(source, target):
+        build_corpus(source, target)
+    return WordCorpus(target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the Hangman word corpus.")
+    parser.add_argument("source", type=Path, nargs="?", default=WORDS_DIR)
+    parser.add_argument("-o", "--output", type=Path)
+    args = parser.parse_args()
+
+    target = args.output or args.source / CORPUS_NAME
+    count = build_corpus(args.source, target)
+    corpus = WordCorpus(target)
+    print(f"Wrote {count} words to {target}")
+    for language in corpus.languages:
+        for category in corpus.categories_for(language):
+            levels = ", ".join(
+                f"{level} {corpus.count(language, category, level)}" for level in DIFFICULTIES
+            )
+            print(f"  {language}/{category}: {levels}")
+    corpus.close()
+
+
+if __name__ == "__main__":
+    main()
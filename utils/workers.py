@@ -0,0 +1,102 @@
+"""Process pools for CPU-bound work that may hang or crash.
+
+``ProcessPoolExecutor`` cannot cancel a running call, so the only way to
+stop a runaway worker is to kill the pool and start another.
+:class:`WorkerPool` does that for every caller in one place.  Each call
+remembers the executor it was submitted to and only resets the pool if
+that executor is still the current one: the other calls that fail because
+of the same reset do not kill the replacement, and are run again on it.
+
+Workers are started by a fork server (or spawned where there is none)
+rather than forked from the bot: the bot runs threads (the database
+driver, the DNS resolver) and a child forked while one of them holds a
+lock can deadlock on it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _kill(executor: ProcessPoolExecutor) -> None:
+    terminate = getattr(executor, "terminate_workers", None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    # Older Pythons have no public way to stop a running worker, so this
+    # reaches into the executor; if that ever goes away the workers are
+    # only shut down and a hung one is left to finish on its own.
+    processes = getattr(executor, "_processes", None) or {}
+    for process in list(processes.values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+class WorkerPool:
+    """A process pool that replaces its workers when a call hangs or crashes."""
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.resets = 0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=multiprocessing.get_context(START_METHOD)
+        )
+
+    def start(self) -> None:
+        self.executor = self._executor()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def _reset(self, executor: ProcessPoolExecutor, reason: str) -> None:
+        if executor is not self.executor:
+            # Another call already replaced it.
+            return
+        logger.warning("%s worker %s; restarting %s workers", self.name, reason, self.name)
+        self.resets += 1
+        self.executor = self._executor()
+        _kill(executor)
+
+    async def run(self, func: Callable[..., T], *args: Any, timeout: float) -> T:
+        """Run ``func(*args)`` in a worker, killing the pool after ``timeout``.
+
+        Raises :class:`asyncio.TimeoutError` or :class:`BrokenProcessPool`
+        after resetting the pool.  A call whose executor was killed by
+        another call's reset is retried once on the new one.
+        """
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            executor = self.executor
+            if executor is None:
+                raise RuntimeError(f"{self.name} workers are not running")
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(executor, func, *args), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                self._reset(executor, "timed out")
+                raise
+            except BrokenProcessPool:
+                if executor is not self.executor and attempt == 0:
+                    continue
+                self._reset(executor, "died")
+                raise
+        raise AssertionError("unreachable")